@@ -0,0 +1,496 @@
+"""
+Generador de datos sintéticos y benchmark de los modos de carga.
+
+El generador escribe CSVs con el formato de datos.csv del tamaño que se pida
+(10k, 1M o 10M filas), con distribución sesgada de barrios por departamento y
+ciudad, y un porcentaje configurable de filas duplicadas y malformadas.
+
+El benchmark ejecuta cada modo de carga (los de main.MODOS_CARGA y las
+cargas de MODOS_EXTRA, como la paralela) contra una base PostgreSQL
+descartable (las tablas de identidades se vacían antes de cada modo) y mide
+filas por segundo, round-trips, pico de memoria (RSS) y bytes de WAL
+generados. Cada modo corre en un proceso nuevo para que el pico de memoria
+sea el suyo. El reporte se guarda en JSON para comparar entre commits.
+
+Uso:
+    python dev.py bench --filas 1m --dsn "dbname=geo_bench"
+    python dev.py sample-data --filas 10k
+"""
+
+import csv
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+TAMANIOS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+ENCABEZADO_CSV = [
+    'Codigo concatenado', 'Codigo de Departamento', 'Descripcion de Departamento',
+    'Codigo de Distrito', 'Descripcion de Distrito', 'Area',
+    'Codigo de Barrio/Localidad', 'Descripcion de Barrio/Localidad',
+]
+
+# Límites que impone el Codigo concatenado (distrito en 2 dígitos, barrio en 3)
+MAXIMO_CIUDADES = 99
+MAXIMO_BARRIOS = 999
+
+# Barrios por ciudad en promedio en el dataset real (8336 barrios / 250 ciudades)
+BARRIOS_POR_CIUDAD = 35
+
+AREAS = (1, 3, 6)
+PREFIJOS = ('SAN', 'SANTA', 'VILLA', 'BARRIO', 'COLONIA', 'COMPAÑIA', 'ASENTAMIENTO', 'NUEVA', 'PUERTO', 'LOMA')
+NOMBRES = ('JOSE', 'ANTONIO', 'MARIA', 'ISIDRO', 'LORENZO', 'ROQUE', 'PEDRO', 'MIGUEL', 'FRANCISCO', 'BLAS',
+           'ESPERANZA', 'ASUNCION', 'CARMEN', 'JUAN', 'LUIS', 'RITA', 'TERESA', 'VICENTE', 'YBYRAPYTA', 'ÑU PORA',
+           'TAPE', 'GUAZU', 'CAACUPE', 'ITA', 'MBOCAYATY', 'CORONEL', 'PRIMAVERA', 'OBRERO', 'CENTRO', 'JARDIN')
+
+TABLAS_IDENTIDADES = 'identidades.barrios, identidades.ciudades, identidades.departamentos, identidades.cargas_checkpoint'
+
+
+def _repartir(total, partes, sesgo, maximo):
+    """
+    Reparte total entre partes con pesos 1/(i+1)**sesgo (Zipf), sin que
+    ninguna parte supere maximo. Requiere total <= partes * maximo.
+    """
+    pesos = [1 / (i + 1) ** sesgo for i in range(partes)]
+    suma = sum(pesos)
+    cantidades = [min(maximo, int(total * peso / suma)) for peso in pesos]
+    resto = total - sum(cantidades)
+    while resto > 0:
+        con_espacio = [i for i in range(partes) if cantidades[i] < maximo]
+        porcion = math.ceil(resto / len(con_espacio))
+        for i in con_espacio:
+            agregado = min(maximo - cantidades[i], porcion, resto)
+            cantidades[i] += agregado
+            resto -= agregado
+    return cantidades
+
+
+def _nombre(aleatorio):
+    return f"{aleatorio.choice(PREFIJOS)} {aleatorio.choice(NOMBRES)}"
+
+
+def _filas_unicas(cantidad, sesgo, aleatorio):
+    """Genera filas válidas y sin repetir, en el orden jerárquico de datos.csv."""
+    cantidad_departamentos = max(18, math.ceil(cantidad / (MAXIMO_CIUDADES * MAXIMO_BARRIOS)))
+    barrios_departamento = _repartir(cantidad, cantidad_departamentos, sesgo, MAXIMO_CIUDADES * MAXIMO_BARRIOS)
+
+    for codigo_departamento, barrios in enumerate(barrios_departamento):
+        if barrios == 0:
+            continue
+        desc_departamento = f"DEPARTAMENTO {_nombre(aleatorio)}"
+        cantidad_ciudades = min(MAXIMO_CIUDADES, math.ceil(barrios / BARRIOS_POR_CIUDAD))
+        for indice, barrios_ciudad in enumerate(_repartir(barrios, cantidad_ciudades, sesgo, MAXIMO_BARRIOS)):
+            codigo_distrito = indice + 1
+            desc_distrito = _nombre(aleatorio)
+            area = aleatorio.choice(AREAS)
+            for codigo_barrio in range(1, barrios_ciudad + 1):
+                yield [
+                    codigo_departamento * 100000 + codigo_distrito * 1000 + codigo_barrio,
+                    codigo_departamento, desc_departamento, codigo_distrito, desc_distrito,
+                    area, codigo_barrio, _nombre(aleatorio),
+                ]
+
+
+def _fila_malformada(fila, aleatorio):
+    """Devuelve una copia de la fila con uno de los errores que rechaza procesar_fila_csv."""
+    fila = list(fila)
+    error = aleatorio.randrange(3)
+    if error == 0:
+        return fila[:5]
+    if error == 1:
+        fila[aleatorio.choice((1, 3, 6))] = 'X'
+    else:
+        fila[aleatorio.choice((2, 4, 7))] = ''
+    return fila
+
+
+def generar_csv(destino, filas, sesgo=1.0, duplicados=0.02, malformadas=0.001, semilla=42, renombrados=0.0):
+    """
+    Escribe un CSV sintético con el formato de datos.csv.
+
+    Args:
+        destino: Ruta del archivo a generar
+        filas: Cantidad de filas de datos (sin contar el encabezado)
+        sesgo: Exponente de la distribución Zipf de barrios por departamento
+            y por ciudad (0 = uniforme)
+        duplicados: Proporción de filas que repiten un barrio reciente; la
+            mitad cambia la descripción, como una corrección en el origen
+        malformadas: Proporción de filas con columnas faltantes, códigos no
+            numéricos o descripciones vacías
+        semilla: Semilla del generador, para repetir exactamente el archivo
+        renombrados: Proporción de filas únicas que traen otra descripción
+            de departamento o de distrito, u otra área, que las demás filas
+            del mismo padre (cada modo de carga debe quedarse con la primera)
+
+    Returns:
+        Diccionario con la cantidad de filas únicas, duplicadas, malformadas
+        y con padres renombrados
+    """
+    aleatorio = random.Random(semilla)
+    unicas = _filas_unicas(math.ceil(filas * (1 - duplicados - malformadas)), sesgo, aleatorio)
+    recientes = []
+    conteo = {'filas': filas, 'unicas': 0, 'duplicadas': 0, 'malformadas': 0, 'renombrados': 0}
+
+    with open(destino, 'w', newline='', encoding='latin-1') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(ENCABEZADO_CSV)
+        for _ in range(filas):
+            azar = aleatorio.random()
+            fila = None
+            if azar >= malformadas + duplicados or not recientes:
+                fila = next(unicas, None)
+            if fila is not None:
+                conteo['unicas'] += 1
+                if aleatorio.random() < renombrados:
+                    fila = list(fila)
+                    campo = aleatorio.choice((2, 4, 5))
+                    fila[campo] = aleatorio.choice(AREAS) if campo == 5 else f"{fila[campo]} (RENOMBRADO)"
+                    conteo['renombrados'] += 1
+                if len(recientes) < 1000:
+                    recientes.append(fila)
+                else:
+                    recientes[aleatorio.randrange(1000)] = fila
+            elif azar < malformadas:
+                fila = _fila_malformada(aleatorio.choice(recientes), aleatorio)
+                conteo['malformadas'] += 1
+            else:
+                # Duplicado de un barrio reciente (también cuando ya no quedan filas únicas)
+                fila = list(aleatorio.choice(recientes))
+                if aleatorio.random() < 0.5:
+                    fila[7] = _nombre(aleatorio)
+                conteo['duplicadas'] += 1
+            writer.writerow(fila)
+
+    logger.info(f"CSV sintético {destino}: {conteo['unicas']} únicas, {conteo['duplicadas']} duplicadas, "
+                f"{conteo['malformadas']} malformadas")
+    return conteo
+
+
+# Conteo de round-trips
+
+_CURSORES_CONTADORES = {}
+
+
+def _cursor_contador(base):
+    """Subclase de la clase de cursor indicada que cuenta round-trips en su conexión."""
+    clase = _CURSORES_CONTADORES.get(base)
+    if clase is None:
+        def execute(self, *args, **kwargs):
+            self.connection.round_trips += 1
+            return base.execute(self, *args, **kwargs)
+
+        def executemany(self, query, vars_list):
+            vars_list = list(vars_list)
+            self.connection.round_trips += len(vars_list)
+            return base.executemany(self, query, vars_list)
+
+        def copy_expert(self, *args, **kwargs):
+            self.connection.round_trips += 1
+            return base.copy_expert(self, *args, **kwargs)
+
+        clase = _CURSORES_CONTADORES[base] = type(
+            f"Contador{base.__name__}", (base,),
+            {'execute': execute, 'executemany': executemany, 'copy_expert': copy_expert})
+    return clase
+
+
+class ConexionInstrumentada(psycopg2.extensions.connection):
+    """
+    Conexión que cuenta las sentencias enviadas al servidor (execute, cada
+    página de execute_values, COPY) y los commits/rollbacks.
+    """
+
+    round_trips = 0
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _cursor_contador(base)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        self.round_trips += 1
+        return super().commit()
+
+    def rollback(self):
+        self.round_trips += 1
+        return super().rollback()
+
+
+def _pico_rss_kb():
+    """
+    Pico de memoria residente en KB del proceso o del mayor de sus hijos (la
+    carga paralela trabaja en procesos), o None si no se puede medir.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return pico // 1024 if sys.platform == 'darwin' else pico
+
+
+def _preparar_base(dsn):
+    """Crea el esquema si no existe y vacía las tablas de identidades."""
+    conexion = psycopg2.connect(dsn)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('identidades.cargas_checkpoint')")
+            if cursor.fetchone()[0] is None:
+                with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_schema.sql'),
+                          encoding='utf-8') as file:
+                    cursor.execute(file.read())
+            cursor.execute(f"TRUNCATE {TABLAS_IDENTIDADES} RESTART IDENTITY CASCADE")
+            cursor.execute("CHECKPOINT")
+        conexion.commit()
+    finally:
+        conexion.close()
+
+
+def _cargar_paralelo(archivo_csv, dsn, tamanio_lote, trabajadores):
+    from main import cargar_datos_geograficos_paralelo
+    return cargar_datos_geograficos_paralelo(archivo_csv, psycopg2.extensions.parse_dsn(dsn), trabajadores)
+
+
+def _cargar_async(archivo_csv, dsn, tamanio_lote, trabajadores):
+    import asyncio
+
+    from main import cargar_datos_geograficos_async
+    return asyncio.run(cargar_datos_geograficos_async(archivo_csv, psycopg2.extensions.parse_dsn(dsn),
+                                                      tamanio_lote=tamanio_lote))
+
+
+def _cargar_sqlite(archivo_csv, dsn, tamanio_lote, trabajadores):
+    import tempfile
+
+    from destino_sqlite import conectar_sqlite
+    from main import cargar_datos_geograficos
+
+    with tempfile.TemporaryDirectory() as directorio:
+        conexion = conectar_sqlite(os.path.join(directorio, 'benchmark.db'))
+        try:
+            return cargar_datos_geograficos(archivo_csv, conexion)
+        finally:
+            conexion.close()
+
+
+# Cargas que el benchmark mide además de main.MODOS_CARGA: nombre -> función
+# (archivo_csv, dsn, tamanio_lote, trabajadores) que retorna las estadísticas.
+# Abren sus propias conexiones, así que sus round-trips no se cuentan
+MODOS_EXTRA = {
+    'paralelo': _cargar_paralelo,
+    'async': _cargar_async,
+    'sqlite': _cargar_sqlite,
+}
+
+# Modos que no escriben en PostgreSQL: no se mide su WAL
+MODOS_SIN_WAL = ('sqlite',)
+
+
+def modos_benchmark():
+    """Nombres de todos los modos que puede medir ejecutar_benchmark."""
+    from main import MODOS_CARGA
+    return list(MODOS_CARGA) + list(MODOS_EXTRA)
+
+
+def _medir_modo(archivo_csv, dsn, modo, tamanio_lote, trabajadores):
+    """Ejecuta un modo de carga en este proceso y retorna sus métricas."""
+    from main import cargar_datos_geograficos
+
+    logging.getLogger().setLevel(logging.WARNING)
+    conexion = psycopg2.connect(dsn, connection_factory=ConexionInstrumentada)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn()")
+            wal_inicio = cursor.fetchone()[0]
+        conexion.commit()
+        conexion.round_trips = 0
+
+        inicio = time.perf_counter()
+        if modo in MODOS_EXTRA:
+            estadisticas = MODOS_EXTRA[modo](archivo_csv, dsn, tamanio_lote, trabajadores)
+            round_trips = None
+        else:
+            estadisticas = cargar_datos_geograficos(archivo_csv, conexion, modo=modo, tamanio_lote=tamanio_lote)
+            round_trips = conexion.round_trips
+        segundos = time.perf_counter() - inicio
+
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (wal_inicio,))
+            wal_bytes = None if modo in MODOS_SIN_WAL else int(cursor.fetchone()[0])
+        conexion.commit()
+    finally:
+        conexion.close()
+
+    filas = estadisticas.get('filas_procesadas', 0)
+    return {
+        'modo': modo,
+        'segundos': round(segundos, 3),
+        'filas_procesadas': filas,
+        'filas_por_segundo': round(filas / segundos, 1) if segundos else None,
+        'round_trips': round_trips,
+        'rss_pico_kb': _pico_rss_kb(),
+        'wal_bytes': wal_bytes,
+        'estadisticas': estadisticas,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar_benchmark(archivo_csv, dsn, modos, tamanio_lote=None, trabajadores=4):
+    """
+    Ejecuta cada modo de carga sobre una base vacía y retorna el reporte.
+
+    Args:
+        archivo_csv: CSV a cargar
+        dsn: Cadena de conexión a una base descartable (sus tablas de
+            identidades se vacían antes de cada modo)
+        modos: Modos a medir, de modos_benchmark()
+        tamanio_lote: Registros por lote; por defecto BATCH_SIZE
+        trabajadores: Procesos de la carga paralela
+
+    Returns:
+        Diccionario con los datos del entorno y una entrada por modo
+    """
+    desconocidos = set(modos) - set(modos_benchmark())
+    if desconocidos:
+        raise ValueError(f"Modos desconocidos: {', '.join(sorted(desconocidos))}. "
+                         f"Opciones: {', '.join(modos_benchmark())}")
+
+    conexion = psycopg2.connect(dsn)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SHOW server_version")
+            version_servidor = cursor.fetchone()[0]
+    finally:
+        conexion.close()
+
+    resultados = []
+    for modo in modos:
+        _preparar_base(dsn)
+        logger.info(f"Midiendo modo '{modo}' con {archivo_csv}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            resultado = pool.submit(_medir_modo, archivo_csv, dsn, modo, tamanio_lote, trabajadores).result()
+        logger.info(f"Modo '{modo}': {resultado['filas_por_segundo']} filas/s, "
+                    f"{resultado['round_trips']} round-trips, {resultado['rss_pico_kb']} KB de RSS, "
+                    f"{resultado['wal_bytes']} bytes de WAL")
+        resultados.append(resultado)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'archivo': archivo_csv,
+        'tamanio_archivo': os.path.getsize(archivo_csv),
+        'tamanio_lote': tamanio_lote,
+        'trabajadores': trabajadores,
+        'python': platform.python_version(),
+        'postgresql': version_servidor,
+        'resultados': resultados,
+    }
+
+
+def guardar_reporte(reporte, directorio='benchmarks'):
+    """Guarda el reporte como JSON con la fecha y el commit en el nombre. Retorna la ruta."""
+    os.makedirs(directorio, exist_ok=True)
+    fecha = reporte['fecha'].replace(':', '').replace('-', '')
+    ruta = os.path.join(directorio, f"bench_{fecha}_{reporte['commit'] or 'sin-commit'}.json")
+    with open(ruta, 'w', encoding='utf-8') as file:
+        json.dump(reporte, file, indent=2, ensure_ascii=False)
+    return ruta
+
+
+# Filas de cada tabla por claves naturales (sin ids ni timestamps), con el
+# mismo SQL en PostgreSQL y en SQLite salvo el prefijo del esquema
+_CONSULTAS_PARIDAD = {
+    'departamentos': """
+        SELECT d.codigo, d.descripcion, CASE WHEN d.deleted_at IS NULL THEN 1 ELSE 0 END
+        FROM {esquema}departamentos d
+    """,
+    'ciudades': """
+        SELECT d.codigo, c.codigo, c.descripcion, c.area, CASE WHEN c.deleted_at IS NULL THEN 1 ELSE 0 END
+        FROM {esquema}ciudades c
+        JOIN {esquema}departamentos d ON d.id = c.departamento_id
+    """,
+    'barrios': """
+        SELECT d.codigo, c.codigo, b.codigo, b.descripcion, CASE WHEN b.deleted_at IS NULL THEN 1 ELSE 0 END
+        FROM {esquema}barrios b
+        JOIN {esquema}ciudades c ON c.id = b.ciudad_id
+        JOIN {esquema}departamentos d ON d.id = c.departamento_id
+    """,
+}
+
+
+def _filas_paridad(cursor, esquema):
+    filas = {}
+    for tabla, consulta in _CONSULTAS_PARIDAD.items():
+        cursor.execute(consulta.format(esquema=esquema))
+        filas[tabla] = set(map(tuple, cursor.fetchall()))
+    return filas
+
+
+def comparar_destinos(archivo_csv, dsn, modos=('copy',)):
+    """
+    Carga archivo_csv en una base SQLite temporal y en PostgreSQL (una base
+    descartable, con cada modo) y compara las filas de las tres tablas por
+    claves naturales.
+
+    Returns:
+        Diccionario {modo: {tabla: {'iguales', 'solo_postgresql', 'solo_sqlite', 'ejemplos'}}}
+    """
+    import tempfile
+
+    from destino_sqlite import conectar_sqlite
+    from main import cargar_datos_geograficos
+
+    with tempfile.TemporaryDirectory() as directorio:
+        conexion = conectar_sqlite(os.path.join(directorio, 'paridad.db'))
+        try:
+            cargar_datos_geograficos(archivo_csv, conexion)
+            filas_sqlite = _filas_paridad(conexion.cursor(), '')
+        finally:
+            conexion.close()
+
+    resultado = {}
+    for modo in modos:
+        _preparar_base(dsn)
+        conexion = psycopg2.connect(dsn)
+        try:
+            cargar_datos_geograficos(archivo_csv, conexion, modo=modo)
+            with conexion.cursor() as cursor:
+                filas_postgresql = _filas_paridad(cursor, 'identidades.')
+            conexion.commit()
+        finally:
+            conexion.close()
+
+        resultado[modo] = {}
+        for tabla in _CONSULTAS_PARIDAD:
+            solo_postgresql = filas_postgresql[tabla] - filas_sqlite[tabla]
+            solo_sqlite = filas_sqlite[tabla] - filas_postgresql[tabla]
+            resultado[modo][tabla] = {
+                'iguales': not solo_postgresql and not solo_sqlite,
+                'filas': len(filas_sqlite[tabla]),
+                'solo_postgresql': len(solo_postgresql),
+                'solo_sqlite': len(solo_sqlite),
+                'ejemplos': sorted(solo_postgresql)[:5] + sorted(solo_sqlite)[:5],
+            }
+    return resultado
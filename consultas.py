@@ -0,0 +1,139 @@
+"""
+Consultas jerárquicas sobre la vista materializada identidades.jerarquia_barrios.
+
+La vista (ver database_schema.sql) aplana departamento → ciudad → barrio en
+una fila por barrio, solo con registros no borrados, así que las consultas
+más frecuentes ("todos los barrios de un departamento" y "la ruta completa de
+un barrio") se resuelven con un solo recorrido de índice, sin joins ni filtros
+por deleted_at. El cargador la refresca con refrescar_jerarquia al terminar
+cada carga o sincronización.
+
+Ejemplo:
+    for barrio in barrios_de_departamento(conexion, 11):
+        print(barrio['desc_distrito'], barrio['desc_barrio'])
+    ruta = ruta_por_codigo_concatenado(conexion, 1705180)
+    print(ruta['desc_departamento'], '>', ruta['desc_distrito'], '>', ruta['desc_barrio'])
+"""
+
+import logging
+
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger(__name__)
+
+VISTA_JERARQUIA = 'identidades.jerarquia_barrios'
+
+_COLUMNAS = """
+    barrio_id, codigo_concatenado,
+    departamento_id, codigo_departamento, desc_departamento,
+    ciudad_id, codigo_distrito, desc_distrito, area,
+    codigo_barrio, desc_barrio
+"""
+
+# Si la vista existe y si ya tiene datos (REFRESH CONCURRENTLY lo necesita)
+_SQL_ESTADO_VISTA = """
+    SELECT ispopulated
+    FROM pg_matviews
+    WHERE schemaname = 'identidades' AND matviewname = 'jerarquia_barrios'
+"""
+
+
+def _sql_refresco(con_datos):
+    concurrente = 'CONCURRENTLY ' if con_datos else ''
+    return f"REFRESH MATERIALIZED VIEW {concurrente}{VISTA_JERARQUIA}"
+
+
+def barrios_de_departamento(conexion_db, codigo_departamento):
+    """Retorna los barrios vigentes de un departamento, ordenados por distrito y barrio."""
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {_COLUMNAS}
+            FROM {VISTA_JERARQUIA}
+            WHERE codigo_departamento = %s
+            ORDER BY codigo_distrito, codigo_barrio
+        """, (codigo_departamento,))
+        return cursor.fetchall()
+
+
+def barrios_de_ciudad(conexion_db, codigo_departamento, codigo_distrito):
+    """Retorna los barrios vigentes de una ciudad/distrito, ordenados por código."""
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {_COLUMNAS}
+            FROM {VISTA_JERARQUIA}
+            WHERE codigo_departamento = %s AND codigo_distrito = %s
+            ORDER BY codigo_barrio
+        """, (codigo_departamento, codigo_distrito))
+        return cursor.fetchall()
+
+
+def ruta_barrio(conexion_db, codigo_departamento, codigo_distrito, codigo_barrio):
+    """
+    Retorna la ruta completa (departamento, ciudad y barrio con sus ids,
+    códigos y descripciones) de un barrio vigente, o None si no existe.
+    """
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {_COLUMNAS}
+            FROM {VISTA_JERARQUIA}
+            WHERE codigo_departamento = %s AND codigo_distrito = %s AND codigo_barrio = %s
+        """, (codigo_departamento, codigo_distrito, codigo_barrio))
+        return cursor.fetchone()
+
+
+def ruta_por_codigo_concatenado(conexion_db, codigo):
+    """Como ruta_barrio, a partir del Codigo concatenado del CSV."""
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {_COLUMNAS}
+            FROM {VISTA_JERARQUIA}
+            WHERE codigo_concatenado = %s
+        """, (int(codigo),))
+        return cursor.fetchone()
+
+
+def ruta_por_barrio_id(conexion_db, barrio_id):
+    """Como ruta_barrio, a partir del id de identidades.barrios."""
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {_COLUMNAS}
+            FROM {VISTA_JERARQUIA}
+            WHERE barrio_id = %s
+        """, (barrio_id,))
+        return cursor.fetchone()
+
+
+def refrescar_jerarquia(conexion_db):
+    """
+    Refresca la vista materializada y confirma. Si ya tiene datos se usa
+    REFRESH ... CONCURRENTLY (gracias a su índice único), así las consultas
+    siguen leyendo la versión anterior mientras se recalcula. Si la base no
+    tiene la vista (esquema anterior) no hace nada.
+
+    Returns:
+        True si la vista se refrescó
+    """
+    with conexion_db.cursor() as cursor:
+        cursor.execute(_SQL_ESTADO_VISTA)
+        vista = cursor.fetchone()
+        if vista is None:
+            logger.warning(f"No existe {VISTA_JERARQUIA}; aplicar database_schema.sql para crearla")
+            return False
+        cursor.execute(_sql_refresco(vista[0]))
+    conexion_db.commit()
+    logger.info(f"Vista {VISTA_JERARQUIA} refrescada")
+    return True
+
+
+async def refrescar_jerarquia_async(conexion_db):
+    """Como refrescar_jerarquia, para una conexión asíncrona de psycopg 3."""
+    async with conexion_db.cursor() as cursor:
+        await cursor.execute(_SQL_ESTADO_VISTA)
+        vista = await cursor.fetchone()
+        if vista is None:
+            logger.warning(f"No existe {VISTA_JERARQUIA}; aplicar database_schema.sql para crearla")
+            return False
+        await cursor.execute(_sql_refresco(vista[0]))
+    await conexion_db.commit()
+    logger.info(f"Vista {VISTA_JERARQUIA} refrescada")
+    return True
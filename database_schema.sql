@@ -53,16 +53,91 @@ CREATE INDEX IF NOT EXISTS idx_barrios_codigo ON identidades.barrios(codigo);
 CREATE INDEX IF NOT EXISTS idx_barrios_ciudad_id ON identidades.barrios(ciudad_id);
 CREATE INDEX IF NOT EXISTS idx_barrios_deleted_at ON identidades.barrios(deleted_at);
 
+-- Tabla de control para cargas reanudables (checkpoints)
+CREATE TABLE IF NOT EXISTS identidades.cargas_checkpoint (
+    archivo_huella VARCHAR(64) PRIMARY KEY,
+    archivo VARCHAR(1024) NOT NULL,
+    offset_bytes BIGINT NOT NULL,
+    fila INTEGER NOT NULL,
+    filas_procesadas INTEGER NOT NULL DEFAULT 0,
+    errores INTEGER NOT NULL DEFAULT 0,
+    completado BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Decisiones de la deduplicación de una carga con checkpoint, para reanudarla
+-- desde el offset sin volver a analizar el archivo: los barrios repetidos
+-- (los que no figuran están una sola vez en el archivo) y la primera línea de cada ciudad
+CREATE TABLE IF NOT EXISTS identidades.cargas_checkpoint_barrios (
+    archivo_huella VARCHAR(64) NOT NULL,
+    codigo_departamento INTEGER NOT NULL,
+    codigo_distrito INTEGER NOT NULL,
+    codigo_barrio INTEGER NOT NULL,
+    linea INTEGER NOT NULL,
+    descripcion VARCHAR(255) NOT NULL,
+    rechazado BOOLEAN NOT NULL DEFAULT FALSE,
+    repeticiones INTEGER NOT NULL DEFAULT 0,
+    conflictos INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (archivo_huella, codigo_departamento, codigo_distrito, codigo_barrio)
+);
+
+CREATE TABLE IF NOT EXISTS identidades.cargas_checkpoint_ciudades (
+    archivo_huella VARCHAR(64) NOT NULL,
+    codigo_departamento INTEGER NOT NULL,
+    codigo_distrito INTEGER NOT NULL,
+    linea INTEGER NOT NULL,
+    PRIMARY KEY (archivo_huella, codigo_departamento, codigo_distrito)
+);
+
+-- Jerarquía aplanada para consultas frecuentes: una fila por barrio vigente
+-- con su ciudad y departamento. Los registros borrados quedan afuera, así los
+-- índices de la vista solo cubren filas vigentes. Se refresca al final de
+-- cada carga (REFRESH MATERIALIZED VIEW CONCURRENTLY, que requiere el índice único)
+CREATE MATERIALIZED VIEW IF NOT EXISTS identidades.jerarquia_barrios AS
+SELECT
+    b.id AS barrio_id,
+    d.codigo * 100000 + c.codigo * 1000 + b.codigo AS codigo_concatenado,
+    d.id AS departamento_id,
+    d.codigo AS codigo_departamento,
+    d.descripcion AS desc_departamento,
+    c.id AS ciudad_id,
+    c.codigo AS codigo_distrito,
+    c.descripcion AS desc_distrito,
+    c.area,
+    b.codigo AS codigo_barrio,
+    b.descripcion AS desc_barrio
+FROM identidades.barrios b
+JOIN identidades.ciudades c ON c.id = b.ciudad_id AND c.deleted_at IS NULL
+JOIN identidades.departamentos d ON d.id = c.departamento_id AND d.deleted_at IS NULL
+WHERE b.deleted_at IS NULL;
+
+-- Índices de la vista: ruta de un barrio por id, por códigos o por Codigo
+-- concatenado, y barrios de un departamento o ciudad como rango del índice por códigos
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jerarquia_barrios_barrio_id ON identidades.jerarquia_barrios(barrio_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jerarquia_barrios_codigos
+    ON identidades.jerarquia_barrios(codigo_departamento, codigo_distrito, codigo_barrio);
+CREATE INDEX IF NOT EXISTS idx_jerarquia_barrios_codigo_concatenado
+    ON identidades.jerarquia_barrios(codigo_concatenado);
+
 -- Comentarios en las tablas
 COMMENT ON TABLE identidades.departamentos IS 'Tabla de departamentos de Paraguay';
 COMMENT ON TABLE identidades.ciudades IS 'Tabla de ciudades/distritos de Paraguay';
 COMMENT ON TABLE identidades.barrios IS 'Tabla de barrios/localidades de Paraguay';
+COMMENT ON TABLE identidades.cargas_checkpoint IS 'Avance de las cargas de CSV para poder reanudarlas';
+COMMENT ON TABLE identidades.cargas_checkpoint_barrios IS 'Barrios repetidos de una carga con checkpoint y cómo se resolvieron';
+COMMENT ON TABLE identidades.cargas_checkpoint_ciudades IS 'Primera línea cargada de cada ciudad de una carga con checkpoint';
+COMMENT ON MATERIALIZED VIEW identidades.jerarquia_barrios IS 'Barrios vigentes con su ciudad y departamento, refrescada después de cada carga';
 
 -- Comentarios en las columnas importantes
 COMMENT ON COLUMN identidades.departamentos.codigo IS 'Código único del departamento';
 COMMENT ON COLUMN identidades.ciudades.area IS 'Código de área de la ciudad';
 COMMENT ON COLUMN identidades.ciudades.departamento_id IS 'Referencia al departamento padre';
 COMMENT ON COLUMN identidades.barrios.ciudad_id IS 'Referencia a la ciudad padre';
+COMMENT ON COLUMN identidades.cargas_checkpoint.archivo_huella IS 'Huella SHA-256 del archivo (tamaño + primer y último bloque)';
+COMMENT ON COLUMN identidades.cargas_checkpoint.offset_bytes IS 'Offset en bytes del archivo hasta donde se confirmó la carga';
+COMMENT ON COLUMN identidades.cargas_checkpoint_barrios.linea IS 'Línea de la primera aparición, la única que se carga';
+COMMENT ON COLUMN identidades.cargas_checkpoint_barrios.descripcion IS 'Descripción ganadora según la política de duplicados';
 
 -- Función para actualizar updated_at automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -0,0 +1,94 @@
+-- Archivo: database_schema_sqlite.sql
+-- Traducción de database_schema.sql para SQLite (despliegues sin PostgreSQL).
+-- destino_sqlite.crear_esquema_sqlite lo aplica al abrir la base.
+--
+-- Diferencias con PostgreSQL:
+--   - SQLite no tiene esquemas: las tablas no llevan el prefijo identidades.
+--   - SERIAL pasa a INTEGER PRIMARY KEY y NOW() a CURRENT_TIMESTAMP (UTC)
+--   - jerarquia_barrios es una vista común (SQLite no tiene vistas
+--     materializadas), así que no hace falta refrescarla
+--   - No hay tabla de checkpoints: la carga en SQLite es una sola transacción
+
+-- Tabla de departamentos
+CREATE TABLE IF NOT EXISTS departamentos (
+    id INTEGER PRIMARY KEY,
+    codigo INTEGER UNIQUE NOT NULL,
+    descripcion VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP NULL
+);
+
+-- Tabla de ciudades
+CREATE TABLE IF NOT EXISTS ciudades (
+    id INTEGER PRIMARY KEY,
+    codigo INTEGER NOT NULL,
+    descripcion VARCHAR(255) NOT NULL,
+    area INTEGER,
+    departamento_id INTEGER REFERENCES departamentos(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP NULL,
+    UNIQUE(codigo, departamento_id)
+);
+
+-- Tabla de barrios
+CREATE TABLE IF NOT EXISTS barrios (
+    id INTEGER PRIMARY KEY,
+    codigo INTEGER NOT NULL,
+    descripcion VARCHAR(255) NOT NULL,
+    ciudad_id INTEGER REFERENCES ciudades(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP NULL,
+    UNIQUE(codigo, ciudad_id)
+);
+
+-- Índices (la carga sobre tablas vacías los borra y los vuelve a crear al final)
+CREATE INDEX IF NOT EXISTS idx_departamentos_codigo ON departamentos(codigo);
+CREATE INDEX IF NOT EXISTS idx_departamentos_deleted_at ON departamentos(deleted_at);
+CREATE INDEX IF NOT EXISTS idx_ciudades_codigo ON ciudades(codigo);
+CREATE INDEX IF NOT EXISTS idx_ciudades_departamento_id ON ciudades(departamento_id);
+CREATE INDEX IF NOT EXISTS idx_ciudades_deleted_at ON ciudades(deleted_at);
+CREATE INDEX IF NOT EXISTS idx_barrios_codigo ON barrios(codigo);
+CREATE INDEX IF NOT EXISTS idx_barrios_ciudad_id ON barrios(ciudad_id);
+CREATE INDEX IF NOT EXISTS idx_barrios_deleted_at ON barrios(deleted_at);
+
+-- Jerarquía aplanada: una fila por barrio vigente con su ciudad y departamento
+CREATE VIEW IF NOT EXISTS jerarquia_barrios AS
+SELECT
+    b.id AS barrio_id,
+    d.codigo * 100000 + c.codigo * 1000 + b.codigo AS codigo_concatenado,
+    d.id AS departamento_id,
+    d.codigo AS codigo_departamento,
+    d.descripcion AS desc_departamento,
+    c.id AS ciudad_id,
+    c.codigo AS codigo_distrito,
+    c.descripcion AS desc_distrito,
+    c.area,
+    b.codigo AS codigo_barrio,
+    b.descripcion AS desc_barrio
+FROM barrios b
+JOIN ciudades c ON c.id = b.ciudad_id AND c.deleted_at IS NULL
+JOIN departamentos d ON d.id = c.departamento_id AND d.deleted_at IS NULL
+WHERE b.deleted_at IS NULL;
+
+-- Triggers para actualizar updated_at. El WHEN evita que se disparen cuando
+-- la sentencia ya actualizó updated_at (como los upserts de la carga)
+CREATE TRIGGER IF NOT EXISTS update_departamentos_updated_at AFTER UPDATE ON departamentos
+    FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE departamentos SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_ciudades_updated_at AFTER UPDATE ON ciudades
+    FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE ciudades SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_barrios_updated_at AFTER UPDATE ON barrios
+    FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE barrios SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
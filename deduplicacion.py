@@ -0,0 +1,260 @@
+"""
+Deduplicación de barrios antes de escribir en la base.
+
+Un barrio se identifica por (codigo_departamento, codigo_distrito,
+codigo_barrio). Si el archivo lo repite, cada repetición sería otro upsert
+(un round-trip y una tupla muerta) y ganaría la última sin que nadie se
+entere. DeduplicadorBarrios recorre las filas una vez, guarda por clave solo
+la línea de su primera aparición y la descripción vigente, y anota cada
+repetición:
+
+- 'Barrio duplicado': la repetición tiene la misma descripción; se descarta.
+- 'Nombre de barrio en conflicto': la descripción es distinta y se resuelve
+  con la política elegida:
+    ultimo    gana la última aparición (el criterio histórico de la carga)
+    primero   gana la primera aparición
+    rechazar  la clave no se carga
+
+La fila que queda ocupa la posición de la primera aparición y conserva los
+datos de departamento y ciudad de esa fila; solo la descripción del barrio
+sale de la fila ganadora. Así los padres siguen tomando los datos de su
+primera fila, igual que sin deduplicar.
+
+Las filas no se guardan: al terminar el análisis solo quedan las claves
+repetidas, y la carga vuelve a leer el archivo en streaming con filtrar, que
+deja pasar la primera aparición de cada barrio. Una entrada que no se puede
+leer dos veces (stdin) usa conservar_filas y filas(). Las decisiones sobre
+las claves repetidas (decisiones()) alcanzan para filtrar: una carga con
+checkpoint las guarda y al reanudar las recupera con restaurar().
+
+Ejemplo:
+    deduplicador = DeduplicadorBarrios('rechazar')
+    deduplicador.analizar(leer_filas_csv('nacional.csv'))
+    for row_num, fila in deduplicador.filtrar(leer_filas_csv('nacional.csv')):
+        ...
+    deduplicador.guardar_reporte('duplicados.csv')
+"""
+
+import csv
+import logging
+import sys
+from collections import Counter
+
+from metricas import AvisosAgregados
+
+logger = logging.getLogger(__name__)
+
+POLITICAS_DUPLICADOS = ('ultimo', 'primero', 'rechazar')
+
+COLUMNAS_CONFLICTOS = ['Linea', 'Linea anterior', 'Codigo departamento', 'Codigo distrito', 'Codigo barrio',
+                       'Tipo', 'Descripcion', 'Descripcion anterior', 'Resolucion']
+
+TIPO_DUPLICADO = "Barrio duplicado"
+TIPO_CONFLICTO = "Nombre de barrio en conflicto"
+
+
+class DeduplicadorBarrios:
+    """
+    Etapa de deduplicación por clave de barrio con política de conflictos.
+
+    Args:
+        politica: 'ultimo', 'primero' o 'rechazar' (ver POLITICAS_DUPLICADOS)
+        avisos: AvisosAgregados donde registrar cada repetición; por defecto
+            uno propio que se resume al terminar analizar
+        conservar_filas: Guarda en memoria la primera fila de cada clave para
+            entregarlas con filas(), cuando la entrada no se puede volver a leer
+
+    Después de analizar, primeras_lineas tiene la línea de la primera fila
+    cargada de cada ciudad, {(codigo_departamento, codigo_distrito): linea}.
+    """
+
+    def __init__(self, politica='ultimo', avisos=None, conservar_filas=False):
+        if politica not in POLITICAS_DUPLICADOS:
+            raise ValueError(f"Política de duplicados desconocida: {politica}. "
+                             f"Opciones: {', '.join(POLITICAS_DUPLICADOS)}")
+        self.politica = politica
+        self.avisos = avisos
+        # clave -> (linea de la primera aparición, descripción vigente); al
+        # terminar analizar solo quedan las claves repetidas
+        self._barrios = {}
+        # clave -> linea ganadora, solo si no es la primera aparición
+        self._ganadoras = {}
+        self._filas = {} if conservar_filas else None
+        self.primeras_lineas = {}
+        self.rechazadas = set()
+        self.conflictos = []
+        self.filas_duplicadas = 0
+        self._conflictos_restaurados = 0
+
+    def analizar(self, filas):
+        """
+        Consume (row_num, FilaGeografica) y decide qué fila queda para cada
+        clave. Cada repetición se guarda en conflictos como (linea, linea
+        anterior, clave, tipo, descripción, descripción anterior, resolución).
+        Se llama una vez por deduplicador.
+        """
+        propios = self.avisos is None
+        avisos = AvisosAgregados() if propios else self.avisos
+        barrios = self._barrios
+        ganadoras = self._ganadoras
+        conservadas = self._filas
+        primeras_lineas = self.primeras_lineas
+        politica = self.politica
+        intern = sys.intern
+        for row_num, fila in filas:
+            clave = (fila.codigo_departamento, fila.codigo_distrito, fila.codigo_barrio)
+            registro = barrios.get(clave)
+            if registro is None:
+                # La primera fila de una ciudad es siempre la primera aparición de su barrio
+                barrios[clave] = (row_num, intern(fila.desc_barrio))
+                primeras_lineas.setdefault(clave[:2], row_num)
+                if conservadas is not None:
+                    conservadas[clave] = (row_num, fila)
+                continue
+
+            self.filas_duplicadas += 1
+            linea_anterior = ganadoras.get(clave, registro[0])
+            desc_anterior = registro[1]
+            if fila.desc_barrio == desc_anterior:
+                tipo, resolucion = TIPO_DUPLICADO, 'descartada'
+            else:
+                tipo = TIPO_CONFLICTO
+                if politica == 'ultimo':
+                    barrios[clave] = (registro[0], intern(fila.desc_barrio))
+                    ganadoras[clave] = row_num
+                    resolucion = 'reemplaza a la anterior'
+                elif politica == 'primero':
+                    resolucion = 'descartada'
+                else:
+                    self.rechazadas.add(clave)
+                    resolucion = 'clave rechazada'
+            self.conflictos.append((row_num, linea_anterior, clave, tipo, fila.desc_barrio, desc_anterior,
+                                    resolucion))
+            avisos.registrar(tipo, row_num, f"departamento {clave[0]}, distrito {clave[1]}, barrio {clave[2]}: "
+                                            f"{fila.desc_barrio!r}, en la línea {linea_anterior} "
+                                            f"{desc_anterior!r} ({resolucion})")
+
+        self._ajustar_primeras_lineas()
+        self._barrios = {conflicto[2]: barrios[conflicto[2]] for conflicto in self.conflictos}
+        if propios:
+            avisos.resumir()
+        if self.conflictos:
+            logger.info(f"Deduplicación ({politica}): {len(barrios) - len(self.rechazadas)} barrios únicos, "
+                        f"{self.filas_duplicadas} filas repetidas, {self.cantidad_conflictos()} conflictos, "
+                        f"{len(self.rechazadas)} claves rechazadas")
+
+    def _ajustar_primeras_lineas(self):
+        """
+        Corrige primeras_lineas de las ciudades cuya primera fila es de una
+        clave rechazada: pasa a ser la de su primer barrio cargado.
+        """
+        primeras_lineas = self.primeras_lineas
+        afectadas = {clave[:2] for clave in self.rechazadas
+                     if self._barrios[clave][0] == primeras_lineas[clave[:2]]}
+        if not afectadas:
+            return
+        for ciudad in afectadas:
+            del primeras_lineas[ciudad]
+        for clave, (linea, _) in self._barrios.items():
+            if clave[:2] in afectadas and clave not in self.rechazadas:
+                primeras_lineas.setdefault(clave[:2], linea)
+
+    def cantidad_conflictos(self):
+        """Repeticiones con una descripción distinta de la vigente."""
+        return self._conflictos_restaurados + sum(1 for conflicto in self.conflictos
+                                                  if conflicto[3] == TIPO_CONFLICTO)
+
+    def decisiones(self):
+        """
+        Genera las decisiones sobre las claves repetidas como (clave, linea de
+        la primera aparición, descripción ganadora, rechazada, repeticiones,
+        conflictos). Con ellas y primeras_lineas, restaurar arma un
+        deduplicador que filtra igual que este sin volver a analizar.
+        """
+        repeticiones = Counter(conflicto[2] for conflicto in self.conflictos)
+        conflictos = Counter(conflicto[2] for conflicto in self.conflictos if conflicto[3] == TIPO_CONFLICTO)
+        for clave, (linea, descripcion) in self._barrios.items():
+            yield clave, linea, descripcion, clave in self.rechazadas, repeticiones[clave], conflictos[clave]
+
+    @classmethod
+    def restaurar(cls, politica, decisiones, primeras_lineas):
+        """
+        Arma un deduplicador ya analizado a partir de las tuplas de
+        decisiones() y de primeras_lineas, por ejemplo leídas de un checkpoint.
+        Los contadores se recuperan; el detalle de cada repetición, no.
+        """
+        deduplicador = cls(politica)
+        for clave, linea, descripcion, rechazada, repeticiones, conflictos in decisiones:
+            deduplicador._barrios[clave] = (linea, descripcion)
+            if rechazada:
+                deduplicador.rechazadas.add(clave)
+            deduplicador.filas_duplicadas += repeticiones
+            deduplicador._conflictos_restaurados += conflictos
+        deduplicador.primeras_lineas = dict(primeras_lineas)
+        return deduplicador
+
+    def filas(self):
+        """
+        Genera una (row_num, FilaGeografica) por clave no rechazada, en el
+        orden del archivo. Necesita conservar_filas.
+        """
+        if self._filas is None:
+            raise ValueError("filas() necesita un DeduplicadorBarrios con conservar_filas; usar filtrar")
+        barrios = self._barrios
+        rechazadas = self.rechazadas
+        for clave, (row_num, fila) in self._filas.items():
+            registro = barrios.get(clave)
+            if registro is None:
+                yield row_num, fila
+            elif clave not in rechazadas:
+                yield row_num, _con_descripcion(fila, registro[1])
+
+    def filtrar(self, filas):
+        """
+        Deja pasar de una segunda lectura del mismo archivo solo la primera
+        aparición de cada clave no rechazada, con la descripción ganadora.
+        Sirve para recorrer el archivo en streaming (desde el principio o
+        desde un offset de checkpoint) después de analizarlo completo.
+        """
+        barrios = self._barrios
+        rechazadas = self.rechazadas
+        for row_num, fila in filas:
+            clave = (fila.codigo_departamento, fila.codigo_distrito, fila.codigo_barrio)
+            registro = barrios.get(clave)
+            if registro is None:
+                yield row_num, fila
+            elif registro[0] == row_num and clave not in rechazadas:
+                yield row_num, _con_descripcion(fila, registro[1])
+
+    def completar_estadisticas(self, estadisticas):
+        """Agrega a las estadísticas de la carga los contadores de la deduplicación."""
+        estadisticas['filas_duplicadas'] = self.filas_duplicadas
+        estadisticas['conflictos'] = self.cantidad_conflictos()
+        estadisticas['claves_rechazadas'] = len(self.rechazadas)
+
+    def guardar_reporte(self, ruta):
+        """Escribe todas las repeticiones en un CSV con COLUMNAS_CONFLICTOS."""
+        guardar_reporte_conflictos(ruta, {None: self.conflictos})
+
+
+def _con_descripcion(fila, descripcion):
+    return fila if fila.desc_barrio == descripcion else fila._replace(desc_barrio=descripcion)
+
+
+def guardar_reporte_conflictos(ruta, conflictos_por_archivo):
+    """
+    Escribe en un CSV las repeticiones de una o varias deduplicaciones.
+    conflictos_por_archivo es {archivo: conflictos}; con más de un archivo, o
+    si la clave no es None, el nombre del archivo va como primera columna.
+    """
+    con_archivo = list(conflictos_por_archivo) != [None]
+    cantidad = 0
+    with open(ruta, 'w', encoding='utf-8', newline='') as file:
+        escritor = csv.writer(file, delimiter=';')
+        escritor.writerow(['Archivo', *COLUMNAS_CONFLICTOS] if con_archivo else COLUMNAS_CONFLICTOS)
+        for archivo, conflictos in conflictos_por_archivo.items():
+            for linea, linea_anterior, clave, tipo, descripcion, desc_anterior, resolucion in conflictos:
+                fila = [linea, linea_anterior, *clave, tipo, descripcion, desc_anterior, resolucion]
+                escritor.writerow([archivo, *fila] if con_archivo else fila)
+            cantidad += len(conflictos)
+    logger.info(f"Reporte de duplicados guardado en {ruta}: {cantidad} repeticiones")
@@ -0,0 +1,176 @@
+"""
+Destino SQLite para despliegues sin PostgreSQL (equipos de borde, modo offline).
+
+Las tablas son las de database_schema.sql traducidas a SQLite
+(database_schema_sqlite.sql). cargar_datos_geograficos escribe aquí cuando
+recibe una conexión sqlite3 en lugar de una de psycopg2: la deduplicación es
+la de la carga por lotes y cada nivel se envía con un executemany, todo en una
+sola transacción. Sobre tablas vacías los índices no únicos se borran antes de
+la carga y se crean al final, dentro de la misma transacción.
+
+Ejemplo:
+    conexion = conectar_sqlite('geo.db')
+    cargar_datos_geograficos('datos.csv', conexion)
+    conexion.execute("SELECT desc_barrio FROM jerarquia_barrios WHERE codigo_concatenado = 1705180")
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA_SQLITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_schema_sqlite.sql')
+
+TABLAS_SQLITE = ('departamentos', 'ciudades', 'barrios')
+
+# Mismos upserts que en PostgreSQL: no reescriben filas sin cambios
+SQL_UPSERT_DEPARTAMENTO = """
+    INSERT INTO departamentos (codigo, descripcion) VALUES (?, ?)
+    ON CONFLICT (codigo) DO UPDATE SET
+        descripcion = excluded.descripcion,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE departamentos.descripcion IS NOT excluded.descripcion
+"""
+
+SQL_UPSERT_CIUDAD = """
+    INSERT INTO ciudades (codigo, descripcion, area, departamento_id) VALUES (?, ?, ?, ?)
+    ON CONFLICT (codigo, departamento_id) DO UPDATE SET
+        descripcion = excluded.descripcion,
+        area = excluded.area,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (ciudades.descripcion, ciudades.area) IS NOT (excluded.descripcion, excluded.area)
+"""
+
+SQL_UPSERT_BARRIO = """
+    INSERT INTO barrios (codigo, descripcion, ciudad_id) VALUES (?, ?, ?)
+    ON CONFLICT (codigo, ciudad_id) DO UPDATE SET
+        descripcion = excluded.descripcion,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE barrios.descripcion IS NOT excluded.descripcion
+"""
+
+
+def crear_esquema_sqlite(conexion):
+    """Crea las tablas, índices, vista y triggers de database_schema_sqlite.sql si no existen."""
+    with open(ESQUEMA_SQLITE, encoding='utf-8') as file:
+        conexion.executescript(file.read())
+
+
+def conectar_sqlite(ruta):
+    """
+    Abre (o crea) una base SQLite lista para cargar: modo WAL, synchronous
+    NORMAL (seguro con WAL), claves foráneas activas y el esquema aplicado.
+    """
+    conexion = sqlite3.connect(ruta)
+    modo = conexion.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    if modo != 'wal':
+        logger.warning(f"SQLite no aceptó el modo WAL para {ruta}, se usa {modo}")
+    conexion.execute("PRAGMA synchronous = NORMAL")
+    conexion.execute("PRAGMA foreign_keys = ON")
+    crear_esquema_sqlite(conexion)
+    return conexion
+
+
+def _diferir_indices(cursor, metricas):
+    """
+    Si las tablas están vacías, borra sus índices no únicos y retorna sus
+    definiciones para crearlos al final. Los índices de las restricciones
+    UNIQUE no tienen sql en sqlite_master y se mantienen (los upserts los usan).
+    """
+    if cursor.execute("SELECT EXISTS (SELECT 1 FROM barrios)").fetchone()[0]:
+        return []
+    inicio = time.perf_counter()
+    marcadores = ', '.join('?' * len(TABLAS_SQLITE))
+    indices = cursor.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({marcadores})
+        ORDER BY name
+    """, TABLAS_SQLITE).fetchall()
+    for nombre, _ in indices:
+        cursor.execute(f'DROP INDEX "{nombre}"')
+    metricas.sentencias['indices'] += 2 + len(indices)
+    metricas.acumular('indices', inicio)
+    return indices
+
+
+def cargar_en_sqlite(conexion, departamentos, ciudades, barrios, estadisticas, metricas):
+    """
+    Escribe en SQLite los datos ya deduplicados por la primera pasada de la
+    carga por lotes, un executemany por nivel dentro de una sola transacción.
+
+    Args:
+        conexion: Conexión sqlite3 (ver conectar_sqlite)
+        departamentos: {codigo: descripcion}
+        ciudades: {(codigo_departamento, codigo_distrito): (descripcion, area)}
+        barrios: {(codigo_departamento, codigo_distrito, codigo_barrio): descripcion}
+        estadisticas: Contadores de la carga; se completan insertadas,
+            actualizadas y sin_cambios
+        metricas: MetricasCarga de la carga
+    """
+    sentencias = metricas.sentencias
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("BEGIN")
+        indices = _diferir_indices(cursor, metricas)
+
+        # 1. Departamentos
+        inicio = time.perf_counter()
+        cursor.executemany(SQL_UPSERT_DEPARTAMENTO, departamentos.items())
+        logger.info(f"Departamentos insertados/actualizados: {cursor.rowcount}")
+        departamentos_ids = dict(cursor.execute("SELECT codigo, id FROM departamentos"))
+        sentencias['departamentos'] += 2
+        inicio = metricas.acumular('departamentos', inicio)
+
+        # 2. Ciudades
+        cursor.executemany(SQL_UPSERT_CIUDAD, (
+            (codigo, desc, area, departamentos_ids[codigo_dept])
+            for (codigo_dept, codigo), (desc, area) in ciudades.items()
+        ))
+        logger.info(f"Ciudades insertadas/actualizadas: {cursor.rowcount}")
+        ciudades_ids = {(dept_id, codigo): id_ for dept_id, codigo, id_
+                        in cursor.execute("SELECT departamento_id, codigo, id FROM ciudades")}
+        sentencias['ciudades'] += 2
+        inicio = metricas.acumular('ciudades', inicio)
+
+        # 3. Barrios: rowcount suma inserciones y actualizaciones, las inserciones
+        # salen de la diferencia de filas
+        antes = cursor.execute("SELECT COUNT(*) FROM barrios").fetchone()[0]
+        cursor.executemany(SQL_UPSERT_BARRIO, (
+            (codigo, desc, ciudades_ids[(departamentos_ids[codigo_dept], codigo_distrito)])
+            for (codigo_dept, codigo_distrito, codigo), desc in barrios.items()
+        ))
+        modificadas = cursor.rowcount
+        insertadas = cursor.execute("SELECT COUNT(*) FROM barrios").fetchone()[0] - antes
+        estadisticas['insertadas'] = insertadas
+        estadisticas['actualizadas'] = modificadas - insertadas
+        estadisticas['sin_cambios'] = estadisticas['filas_procesadas'] - modificadas
+        logger.info(f"Barrios enviados: {len(barrios)}")
+        sentencias['barrios'] += 3
+        metricas.acumular('barrios', inicio)
+
+        if indices:
+            inicio = time.perf_counter()
+            for _, definicion in indices:
+                cursor.execute(definicion)
+            cursor.execute("ANALYZE")
+            logger.info(f"{len(indices)} índices creados después de la carga")
+            sentencias['indices'] += len(indices) + 1
+            metricas.acumular('indices', inicio)
+
+        inicio = time.perf_counter()
+        conexion.commit()
+        metricas.acumular('commit', inicio)
+        sentencias['commit'] += 1
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def contar_vigentes(conexion):
+    """Retorna {tabla: cantidad de registros no borrados} de las tablas geográficas."""
+    return {tabla: conexion.execute(f"SELECT COUNT(*) FROM {tabla} WHERE deleted_at IS NULL").fetchone()[0]
+            for tabla in TABLAS_SQLITE}
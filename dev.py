@@ -133,7 +133,11 @@ def validate_project():
         return False
     
     # Validar sintaxis de Python
-    python_files = ["main.py", "setup.py", "config_example.py"]
+    python_files = [
+        "main.py", "geo_index.py", "resolucion_nombres.py", "snapshot.py", "benchmark.py",
+        "metricas.py", "validacion.py", "lector_csv.py", "consultas.py",
+        "exportacion.py", "servicio.py", "destino_sqlite.py", "deduplicacion.py", "setup.py", "config_example.py"
+    ]
     for file in python_files:
         if Path(file).exists():
             if not run_command(f"python -m py_compile {file}", f"Validando sintaxis de {file}"):
@@ -174,10 +178,17 @@ def clean_project():
     print(f"✅ Limpieza completada - {removed_count} elementos removidos")
     return True
 
-def create_sample_data():
+def create_sample_data(args):
     """Crea datos de ejemplo para testing."""
     print("📊 Creando datos de ejemplo...")
     
+    if args.filas:
+        from benchmark import generar_csv
+        conteo = generar_csv("datos_ejemplo.csv", _cantidad_filas(args.filas), sesgo=args.sesgo,
+                             duplicados=args.duplicados, malformadas=args.malformadas)
+        print(f"✅ Archivo datos_ejemplo.csv creado ({conteo['filas']} filas)")
+        return True
+    
     sample_csv = """Codigo concatenado;Codigo de Departamento;Descripcion de Departamento;Codigo de Distrito;Descripcion de Distrito;Area;Codigo de Barrio/Localidad;Descripcion de Barrio/Localidad
 1;0;ASUNCION;0;ASUNCION;1;1;SAJONIA
 2;0;ASUNCION;0;ASUNCION;1;2;SAN ANTONIO
@@ -191,6 +202,96 @@ def create_sample_data():
     print("✅ Archivo datos_ejemplo.csv creado")
     return True
 
+def _cantidad_filas(valor):
+    """Convierte '10k', '1m', '10m' o un número en cantidad de filas."""
+    from benchmark import TAMANIOS
+    return TAMANIOS.get(valor.lower()) or int(valor)
+
+def run_benchmark(args):
+    """Genera (o reutiliza) un CSV sintético y mide cada modo de carga."""
+    print("⏱️ Ejecutando benchmark de carga...")
+    
+    from benchmark import ejecutar_benchmark, generar_csv, guardar_reporte, modos_benchmark
+    
+    archivo = args.archivo
+    if archivo is None:
+        filas = _cantidad_filas(args.filas or "10k")
+        archivo = os.path.join(args.salida, f"datos_{filas}_{args.sesgo}_{args.duplicados}_{args.malformadas}.csv")
+        if not Path(archivo).exists():
+            os.makedirs(args.salida, exist_ok=True)
+            print(f"📊 Generando {archivo}...")
+            generar_csv(archivo, filas, sesgo=args.sesgo, duplicados=args.duplicados,
+                        malformadas=args.malformadas)
+    
+    modos = args.modos.split(",") if args.modos else modos_benchmark()
+    try:
+        reporte = ejecutar_benchmark(archivo, args.dsn, modos, tamanio_lote=args.batch_size,
+                                     trabajadores=args.trabajadores)
+    except Exception as e:
+        print(f"❌ Error en el benchmark: {e}")
+        return False
+    
+    for resultado in reporte["resultados"]:
+        round_trips = resultado['round_trips'] if resultado['round_trips'] is not None else "sin medir"
+        wal = f"{resultado['wal_bytes']} bytes WAL" if resultado['wal_bytes'] is not None else "sin WAL"
+        print(f"   {resultado['modo']:>8}: {resultado['filas_por_segundo']} filas/s, "
+              f"{round_trips} round-trips, {resultado['rss_pico_kb']} KB RSS, {wal}")
+    print(f"✅ Reporte guardado en {guardar_reporte(reporte, args.salida)}")
+    return True
+
+def run_parity(args):
+    """Carga el CSV en SQLite y en PostgreSQL y verifica que las filas sean idénticas."""
+    print("🔁 Comparando destinos SQLite y PostgreSQL...")
+    
+    import tempfile
+    from benchmark import comparar_destinos, generar_csv
+    
+    modos = args.modos.split(",") if args.modos else ["fila", "lotes", "copy"]
+    iguales = True
+    with tempfile.TemporaryDirectory() as directorio:
+        # Además del CSV pedido, uno sintético con barrios repetidos y padres
+        # renombrados a mitad del archivo, donde los criterios de cada modo difieren
+        conflictos = os.path.join(directorio, "conflictos.csv")
+        generar_csv(conflictos, 20_000, duplicados=0.05, malformadas=0.001, renombrados=0.01)
+        for archivo in (args.archivo or "./datos.csv", conflictos):
+            print(f"   {os.path.basename(archivo)}")
+            try:
+                resultado = comparar_destinos(archivo, args.dsn, modos)
+            except Exception as e:
+                print(f"❌ Error en la comparación: {e}")
+                return False
+            
+            for modo, tablas in resultado.items():
+                for tabla, datos in tablas.items():
+                    if datos["iguales"]:
+                        print(f"   ✅ {modo:>6} {tabla}: {datos['filas']} filas idénticas")
+                    else:
+                        iguales = False
+                        print(f"   ❌ {modo:>6} {tabla}: {datos['solo_postgresql']} solo en PostgreSQL, "
+                              f"{datos['solo_sqlite']} solo en SQLite (ejemplos: {datos['ejemplos']})")
+    return iguales
+
+def run_loadtest(args):
+    """Mide la latencia de un servicio.py en marcha (p50/p90/p99)."""
+    print("⏱️ Ejecutando prueba de carga del servicio...")
+    
+    from servicio import prueba_de_carga
+    
+    try:
+        reporte = prueba_de_carga(args.url, archivo_csv=args.archivo or "./datos.csv",
+                                  pedidos=args.pedidos, concurrencia=args.concurrencia)
+    except Exception as e:
+        print(f"❌ Error en la prueba de carga: {e}")
+        return False
+    
+    print(f"   {reporte['pedidos_por_segundo']} pedidos/s con {reporte['concurrencia']} conexiones, "
+          f"{reporte['errores']} errores")
+    for endpoint in ("total", "barrios", "buscar"):
+        datos = reporte[endpoint]
+        print(f"   {endpoint:>7}: {datos['pedidos']} pedidos, p50 {datos['p50_ms']} ms, "
+              f"p90 {datos['p90_ms']} ms, p99 {datos['p99_ms']} ms, máx {datos['max_ms']} ms")
+    return reporte["errores"] == 0
+
 def main():
     """Función principal."""
     parser = argparse.ArgumentParser(description="Script de desarrollo")
@@ -198,10 +299,28 @@ def main():
         "command",
         choices=[
             "setup", "test", "lint", "format", "security", 
-            "validate", "clean", "sample-data", "all"
+            "validate", "clean", "sample-data", "bench", "parity", "loadtest", "all"
         ],
         help="Comando a ejecutar"
     )
+    parser.add_argument("--filas", help="sample-data/bench: filas a generar (10k, 1m, 10m o un número)")
+    parser.add_argument("--sesgo", type=float, default=1.0,
+                        help="sample-data/bench: sesgo Zipf de barrios por departamento y ciudad")
+    parser.add_argument("--duplicados", type=float, default=0.02,
+                        help="sample-data/bench: proporción de filas duplicadas")
+    parser.add_argument("--malformadas", type=float, default=0.001,
+                        help="sample-data/bench: proporción de filas malformadas")
+    parser.add_argument("--archivo", help="bench: CSV existente a cargar en lugar de generar uno; "
+                                          "parity: CSV a comparar; loadtest: CSV de donde tomar códigos y nombres")
+    parser.add_argument("--modos", help="bench/parity: modos de carga separados por coma (por defecto todos)")
+    parser.add_argument("--batch-size", type=int, help="bench: registros por lote")
+    parser.add_argument("--trabajadores", type=int, default=4, help="bench: procesos de la carga paralela")
+    parser.add_argument("--dsn", default=os.environ.get("BENCH_DSN", "dbname=geo_bench"),
+                        help="bench/parity: conexión a una base PostgreSQL descartable (se vacían sus tablas)")
+    parser.add_argument("--salida", default="benchmarks", help="bench: directorio de CSVs y reportes")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="loadtest: URL del servicio")
+    parser.add_argument("--pedidos", type=int, default=10000, help="loadtest: pedidos a enviar")
+    parser.add_argument("--concurrencia", type=int, default=8, help="loadtest: conexiones simultáneas")
     
     args = parser.parse_args()
     
@@ -213,7 +332,10 @@ def main():
         "security": security_check,
         "validate": validate_project,
         "clean": clean_project,
-        "sample-data": create_sample_data,
+        "sample-data": lambda: create_sample_data(args),
+        "bench": lambda: run_benchmark(args),
+        "parity": lambda: run_parity(args),
+        "loadtest": lambda: run_loadtest(args),
     }
     
     if args.command == "all":
@@ -0,0 +1,179 @@
+"""
+Exportación en streaming de la jerarquía cargada en identidades.
+
+Formatos:
+    csv    el mismo formato de datos.csv (delimitador ';' y el encabezado
+           original), generado por el servidor con COPY TO STDOUT
+    jsonl  un objeto JSON por barrio, con los campos de FilaGeografica
+    json   un arreglo anidado departamento → ciudades → barrios
+
+Los formatos JSON leen con un cursor con nombre (del lado del servidor) por
+páginas y escriben a medida que llegan las filas, así la memoria no depende
+del tamaño de las tablas. Si el destino termina en .gz la salida se comprime
+con gzip; '-' escribe en stdout.
+
+Uso:
+    python main.py --exportar nacional.csv.gz
+    python main.py --exportar jerarquia.json --formato json
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ('csv', 'jsonl', 'json')
+
+# Filas por página del cursor con nombre
+TAMANIO_PAGINA = 10000
+
+# Barrios vigentes con su ciudad y departamento, en el orden y con los nombres
+# de columna de datos.csv
+_CONSULTA = """
+    SELECT
+        d.codigo * 100000 + c.codigo * 1000 + b.codigo AS "Codigo concatenado",
+        d.codigo AS "Codigo de Departamento",
+        d.descripcion AS "Descripcion de Departamento",
+        c.codigo AS "Codigo de Distrito",
+        c.descripcion AS "Descripcion de Distrito",
+        c.area AS "Area",
+        b.codigo AS "Codigo de Barrio/Localidad",
+        b.descripcion AS "Descripcion de Barrio/Localidad"
+    FROM identidades.barrios b
+    JOIN identidades.ciudades c ON c.id = b.ciudad_id
+    JOIN identidades.departamentos d ON d.id = c.departamento_id
+    WHERE b.deleted_at IS NULL AND c.deleted_at IS NULL AND d.deleted_at IS NULL
+    ORDER BY d.codigo, c.codigo, b.codigo
+"""
+
+_CAMPOS_JSONL = (
+    'codigo_concatenado', 'codigo_departamento', 'desc_departamento',
+    'codigo_distrito', 'desc_distrito', 'area', 'codigo_barrio', 'desc_barrio',
+)
+
+
+def formato_por_extension(destino):
+    """Deduce el formato del nombre del destino (sin contar .gz); csv por defecto."""
+    nombre = destino[:-3] if destino.endswith('.gz') else destino
+    extension = os.path.splitext(nombre)[1].lstrip('.').lower()
+    return extension if extension in FORMATOS else 'csv'
+
+
+@contextmanager
+def _abrir_salida(destino, encoding, comprimir):
+    """
+    Abre destino para escribir texto. Los archivos se escriben con otro nombre
+    y se reemplazan al terminar, así nunca queda publicado uno a medio escribir.
+    """
+    temporal = None
+    if destino == '-':
+        binario = sys.stdout.buffer
+    else:
+        temporal = f"{destino}.tmp"
+        binario = open(temporal, 'wb')
+    # mtime=0: el mismo contenido genera siempre el mismo .gz
+    capa = gzip.GzipFile(fileobj=binario, mode='wb', mtime=0) if comprimir else binario
+    salida = io.TextIOWrapper(capa, encoding=encoding, newline='')
+    completo = False
+    try:
+        yield salida
+        completo = True
+    finally:
+        salida.detach()
+        if comprimir:
+            capa.close()
+        if temporal is None:
+            binario.flush()
+        else:
+            binario.close()
+            if completo:
+                os.replace(temporal, destino)
+            else:
+                os.remove(temporal)
+
+
+def _filas(conexion_db):
+    """Genera las filas de _CONSULTA leyendo por páginas con un cursor del lado del servidor."""
+    with conexion_db.cursor(name='exportacion') as cursor:
+        cursor.itersize = TAMANIO_PAGINA
+        cursor.execute(_CONSULTA)
+        yield from cursor
+
+
+def _exportar_csv(conexion_db, salida):
+    with conexion_db.cursor() as cursor:
+        cursor.copy_expert(f"COPY ({_CONSULTA}) TO STDOUT WITH (FORMAT csv, DELIMITER ';', HEADER true)", salida)
+        return cursor.rowcount
+
+
+def _exportar_jsonl(conexion_db, salida):
+    cantidad = 0
+    for fila in _filas(conexion_db):
+        salida.write(json.dumps(dict(zip(_CAMPOS_JSONL, fila)), ensure_ascii=False))
+        salida.write('\n')
+        cantidad += 1
+    return cantidad
+
+
+def _abrir_nivel(campos, hijos):
+    """Texto JSON de un objeto con sus campos y la lista de hijos abierta."""
+    return json.dumps(campos, ensure_ascii=False)[:-1] + f', "{hijos}": ['
+
+
+def _exportar_json(conexion_db, salida):
+    """Escribe el arreglo anidado cerrando cada nivel al cambiar de departamento o ciudad."""
+    cantidad = 0
+    departamento = ciudad = None
+    salida.write('[')
+    for concatenado, cod_dept, desc_dept, cod_dist, desc_dist, area, cod_barrio, desc_barrio in _filas(conexion_db):
+        if cod_dept != departamento:
+            if departamento is not None:
+                salida.write(']}]},')
+            salida.write('\n' + _abrir_nivel({'codigo': cod_dept, 'descripcion': desc_dept}, 'ciudades'))
+            departamento, ciudad = cod_dept, None
+        if cod_dist != ciudad:
+            if ciudad is not None:
+                salida.write(']}, ')
+            salida.write(_abrir_nivel({'codigo': cod_dist, 'descripcion': desc_dist, 'area': area}, 'barrios'))
+            ciudad = cod_dist
+        else:
+            salida.write(', ')
+        salida.write(json.dumps({'codigo': cod_barrio, 'codigo_concatenado': concatenado,
+                                 'descripcion': desc_barrio}, ensure_ascii=False))
+        cantidad += 1
+    if departamento is not None:
+        salida.write(']}]}\n')
+    salida.write(']\n')
+    return cantidad
+
+
+def exportar(conexion_db, destino, formato=None, encoding='utf-8', comprimir=None):
+    """
+    Exporta los barrios vigentes con su ciudad y departamento.
+
+    Args:
+        conexion_db: Conexión psycopg2 abierta
+        destino: Ruta del archivo a generar o '-' para stdout
+        formato: 'csv', 'jsonl' o 'json'; por defecto según la extensión
+        encoding: Codificación del archivo generado
+        comprimir: Comprimir con gzip; por defecto si destino termina en .gz
+
+    Returns:
+        Cantidad de barrios exportados
+    """
+    formato = formato or formato_por_extension(destino)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación desconocido: {formato}. Opciones: {', '.join(FORMATOS)}")
+    if comprimir is None:
+        comprimir = destino.endswith('.gz')
+
+    escritores = {'csv': _exportar_csv, 'jsonl': _exportar_jsonl, 'json': _exportar_json}
+    with _abrir_salida(destino, encoding, comprimir) as salida:
+        cantidad = escritores[formato](conexion_db, salida)
+    logger.info(f"Exportados {cantidad} barrios en formato {formato} a {destino}")
+    return cantidad
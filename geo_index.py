@@ -0,0 +1,187 @@
+"""
+Índice en memoria de la jerarquía geográfica (departamentos → ciudades → barrios).
+
+Permite resolver códigos y nombres sin consultar la base de datos en cada
+pedido. Se construye una vez desde el CSV o desde las tablas de identidades y
+ofrece búsquedas O(1) por código y por Codigo concatenado, además de navegación
+entre padres e hijos. Los registros usan __slots__ y las descripciones se
+internan, así un dataset nacional ocupa pocos MB por proceso.
+
+Ejemplo:
+    index = GeoIndex.desde_csv('./datos.csv')
+    barrio = index.por_codigo_concatenado(101130)
+    print(barrio.descripcion, barrio.ciudad.descripcion, barrio.ciudad.departamento.descripcion)
+"""
+
+import logging
+import sys
+
+from lector_csv import leer_filas_csv
+
+logger = logging.getLogger(__name__)
+
+
+def codigo_concatenado(codigo_departamento, codigo_distrito, codigo_barrio):
+    """
+    Arma el Codigo concatenado del CSV: departamento, distrito en dos dígitos
+    y barrio en tres dígitos (p. ej. 17, 5, 180 → 1705180).
+    """
+    return codigo_departamento * 100000 + codigo_distrito * 1000 + codigo_barrio
+
+
+class Departamento:
+    """Departamento con sus ciudades."""
+
+    __slots__ = ('codigo', 'descripcion', 'ciudades')
+
+    def __init__(self, codigo, descripcion):
+        self.codigo = codigo
+        self.descripcion = descripcion
+        self.ciudades = []
+
+    def __repr__(self):
+        return f"Departamento({self.codigo}, {self.descripcion!r})"
+
+
+class Ciudad:
+    """Ciudad/distrito con referencia a su departamento y sus barrios."""
+
+    __slots__ = ('codigo', 'descripcion', 'area', 'departamento', 'barrios')
+
+    def __init__(self, codigo, descripcion, area, departamento):
+        self.codigo = codigo
+        self.descripcion = descripcion
+        self.area = area
+        self.departamento = departamento
+        self.barrios = []
+
+    def __repr__(self):
+        return f"Ciudad({self.departamento.codigo}, {self.codigo}, {self.descripcion!r})"
+
+
+class Barrio:
+    """Barrio/localidad con referencia a su ciudad."""
+
+    __slots__ = ('codigo', 'descripcion', 'ciudad')
+
+    def __init__(self, codigo, descripcion, ciudad):
+        self.codigo = codigo
+        self.descripcion = descripcion
+        self.ciudad = ciudad
+
+    @property
+    def codigo_concatenado(self):
+        return codigo_concatenado(self.ciudad.departamento.codigo, self.ciudad.codigo, self.codigo)
+
+    def ruta(self):
+        """Retorna la tupla (departamento, ciudad, barrio)."""
+        return self.ciudad.departamento, self.ciudad, self
+
+    def __repr__(self):
+        return f"Barrio({self.codigo_concatenado}, {self.descripcion!r})"
+
+
+class GeoIndex:
+    """
+    Índice en memoria de departamentos, ciudades y barrios.
+
+    Las ciudades se indexan por (codigo_departamento, codigo_distrito) y los
+    barrios por su Codigo concatenado, que también es la clave para buscarlos
+    por (departamento, distrito, barrio).
+    """
+
+    __slots__ = ('_departamentos', '_ciudades', '_barrios')
+
+    def __init__(self):
+        self._departamentos = {}
+        self._ciudades = {}
+        self._barrios = {}
+
+    def agregar(self, codigo_departamento, desc_departamento, codigo_distrito, desc_distrito,
+                area, codigo_barrio, desc_barrio):
+        """
+        Agrega un barrio creando su departamento y ciudad si no existen.
+        Igual que la carga a la base, el área de una ciudad es la de su primera
+        fila y un barrio repetido se reemplaza por su última aparición.
+        """
+        departamento = self._departamentos.get(codigo_departamento)
+        if departamento is None:
+            departamento = Departamento(codigo_departamento, sys.intern(desc_departamento))
+            self._departamentos[codigo_departamento] = departamento
+
+        clave_ciudad = (codigo_departamento, codigo_distrito)
+        ciudad = self._ciudades.get(clave_ciudad)
+        if ciudad is None:
+            ciudad = Ciudad(codigo_distrito, sys.intern(desc_distrito), area, departamento)
+            self._ciudades[clave_ciudad] = ciudad
+            departamento.ciudades.append(ciudad)
+
+        clave_barrio = codigo_concatenado(codigo_departamento, codigo_distrito, codigo_barrio)
+        barrio = self._barrios.get(clave_barrio)
+        if barrio is None:
+            barrio = Barrio(codigo_barrio, sys.intern(desc_barrio), ciudad)
+            self._barrios[clave_barrio] = barrio
+            ciudad.barrios.append(barrio)
+        else:
+            barrio.descripcion = sys.intern(desc_barrio)
+        return barrio
+
+    @classmethod
+    def desde_csv(cls, archivo_csv, encoding='auto'):
+        """Construye el índice desde un archivo en el formato de datos.csv."""
+        index = cls()
+        for row_num, fila in leer_filas_csv(archivo_csv, encoding=encoding):
+            index.agregar(*fila)
+        logger.info(f"GeoIndex cargado desde {archivo_csv}: {index.resumen()}")
+        return index
+
+    @classmethod
+    def desde_db(cls, conexion_db):
+        """Construye el índice desde las tablas de identidades (sin filas borradas)."""
+        index = cls()
+        with conexion_db.cursor(name='geo_index') as cursor:
+            cursor.itersize = 10000
+            cursor.execute("""
+                SELECT d.codigo, d.descripcion, c.codigo, c.descripcion, c.area, b.codigo, b.descripcion
+                FROM identidades.barrios b
+                JOIN identidades.ciudades c ON c.id = b.ciudad_id
+                JOIN identidades.departamentos d ON d.id = c.departamento_id
+                WHERE b.deleted_at IS NULL AND c.deleted_at IS NULL AND d.deleted_at IS NULL
+                ORDER BY d.codigo, c.codigo, b.codigo
+            """)
+            for registro in cursor:
+                index.agregar(*registro)
+        logger.info(f"GeoIndex cargado desde la base de datos: {index.resumen()}")
+        return index
+
+    # Búsquedas O(1)
+
+    def departamento(self, codigo):
+        return self._departamentos.get(codigo)
+
+    def ciudad(self, codigo_departamento, codigo_distrito):
+        return self._ciudades.get((codigo_departamento, codigo_distrito))
+
+    def barrio(self, codigo_departamento, codigo_distrito, codigo_barrio):
+        return self._barrios.get(codigo_concatenado(codigo_departamento, codigo_distrito, codigo_barrio))
+
+    def por_codigo_concatenado(self, codigo):
+        return self._barrios.get(int(codigo))
+
+    # Recorridos
+
+    def departamentos(self):
+        return iter(self._departamentos.values())
+
+    def ciudades(self):
+        return iter(self._ciudades.values())
+
+    def barrios(self):
+        return iter(self._barrios.values())
+
+    def __len__(self):
+        return len(self._barrios)
+
+    def resumen(self):
+        return (f"{len(self._departamentos)} departamentos, {len(self._ciudades)} ciudades, "
+                f"{len(self._barrios)} barrios")
@@ -0,0 +1,343 @@
+"""
+Lectura en streaming de archivos con el formato de datos.csv.
+
+El archivo se lee en bloques binarios grandes cortados en el último salto de
+línea, así la memoria se mantiene constante aunque el archivo sea mucho más
+grande que la RAM. La codificación se detecta con el primer bloque (UTF-8 con
+o sin BOM, cp1252 o latin-1) y las entradas comprimidas con gzip o zstd se
+reconocen por sus bytes mágicos. '-' lee desde stdin.
+
+Las filas se validan con procesar_fila_csv y se entregan en lotes por
+columnas (LoteFilas) con los tipos ya convertidos; leer_filas_csv las entrega
+de a una como (row_num, FilaGeografica).
+
+Ejemplo:
+    for lote in leer_lotes('nacional.csv.gz'):
+        print(len(lote), lote.codigo_departamento[:3], lote.desc_barrio[:3])
+"""
+
+import codecs
+import csv
+import gzip
+import io
+import logging
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from metricas import MetricasCarga
+
+logger = logging.getLogger(__name__)
+
+# Bytes por lectura y filas válidas por lote
+TAMANIO_BLOQUE = 256 * 1024
+TAMANIO_LOTE = 1000
+
+# Bytes que se miran para detectar la codificación cuando se lee línea a línea
+TAMANIO_MUESTRA = 64 * 1024
+
+ENCODINGS = ('auto', 'utf-8', 'utf-8-sig', 'cp1252', 'latin-1')
+
+_MAGIC_GZIP = b'\x1f\x8b'
+_MAGIC_ZSTD = b'\x28\xb5\x2f\xfd'
+
+# Bytes que cp1252 no define: si aparecen, el archivo es latin-1
+_NO_DEFINIDOS_CP1252 = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+# Fila del CSV ya validada y con los tipos convertidos
+FilaGeografica = namedtuple('FilaGeografica', [
+    'codigo_departamento', 'desc_departamento',
+    'codigo_distrito', 'desc_distrito', 'area',
+    'codigo_barrio', 'desc_barrio',
+])
+
+
+def _avisar(avisos, row_num, tipo, detalle=None, nivel=logging.WARNING):
+    """Registra un aviso por fila en el agregador o, si no hay, directamente en el log."""
+    if avisos is not None:
+        avisos.registrar(tipo, row_num, detalle, nivel)
+    elif detalle is None:
+        logger.log(nivel, f"Fila {row_num}: {tipo}")
+    else:
+        logger.log(nivel, f"Fila {row_num}: {tipo}: {detalle}")
+
+
+def procesar_fila_csv(row, row_num, avisos=None):
+    """
+    Valida una fila del CSV y extrae los datos geográficos.
+
+    Args:
+        row: Lista con los valores de la fila CSV
+        row_num: Número de fila para logging de errores
+        avisos: AvisosAgregados donde registrar las filas saltadas; sin él
+            cada aviso va directamente al log
+
+    Returns:
+        FilaGeografica con los datos procesados o None si la fila debe saltarse
+
+    Raises:
+        ValueError: Si los códigos numéricos no tienen el formato esperado
+    """
+    if len(row) < 8:  # Verificar que tenga todas las columnas
+        _avisar(avisos, row_num, "Datos insuficientes, saltando")
+        return None
+
+    fila = FilaGeografica(
+        codigo_departamento=int(row[1].strip()),
+        desc_departamento=row[2].strip(),
+        codigo_distrito=int(row[3].strip()),
+        desc_distrito=row[4].strip(),
+        area=int(row[5].strip()),
+        codigo_barrio=int(row[6].strip()),
+        desc_barrio=row[7].strip(),
+    )
+
+    # Validar que las descripciones no estén vacías
+    if not fila.desc_departamento or not fila.desc_distrito or not fila.desc_barrio:
+        _avisar(avisos, row_num, "Descripciones vacías, saltando")
+        return None
+
+    return fila
+
+
+def detectar_encoding(muestra):
+    """
+    Detecta la codificación a partir de los primeros bytes del archivo:
+    'utf-8-sig' si tiene BOM, 'utf-8' si decodifica como UTF-8, 'cp1252' si
+    usa los caracteres de 0x80-0x9F que cp1252 define (comillas tipográficas,
+    €, etc.) y 'latin-1' en otro caso.
+    """
+    if muestra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        muestra.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # Una secuencia multibyte cortada al final de la muestra no descarta UTF-8
+        if e.reason == 'unexpected end of data':
+            return 'utf-8'
+    control = {byte for byte in muestra if 0x80 <= byte <= 0x9f}
+    if control and not control & _NO_DEFINIDOS_CP1252:
+        return 'cp1252'
+    return 'latin-1'
+
+
+def decodificar(datos, encoding):
+    """
+    Decodifica datos con encoding. Si el archivo se detectó como UTF-8 por su
+    inicio pero estos datos no lo son, los decodifica como cp1252 o latin-1.
+
+    Returns:
+        Tupla (texto, encoding con el que seguir leyendo)
+    """
+    try:
+        return datos.decode(encoding), encoding
+    except UnicodeDecodeError:
+        if encoding not in ('utf-8', 'utf-8-sig'):
+            raise
+    alternativo = 'cp1252' if detectar_encoding(datos) == 'cp1252' else 'latin-1'
+    return datos.decode(alternativo), alternativo
+
+
+def _abrir_zstd(crudo):
+    """Descompresor zstd: el módulo de la biblioteca estándar (3.14+) o el paquete zstandard."""
+    try:
+        from compression import zstd
+        return zstd.ZstdFile(crudo)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Para leer archivos zstd se necesita Python 3.14+ o el paquete "
+                          "zstandard (pip install zstandard)") from None
+    return zstandard.ZstdDecompressor().stream_reader(crudo)
+
+
+def es_archivo_plano(origen):
+    """Indica si origen es un archivo sin comprimir, donde los offsets en bytes sirven para reanudar."""
+    if origen == '-':
+        return False
+    with open(origen, 'rb') as file:
+        cabecera = file.read(4)
+    return not (cabecera.startswith(_MAGIC_GZIP) or cabecera.startswith(_MAGIC_ZSTD))
+
+
+@contextmanager
+def abrir_entrada(origen):
+    """
+    Abre origen para lectura binaria: una ruta o '-' para stdin. Si el contenido
+    está comprimido con gzip o zstd se descomprime al vuelo.
+    """
+    crudo = sys.stdin.buffer if origen == '-' else open(origen, 'rb')
+    try:
+        cabecera = crudo.peek(4)[:4]
+        if cabecera.startswith(_MAGIC_GZIP):
+            yield gzip.GzipFile(fileobj=crudo, mode='rb')
+        elif cabecera.startswith(_MAGIC_ZSTD):
+            yield _abrir_zstd(crudo)
+        else:
+            yield crudo
+    finally:
+        if crudo is not sys.stdin.buffer:
+            crudo.close()
+
+
+def _bloques(entrada, tamanio_bloque):
+    """Genera bloques binarios que terminan en un salto de línea (salvo el último)."""
+    resto = b''
+    while True:
+        bloque = entrada.read(tamanio_bloque)
+        if not bloque:
+            if resto:
+                yield resto
+            return
+        if resto:
+            bloque = resto + bloque
+        corte = bloque.rfind(b'\n') + 1
+        if corte == 0:
+            resto = bloque
+            continue
+        resto = bloque[corte:]
+        yield bloque[:corte]
+
+
+class LoteFilas:
+    """
+    Lote de filas válidas con acceso por columnas: lote.codigo_departamento,
+    lote.desc_barrio, etc. son listas con los valores ya convertidos y
+    lote.lineas los números de línea. errores cuenta las filas con formato
+    inválido que se descartaron mientras se armaba el lote.
+    """
+
+    __slots__ = ('lineas', 'errores', '_filas', '_columnas')
+
+    def __init__(self, lineas, filas, errores=0):
+        self.lineas = lineas
+        self.errores = errores
+        self._filas = filas
+        self._columnas = None
+
+    def columnas(self):
+        """Retorna las columnas en el orden de FilaGeografica; se transponen una sola vez."""
+        if self._columnas is None:
+            if self._filas:
+                self._columnas = tuple(map(list, zip(*self._filas)))
+            else:
+                self._columnas = tuple([] for _ in FilaGeografica._fields)
+        return self._columnas
+
+    def filas(self):
+        """Genera (row_num, FilaGeografica) para cada fila del lote."""
+        return zip(self.lineas, self._filas)
+
+    def __len__(self):
+        return len(self.lineas)
+
+
+def _columna(indice):
+    return property(lambda lote: lote.columnas()[indice], doc=f"Columna {FilaGeografica._fields[indice]}")
+
+
+for _indice, _campo in enumerate(FilaGeografica._fields):
+    setattr(LoteFilas, _campo, _columna(_indice))
+
+
+def leer_lotes(origen, encoding='auto', tamanio_lote=TAMANIO_LOTE, avisos=None, metricas=None,
+               tamanio_bloque=TAMANIO_BLOQUE):
+    """
+    Lee un archivo con el formato de datos.csv y genera LoteFilas validados.
+
+    Args:
+        origen: Ruta del archivo (puede estar comprimido con gzip o zstd) o '-'
+            para stdin
+        encoding: Codificación del archivo o 'auto' para detectarla
+        tamanio_lote: Filas válidas por lote
+        avisos: AvisosAgregados para los avisos por fila; por defecto los de
+            metricas o, sin metricas, directamente el log
+        metricas: MetricasCarga donde acumular las fases 'parseo' y 'validacion'
+        tamanio_bloque: Bytes por lectura
+
+    Supone un registro por línea, como la carga con checkpoints.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Codificación no soportada: {encoding}. Opciones: {', '.join(ENCODINGS)}")
+    if metricas is not None and avisos is None:
+        avisos = metricas.avisos
+    tiempos = metricas.tiempos if metricas is not None else {'parseo': 0.0, 'validacion': 0.0}
+
+    with abrir_entrada(origen) as entrada:
+        lineas, filas_lote, errores = [], [], 0
+        row_num = 0
+        for bloque in _bloques(entrada, tamanio_bloque):
+            antes = time.perf_counter()
+            if row_num == 0:
+                if encoding == 'auto':
+                    encoding = detectar_encoding(bloque)
+                    logger.info(f"Codificación detectada: {encoding}")
+                texto = bloque.decode(encoding)
+                # El BOM solo puede estar al principio del archivo
+                encoding = 'utf-8' if encoding == 'utf-8-sig' else encoding
+            else:
+                texto, alternativo = decodificar(bloque, encoding)
+                if alternativo != encoding:
+                    logger.warning(f"Fila {row_num + 1}: el archivo no es {encoding} más allá del inicio, "
+                                   f"se continúa como {alternativo}")
+                    encoding = alternativo
+            filas = csv.reader(io.StringIO(texto, newline=''), delimiter=';')
+            tiempos['parseo'] += time.perf_counter() - antes
+
+            while True:
+                antes = time.perf_counter()
+                row = next(filas, None)
+                leida = time.perf_counter()
+                tiempos['parseo'] += leida - antes
+                if row is None:
+                    break
+                row_num += 1
+                if row_num == 1:
+                    logger.info(f"Procesando archivo CSV con header: {row}")
+                    continue
+
+                try:
+                    fila = procesar_fila_csv(row, row_num, avisos)
+                except (ValueError, IndexError) as e:
+                    _avisar(avisos, row_num, "Error en formato de datos", e, logging.ERROR)
+                    errores += 1
+                    fila = None
+                tiempos['validacion'] += time.perf_counter() - leida
+                if fila is None:
+                    continue
+
+                lineas.append(row_num)
+                filas_lote.append(fila)
+                if len(lineas) >= tamanio_lote:
+                    yield LoteFilas(lineas, filas_lote, errores)
+                    lineas, filas_lote, errores = [], [], 0
+
+        if lineas or errores:
+            yield LoteFilas(lineas, filas_lote, errores)
+
+
+def leer_filas_csv(archivo_csv, estadisticas=None, encoding='auto', metricas=None):
+    """
+    Genera (row_num, FilaGeografica) para cada fila válida de un archivo en el
+    formato de datos.csv, que puede estar comprimido con gzip o zstd ('-' lee
+    de stdin). Los errores de formato se cuentan en estadisticas; los avisos
+    por fila se agregan y, si no se pasa metricas, se resumen al terminar.
+    """
+    if estadisticas is None:
+        estadisticas = {'filas_procesadas': 0, 'errores': 0}
+    propias = metricas is None
+    if propias:
+        metricas = MetricasCarga('lectura')
+    try:
+        for lote in leer_lotes(archivo_csv, encoding, metricas=metricas):
+            estadisticas['errores'] += lote.errores
+            yield from lote.filas()
+        if propias:
+            metricas.avisos.resumir()
+    except FileNotFoundError:
+        logger.error(f"No se pudo encontrar el archivo: {archivo_csv}")
+        raise
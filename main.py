@@ -1,152 +1,550 @@
+import argparse
+import asyncio
 import csv
+import glob
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+from itertools import islice
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import logging
 
+from consultas import refrescar_jerarquia, refrescar_jerarquia_async
+from deduplicacion import POLITICAS_DUPLICADOS, DeduplicadorBarrios, guardar_reporte_conflictos
+from lector_csv import (ENCODINGS, TAMANIO_LOTE, TAMANIO_MUESTRA, LoteFilas, decodificar, detectar_encoding,
+                        es_archivo_plano, leer_filas_csv, leer_lotes, procesar_fila_csv)
+from metricas import AvisosAgregados, MetricasCarga
+
 # Configurar logging para debug
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def cargar_datos_geograficos(archivo_csv, conexion_db):
+# Modos de carga disponibles: 'fila' hace un upsert por barrio (modo original),
+# 'lotes' deduplica en memoria y envía cada nivel con execute_values, y
+# 'copy' envía todo el CSV con COPY FROM STDIN y resuelve la jerarquía con
+# tres upserts por conjuntos
+MODOS_CARGA = ('fila', 'lotes', 'copy')
+
+
+def _leer_batch_size(por_defecto=100):
+    """
+    Obtiene BATCH_SIZE de la variable de entorno (ver .env.example) o, si no
+    está definida, de config.py (copia de config_example.py).
+    """
+    valor = os.environ.get('BATCH_SIZE')
+    if valor is None:
+        try:
+            import config
+            valor = getattr(config, 'BATCH_SIZE', por_defecto)
+        except ImportError:
+            valor = por_defecto
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        logger.warning(f"BATCH_SIZE inválido ({valor!r}), usando {por_defecto}")
+        return por_defecto
+    return valor if valor > 0 else por_defecto
+
+
+# Cantidad de registros por lote: commits de la carga fila a fila y tamaño
+# de página de execute_values
+BATCH_SIZE = _leer_batch_size()
+
+# Encabezado del archivo de filas rechazadas por la base de datos
+COLUMNAS_RECHAZOS = [
+    'Linea', 'Error', 'Codigo de Departamento', 'Descripcion de Departamento',
+    'Codigo de Distrito', 'Descripcion de Distrito', 'Area',
+    'Codigo de Barrio/Localidad', 'Descripcion de Barrio/Localidad',
+]
+
+
+class _LectorConOffset:
+    """
+    Iterador de líneas sobre un archivo binario que lleva la cuenta del offset
+    en bytes. Se usa como fuente de csv.reader para saber exactamente hasta dónde
+    se leyó el archivo y poder guardar/reanudar checkpoints.
+    """
+
+    def __init__(self, file, encoding):
+        self._file = file
+        self._encoding = encoding
+        self.offset = file.tell()
+
+    def saltar_a(self, offset):
+        self._file.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        linea = self._file.readline()
+        if not linea:
+            raise StopIteration
+        self.offset += len(linea)
+        texto, encoding = decodificar(linea, self._encoding)
+        if encoding != self._encoding:
+            logger.warning(f"El archivo no es {self._encoding} más allá del inicio, se continúa como {encoding}")
+            self._encoding = encoding
+        return texto
+
+
+def _filas_validas(reader, estadisticas, metricas, inicio=2):
+    """
+    Recorre el lector CSV y genera (row_num, FilaGeografica) para las filas válidas.
+    Las filas con formato incorrecto se cuentan como errores en estadisticas y
+    sus avisos se agregan en metricas.avisos. El tiempo de lectura del CSV y el
+    de validación se acumulan en las fases 'parseo' y 'validacion'.
+    """
+    tiempos = metricas.tiempos
+    avisos = metricas.avisos
+    filas = iter(reader)
+    row_num = inicio - 1  # inicio=2 porque la línea 1 es el header
+    while True:
+        antes = time.perf_counter()
+        row = next(filas, None)
+        leida = time.perf_counter()
+        tiempos['parseo'] += leida - antes
+        if row is None:
+            return
+        row_num += 1
+
+        try:
+            fila = procesar_fila_csv(row, row_num, avisos)
+        except (ValueError, IndexError) as e:
+            avisos.registrar("Error en formato de datos", row_num, e, logging.ERROR)
+            estadisticas['errores'] += 1
+            fila = None
+        tiempos['validacion'] += time.perf_counter() - leida
+
+        if fila is not None:
+            yield row_num, fila
+
+
+def _filas_con_offset(archivo_csv, estadisticas, metricas, checkpoint, offset=None, inicio=2, encoding='auto'):
+    """
+    Como leer_filas_csv pero sobre un archivo sin comprimir, leyendo línea a
+    línea con _LectorConOffset para que checkpoint['lector'] sepa el offset
+    exacto de la última fila entregada. Si se pasa offset continúa desde ahí.
+    """
+    with open(archivo_csv, 'rb') as file:
+        if encoding == 'auto':
+            encoding = detectar_encoding(file.read(TAMANIO_MUESTRA))
+            file.seek(0)
+        lector = _LectorConOffset(file, encoding)
+        checkpoint['lector'] = lector
+        reader = csv.reader(lector, delimiter=';')
+
+        # Saltar la primera línea si es header
+        header = next(reader, None)
+        logger.info(f"Procesando archivo CSV con header: {header}")
+        if offset is not None:
+            lector.saltar_a(offset)
+        yield from _filas_validas(reader, estadisticas, metricas, inicio)
+
+
+def calcular_huella_archivo(archivo_csv, bloque=1024 * 1024):
+    """
+    Calcula una huella del archivo a partir de su tamaño y de su primer y último
+    bloque, sin leerlo completo. Identifica el archivo en la tabla de checkpoints.
+    """
+    tamanio = os.path.getsize(archivo_csv)
+    huella = hashlib.sha256(str(tamanio).encode('ascii'))
+    with open(archivo_csv, 'rb') as file:
+        huella.update(file.read(bloque))
+        if tamanio > bloque:
+            file.seek(max(bloque, tamanio - bloque))
+            huella.update(file.read(bloque))
+    return huella.hexdigest()
+
+
+def _obtener_checkpoint(conexion_db, huella):
+    """Retorna el checkpoint guardado para la huella dada o None si no existe."""
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("""
+            SELECT offset_bytes, fila, filas_procesadas, errores, completado
+            FROM identidades.cargas_checkpoint
+            WHERE archivo_huella = %s
+        """, (huella,))
+        return cursor.fetchone()
+
+
+def _guardar_checkpoint(cursor, checkpoint, fila, estadisticas, completado=False):
+    """
+    Registra el avance de la carga. Se ejecuta dentro de la misma transacción
+    que el lote, así el checkpoint nunca queda por delante de los datos. Los
+    contadores guardados suman los de las corridas anteriores.
+    """
+    cursor.execute("""
+        INSERT INTO identidades.cargas_checkpoint
+            (archivo_huella, archivo, offset_bytes, fila, filas_procesadas, errores, completado)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (archivo_huella) DO UPDATE SET
+            archivo = EXCLUDED.archivo,
+            offset_bytes = EXCLUDED.offset_bytes,
+            fila = EXCLUDED.fila,
+            filas_procesadas = EXCLUDED.filas_procesadas,
+            errores = EXCLUDED.errores,
+            completado = EXCLUDED.completado,
+            updated_at = NOW()
+    """, (checkpoint['huella'], checkpoint['archivo'], checkpoint['lector'].offset, fila,
+          estadisticas.get('filas_previas', 0) + estadisticas['filas_procesadas'],
+          estadisticas.get('errores_previos', 0) + estadisticas['errores'], completado))
+    if completado:
+        # Una carga completa ya no se reanuda
+        _borrar_decisiones(cursor, checkpoint['huella'])
+
+
+def _borrar_decisiones(cursor, huella):
+    cursor.execute("DELETE FROM identidades.cargas_checkpoint_barrios WHERE archivo_huella = %s", (huella,))
+    cursor.execute("DELETE FROM identidades.cargas_checkpoint_ciudades WHERE archivo_huella = %s", (huella,))
+
+
+def _guardar_decisiones(conexion_db, huella, deduplicador, metricas):
+    """
+    Guarda con el checkpoint las decisiones de la deduplicación (claves
+    repetidas y primera línea de cada ciudad, ver DeduplicadorBarrios.decisiones),
+    así --resume filtra desde el offset sin volver a analizar el archivo.
+    """
+    inicio = time.perf_counter()
+    with conexion_db.cursor() as cursor:
+        _borrar_decisiones(cursor, huella)
+        execute_values(cursor, """
+            INSERT INTO identidades.cargas_checkpoint_barrios
+                (archivo_huella, codigo_departamento, codigo_distrito, codigo_barrio, linea, descripcion,
+                 rechazado, repeticiones, conflictos)
+            VALUES %s
+        """, [(huella, *clave, *decision) for clave, *decision in deduplicador.decisiones()], page_size=1000)
+        execute_values(cursor, """
+            INSERT INTO identidades.cargas_checkpoint_ciudades
+                (archivo_huella, codigo_departamento, codigo_distrito, linea)
+            VALUES %s
+        """, [(huella, *ciudad, linea) for ciudad, linea in deduplicador.primeras_lineas.items()], page_size=1000)
+    conexion_db.commit()
+    metricas.acumular('commit', inicio)
+    metricas.sentencias['checkpoint'] += 1
+
+
+def _obtener_decisiones(conexion_db, huella, politica):
+    """Arma un DeduplicadorBarrios con las decisiones guardadas por _guardar_decisiones."""
+    with conexion_db.cursor() as cursor:
+        cursor.execute("""
+            SELECT codigo_departamento, codigo_distrito, codigo_barrio, linea, descripcion,
+                   rechazado, repeticiones, conflictos
+            FROM identidades.cargas_checkpoint_barrios
+            WHERE archivo_huella = %s
+        """, (huella,))
+        decisiones = [((d, c, b), *decision) for d, c, b, *decision in cursor.fetchall()]
+        cursor.execute("""
+            SELECT codigo_departamento, codigo_distrito, linea
+            FROM identidades.cargas_checkpoint_ciudades
+            WHERE archivo_huella = %s
+        """, (huella,))
+        primeras_lineas = {(d, c): linea for d, c, linea in cursor.fetchall()}
+    return DeduplicadorBarrios.restaurar(politica, decisiones, primeras_lineas)
+
+
+def _mostrar_estadisticas(estadisticas):
+    """Muestra en el log el resumen de la carga."""
+    logger.info("=== ESTADÍSTICAS DE CARGA ===")
+    if estadisticas.get('filas_previas') is not None:
+        logger.info(f"Filas cargadas antes de reanudar: {estadisticas['filas_previas']} "
+                    f"({estadisticas['errores_previos']} errores)")
+    logger.info(f"Filas procesadas exitosamente: {estadisticas['filas_procesadas']}")
+    if 'insertadas' in estadisticas:
+        logger.info(f"Insertadas: {estadisticas['insertadas']}, "
+                    f"actualizadas: {estadisticas['actualizadas']}, "
+                    f"sin cambios: {estadisticas['sin_cambios']}")
+    logger.info(f"Errores encontrados: {estadisticas['errores']}")
+    if estadisticas.get('filas_duplicadas'):
+        logger.info(f"Filas repetidas descartadas: {estadisticas['filas_duplicadas']} "
+                    f"({estadisticas['conflictos']} con otro nombre, "
+                    f"{estadisticas['claves_rechazadas']} barrios rechazados)")
+    if 'metricas' in estadisticas:
+        metricas = estadisticas['metricas']
+        fases = ', '.join(f"{fase} {segundos:.2f}s" for fase, segundos in metricas['fases_segundos'].items()
+                          if segundos)
+        logger.info(f"Duración: {metricas['duracion_segundos']:.2f}s "
+                    f"({metricas['filas_por_segundo']} filas/s); por fase: {fases}")
+    logger.info("Datos cargados exitosamente!")
+
+
+TABLAS_GEOGRAFICAS = ('departamentos', 'ciudades', 'barrios')
+
+
+def _diferir_mantenimiento(conexion_db, metricas):
+    """
+    Prepara una carga inicial dentro de la transacción de la carga: borra los
+    índices no únicos de las tablas geográficas y desactiva los triggers de
+    updated_at (los upserts ya ponen updated_at = NOW()). Como el DDL de
+    PostgreSQL es transaccional, un rollback de la carga los restaura.
+    Las restricciones únicas se mantienen porque los upserts las necesitan.
+
+    Returns:
+        Diccionario con las definiciones de los índices y los triggers
+        desactivados, para _restaurar_mantenimiento
+    """
+    inicio = time.perf_counter()
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("""
+            SELECT c.relname AS nombre, pg_get_indexdef(i.indexrelid) AS definicion
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = 'identidades' AND t.relname = ANY(%s)
+                AND NOT i.indisunique AND NOT i.indisprimary
+                AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+            ORDER BY c.relname
+        """, (list(TABLAS_GEOGRAFICAS),))
+        indices = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT t.relname AS tabla, g.tgname AS nombre
+            FROM pg_trigger g
+            JOIN pg_class t ON t.oid = g.tgrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            JOIN pg_proc p ON p.oid = g.tgfoid
+            WHERE n.nspname = 'identidades' AND t.relname = ANY(%s)
+                AND p.proname = 'update_updated_at_column'
+                AND NOT g.tgisinternal AND g.tgenabled <> 'D'
+            ORDER BY g.tgname
+        """, (list(TABLAS_GEOGRAFICAS),))
+        triggers = cursor.fetchall()
+
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM identidades.barrios) AS con_datos")
+        if cursor.fetchone()['con_datos']:
+            logger.warning("Carga inicial sobre tablas con datos: los índices se reconstruirán "
+                           "recorriendo las tablas completas")
+
+        for indice in indices:
+            cursor.execute(f'DROP INDEX identidades."{indice["nombre"]}"')
+        for trigger in triggers:
+            cursor.execute(f'ALTER TABLE identidades.{trigger["tabla"]} DISABLE TRIGGER "{trigger["nombre"]}"')
+
+    logger.info(f"Carga inicial: {len(indices)} índices borrados y {len(triggers)} triggers desactivados "
+                f"hasta el final de la carga")
+    metricas.sentencias['indices'] += 3 + len(indices) + len(triggers)
+    metricas.acumular('indices', inicio)
+    return {'indices': indices, 'triggers': triggers}
+
+
+def _restaurar_mantenimiento(conexion_db, diferido, metricas):
+    """Reconstruye los índices y reactiva los triggers de _diferir_mantenimiento, antes del commit."""
+    inicio = time.perf_counter()
+    with conexion_db.cursor() as cursor:
+        for indice in diferido['indices']:
+            cursor.execute(indice['definicion'])
+        for trigger in diferido['triggers']:
+            cursor.execute(f'ALTER TABLE identidades.{trigger["tabla"]} ENABLE TRIGGER "{trigger["nombre"]}"')
+    logger.info(f"Carga inicial: {len(diferido['indices'])} índices reconstruidos y triggers reactivados")
+    metricas.sentencias['indices'] += len(diferido['indices']) + len(diferido['triggers'])
+    metricas.acumular('indices', inicio)
+
+
+def _analizar_tablas(conexion_db, metricas):
+    """Actualiza las estadísticas del planificador después de una carga inicial."""
+    inicio = time.perf_counter()
+    with conexion_db.cursor() as cursor:
+        cursor.execute("ANALYZE " + ', '.join(f"identidades.{tabla}" for tabla in TABLAS_GEOGRAFICAS))
+    conexion_db.commit()
+    metricas.sentencias['indices'] += 1
+    metricas.acumular('indices', inicio)
+
+
+def _deduplicar(archivo_csv, estadisticas, encoding, metricas, politica, archivo_duplicados=None,
+                lectura=None):
+    """
+    Analiza el archivo con DeduplicadorBarrios antes de escribir en la base y
+    retorna el deduplicador y las filas a cargar, una por barrio. La carga
+    vuelve a leer el archivo en streaming (lectura, por defecto
+    leer_filas_csv) y el deduplicador deja pasar la primera aparición de cada
+    barrio; stdin no se puede leer dos veces, así que ahí se conservan las
+    filas en memoria. Anota los contadores en estadisticas y, si se pide,
+    guarda el reporte completo.
+    """
+    avisos = metricas.avisos if metricas is not None else None
+    en_memoria = archivo_csv == '-'
+    deduplicador = DeduplicadorBarrios(politica, avisos, conservar_filas=en_memoria)
+    if en_memoria:
+        deduplicador.analizar(leer_filas_csv(archivo_csv, estadisticas, encoding, metricas))
+        filas = deduplicador.filas()
+    else:
+        deduplicador.analizar(_filas_para_deduplicar(archivo_csv, encoding, metricas))
+        if lectura is None:
+            lectura = leer_filas_csv(archivo_csv, estadisticas, encoding, metricas)
+        filas = deduplicador.filtrar(lectura)
+    deduplicador.completar_estadisticas(estadisticas)
+    if archivo_duplicados:
+        deduplicador.guardar_reporte(archivo_duplicados)
+    return deduplicador, filas
+
+
+def _filas_para_deduplicar(archivo_csv, encoding, metricas):
+    """
+    Primera lectura del archivo, solo para la deduplicación. Los errores y
+    avisos por fila no se cuentan ni se muestran: los da la lectura de la carga.
+    """
+    for lote in leer_lotes(archivo_csv, encoding, avisos=AvisosAgregados(limite=0), metricas=metricas):
+        yield from lote.filas()
+
+
+def cargar_datos_geograficos(archivo_csv, conexion_db, modo='fila', usar_checkpoint=False, reanudar=False,
+                             archivo_rechazos=None, tamanio_lote=None, archivo_metricas=None, encoding='auto',
+                             carga_inicial=False, politica_duplicados='ultimo', archivo_duplicados=None):
     """
     Carga datos geográficos desde CSV a las tablas de departamentos, ciudades y barrios
+
+    Args:
+        archivo_csv: Ruta al archivo CSV, que puede estar comprimido con gzip
+            o zstd, o '-' para leer de stdin
+        conexion_db: Conexión psycopg2 abierta, o una conexión sqlite3 para
+            cargar en SQLite (ver destino_sqlite.py; se ignoran modo,
+            checkpoint, rechazos y carga_inicial)
+        modo: 'fila' (un upsert por barrio), 'lotes' (dos pasadas con
+            execute_values) o 'copy' (COPY FROM STDIN y upserts por conjuntos,
+            con una cantidad fija de round-trips)
+        usar_checkpoint: Guarda el avance en identidades.cargas_checkpoint
+            con cada commit (solo modo 'fila'), y al empezar las decisiones
+            de la deduplicación
+        reanudar: Continúa desde el último checkpoint del archivo, saltando
+            directamente al offset guardado y con las decisiones de
+            deduplicación de la primera corrida. Implica usar_checkpoint
+        archivo_rechazos: Ruta de un CSV donde se escriben, con su número de
+            línea y el error, las filas que la base de datos rechazó (modo 'fila')
+        tamanio_lote: Registros por lote/página; por defecto BATCH_SIZE
+        archivo_metricas: Ruta donde guardar las métricas de la carga (tiempos
+            por fase, filas/s, sentencias, aciertos de cache y avisos), en JSON
+            o, si termina en .prom, como textfile de Prometheus
+        encoding: Codificación del archivo o 'auto' para detectarla (UTF-8 con
+            o sin BOM, cp1252 o latin-1)
+        carga_inicial: Para cargas sobre tablas vacías (modos 'lotes' y
+            'copy'): borra los índices no únicos y desactiva los triggers de
+            updated_at durante la carga, los reconstruye antes del commit y
+            ejecuta ANALYZE. Si la carga falla, el rollback los restaura.
+            Mientras dura la carga las tablas quedan bloqueadas para lectura
+        politica_duplicados: Qué hacer con un barrio (departamento, distrito,
+            barrio) que aparece más de una vez con otro nombre: 'ultimo',
+            'primero' o 'rechazar' (ver deduplicacion.py). Cada barrio se
+            envía a la base una sola vez
+        archivo_duplicados: Ruta de un CSV donde guardar todas las filas
+            repetidas, con la línea anterior y la resolución
+
+    Returns:
+        Diccionario con las estadísticas de la carga; las métricas quedan en
+        la clave 'metricas'
     """
-    
-    # Diccionarios para evitar duplicados y mantener referencias
-    departamentos_cache = {}
-    ciudades_cache = {}
-    
+    if modo not in MODOS_CARGA:
+        raise ValueError(f"Modo de carga desconocido: {modo}. Opciones: {', '.join(MODOS_CARGA)}")
+
+    if politica_duplicados not in POLITICAS_DUPLICADOS:
+        raise ValueError(f"Política de duplicados desconocida: {politica_duplicados}. "
+                         f"Opciones: {', '.join(POLITICAS_DUPLICADOS)}")
+
+    if isinstance(conexion_db, sqlite3.Connection):
+        return _cargar_en_sqlite(archivo_csv, conexion_db, archivo_metricas, encoding,
+                                 politica_duplicados, archivo_duplicados)
+
+    usar_checkpoint = usar_checkpoint or reanudar
+    if modo != 'fila' and usar_checkpoint:
+        logger.warning(f"El modo {modo} carga todo en una sola transacción; se ignora el checkpoint")
+        usar_checkpoint = reanudar = False
+    if modo == 'fila' and carga_inicial:
+        logger.warning("La carga inicial necesita una sola transacción (modos lotes y copy); se ignora")
+        carga_inicial = False
+    tamanio_lote = tamanio_lote or BATCH_SIZE
+
     # Contadores para estadísticas
-    filas_procesadas = 0
-    errores = 0
-    
+    estadisticas = {'filas_procesadas': 0, 'errores': 0}
+    metricas = MetricasCarga(modo)
+
     try:
-        with open(archivo_csv, 'r', encoding='latin-1') as file:
-            # Leer el CSV con delimitador punto y coma
-            reader = csv.reader(file, delimiter=';')
-            
-            # Saltar la primera línea si es header
-            header = next(reader, None)
-            logger.info(f"Procesando archivo CSV con header: {header}")
-            
-            with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
-                for row_num, row in enumerate(reader, start=2):  # Start=2 porque line 1 es header
-                    try:
-                        if len(row) < 8:  # Verificar que tenga todas las columnas
-                            logger.warning(f"Fila {row_num}: Datos insuficientes, saltando")
-                            continue
-                            
-                        # Extraer datos de la fila con validación
-                        try:
-                            codigo_departamento = int(row[1].strip())
-                            desc_departamento = row[2].strip()
-                            codigo_distrito = int(row[3].strip())
-                            desc_distrito = row[4].strip()
-                            area = int(row[5].strip())
-                            codigo_barrio = int(row[6].strip())
-                            desc_barrio = row[7].strip()
-                        except (ValueError, IndexError) as e:
-                            logger.error(f"Fila {row_num}: Error en formato de datos: {e}")
-                            errores += 1
-                            continue
-                        
-                        # Validar que las descripciones no estén vacías
-                        if not desc_departamento or not desc_distrito or not desc_barrio:
-                            logger.warning(f"Fila {row_num}: Descripciones vacías, saltando")
-                            continue
-                        
-                        # 1. Insertar/obtener departamento
-                        dept_key = (codigo_departamento, desc_departamento)
-                        if dept_key not in departamentos_cache:
-                            try:
-                                cursor.execute("""
-                                    INSERT INTO identidades.departamentos (codigo, descripcion)
-                                    VALUES (%s, %s)
-                                    ON CONFLICT (codigo) DO UPDATE SET 
-                                        descripcion = EXCLUDED.descripcion,
-                                        updated_at = NOW()
-                                    RETURNING id
-                                """, (codigo_departamento, desc_departamento))
-                                
-                                result = cursor.fetchone()
-                                if result:
-                                    dept_id = result['id']
-                                    departamentos_cache[dept_key] = dept_id
-                                else:
-                                    logger.error(f"Fila {row_num}: No se pudo obtener ID del departamento")
-                                    errores += 1
-                                    continue
-                            except psycopg2.Error as e:
-                                logger.error(f"Fila {row_num}: Error insertando departamento: {e}")
-                                errores += 1
-                                continue
-                        else:
-                            dept_id = departamentos_cache[dept_key]
-                        
-                        # 2. Insertar/obtener ciudad
-                        ciudad_key = (codigo_distrito, desc_distrito, codigo_departamento)
-                        if ciudad_key not in ciudades_cache:
-                            try:
-                                cursor.execute("""
-                                    INSERT INTO identidades.ciudades (codigo, descripcion, area, departamento_id)
-                                    VALUES (%s, %s, %s, %s)
-                                    ON CONFLICT (codigo, departamento_id) DO UPDATE SET 
-                                        descripcion = EXCLUDED.descripcion,
-                                        area = EXCLUDED.area,
-                                        updated_at = NOW()
-                                    RETURNING id
-                                """, (codigo_distrito, desc_distrito, area, dept_id))
-                                
-                                result = cursor.fetchone()
-                                if result:
-                                    ciudad_id = result['id']
-                                    ciudades_cache[ciudad_key] = ciudad_id
-                                else:
-                                    logger.error(f"Fila {row_num}: No se pudo obtener ID de la ciudad")
-                                    errores += 1
-                                    continue
-                            except psycopg2.Error as e:
-                                logger.error(f"Fila {row_num}: Error insertando ciudad: {e}")
-                                errores += 1
-                                continue
-                        else:
-                            ciudad_id = ciudades_cache[ciudad_key]
-                        
-                        # 3. Insertar barrio
-                        try:
-                            cursor.execute("""
-                                INSERT INTO identidades.barrios (codigo, descripcion, ciudad_id)
-                                VALUES (%s, %s, %s)
-                                ON CONFLICT (codigo, ciudad_id) DO UPDATE SET 
-                                    descripcion = EXCLUDED.descripcion,
-                                    updated_at = NOW()
-                            """, (codigo_barrio, desc_barrio, ciudad_id))
-                        except psycopg2.Error as e:
-                            logger.error(f"Fila {row_num}: Error insertando barrio: {e}")
-                            errores += 1
-                            continue
-                        
-                        filas_procesadas += 1
-                        
-                        # Commit cada 100 registros para evitar transacciones muy largas
-                        if filas_procesadas % 100 == 0:
-                            conexion_db.commit()
-                            logger.info(f"Procesadas {filas_procesadas} filas...")
-                            
-                    except Exception as e:
-                        logger.error(f"Fila {row_num}: Error inesperado: {e}")
-                        errores += 1
-                        continue
-                
-                # Commit final
-                conexion_db.commit()
-                
-                # Mostrar estadísticas de la carga
-                logger.info("=== ESTADÍSTICAS DE CARGA ===")
-                logger.info(f"Filas procesadas exitosamente: {filas_procesadas}")
-                logger.info(f"Errores encontrados: {errores}")
-                logger.info("Datos cargados exitosamente!")
-                
+        if usar_checkpoint and not es_archivo_plano(archivo_csv):
+            logger.warning("El checkpoint necesita un archivo sin comprimir (no stdin); se ignora")
+            usar_checkpoint = reanudar = False
+
+        checkpoint = None
+        vistos = None
+        inicio = 2
+        if usar_checkpoint:
+            checkpoint = {'huella': calcular_huella_archivo(archivo_csv), 'archivo': archivo_csv, 'lector': None}
+            previo = _obtener_checkpoint(conexion_db, checkpoint['huella']) if reanudar else None
+            if previo:
+                # Las filas de las corridas anteriores se informan aparte: filas_procesadas,
+                # insertadas, actualizadas y sin_cambios cuentan solo lo de esta corrida
+                estadisticas['filas_previas'] = previo['filas_procesadas']
+                estadisticas['errores_previos'] = previo['errores']
+            if previo and previo['completado']:
+                logger.info("El archivo ya fue cargado completamente según el checkpoint, nada que hacer")
+                return estadisticas
+            if previo:
+                # Las decisiones de la deduplicación se guardaron al empezar la carga:
+                # la lectura arranca directamente en el offset
+                offset = previo['offset_bytes']
+                inicio = previo['fila'] + 1
+                logger.info(f"Reanudando carga desde la fila {inicio} (offset {offset})")
+                if archivo_duplicados:
+                    logger.warning("El reporte de duplicados lo escribe la corrida que analiza el archivo; "
+                                   "al reanudar no se genera")
+                deduplicador = _obtener_decisiones(conexion_db, checkpoint['huella'], politica_duplicados)
+                deduplicador.completar_estadisticas(estadisticas)
+                filas = deduplicador.filtrar(
+                    _filas_con_offset(archivo_csv, estadisticas, metricas, checkpoint, offset, inicio, encoding))
+                vistos = _padres_vistos(deduplicador.primeras_lineas, inicio)
+            else:
+                # El checkpoint guarda offsets de la lectura en streaming de la carga
+                deduplicador, filas = _deduplicar(
+                    archivo_csv, estadisticas, encoding, metricas, politica_duplicados, archivo_duplicados,
+                    _filas_con_offset(archivo_csv, estadisticas, metricas, checkpoint, None, inicio, encoding))
+                _guardar_decisiones(conexion_db, checkpoint['huella'], deduplicador, metricas)
+        else:
+            _, filas = _deduplicar(archivo_csv, estadisticas, encoding, metricas, politica_duplicados,
+                                   archivo_duplicados)
+
+        antes_del_commit = None
+        if carga_inicial:
+            diferido = _diferir_mantenimiento(conexion_db, metricas)
+            antes_del_commit = partial(_restaurar_mantenimiento, conexion_db, diferido, metricas)
+
+        if modo == 'copy':
+            _cargar_con_copy(filas, conexion_db, estadisticas, metricas, antes_del_commit)
+        elif modo == 'lotes':
+            _cargar_por_lotes(filas, conexion_db, estadisticas, tamanio_lote, metricas, antes_del_commit)
+        elif archivo_rechazos:
+            with open(archivo_rechazos, 'a' if inicio > 2 else 'w', encoding='latin-1', newline='') as f:
+                rechazos = csv.writer(f, delimiter=';')
+                if inicio == 2:
+                    rechazos.writerow(COLUMNAS_RECHAZOS)
+                _cargar_fila_a_fila(filas, conexion_db, estadisticas, checkpoint, inicio,
+                                    rechazos=rechazos, tamanio_lote=tamanio_lote, metricas=metricas,
+                                    vistos=vistos)
+        else:
+            _cargar_fila_a_fila(filas, conexion_db, estadisticas, checkpoint, inicio,
+                                tamanio_lote=tamanio_lote, metricas=metricas, vistos=vistos)
+        if carga_inicial:
+            _analizar_tablas(conexion_db, metricas)
+        inicio_vista = time.perf_counter()
+        if refrescar_jerarquia(conexion_db):
+            metricas.sentencias['vista'] += 2
+        metricas.acumular('vista', inicio_vista)
+
+        # Mostrar estadísticas de la carga
+        metricas.finalizar()
+        estadisticas['metricas'] = metricas.a_dict(estadisticas)
+        if archivo_metricas:
+            metricas.guardar(archivo_metricas, estadisticas)
+        _mostrar_estadisticas(estadisticas)
+        return estadisticas
+
     except FileNotFoundError:
         logger.error(f"No se pudo encontrar el archivo: {archivo_csv}")
         raise
@@ -155,42 +553,1623 @@ def cargar_datos_geograficos(archivo_csv, conexion_db):
         conexion_db.rollback()
         raise
 
+
+def _cargar_en_sqlite(archivo_csv, conexion_db, archivo_metricas=None, encoding='auto',
+                      politica_duplicados='ultimo', archivo_duplicados=None):
+    """
+    Carga en SQLite: la primera pasada de la carga por lotes y un executemany
+    por nivel en una sola transacción (destino_sqlite.cargar_en_sqlite).
+    """
+    from destino_sqlite import cargar_en_sqlite, crear_esquema_sqlite
+
+    estadisticas = {'filas_procesadas': 0, 'errores': 0}
+    metricas = MetricasCarga('sqlite')
+    try:
+        crear_esquema_sqlite(conexion_db)
+        _, filas = _deduplicar(archivo_csv, estadisticas, encoding, metricas, politica_duplicados,
+                               archivo_duplicados)
+        departamentos, ciudades, barrios = _deduplicar_filas(filas, estadisticas)
+        cargar_en_sqlite(conexion_db, departamentos, ciudades, barrios, estadisticas, metricas)
+    except FileNotFoundError:
+        logger.error(f"No se pudo encontrar el archivo: {archivo_csv}")
+        raise
+    except Exception as e:
+        logger.error(f"Error general en la carga: {e}")
+        raise
+
+    metricas.finalizar()
+    estadisticas['metricas'] = metricas.a_dict(estadisticas)
+    if archivo_metricas:
+        metricas.guardar(archivo_metricas, estadisticas)
+    _mostrar_estadisticas(estadisticas)
+    return estadisticas
+
+
+# Upserts que no reescriben filas sin cambios: el WHERE del DO UPDATE descarta
+# los conflictos cuyos datos son iguales, así una recarga del mismo archivo no
+# genera tuplas muertas, WAL ni dispara los triggers de updated_at. Como en ese
+# caso RETURNING no devuelve nada, departamentos y ciudades buscan el id
+# existente en la misma sentencia.
+SQL_UPSERT_DEPARTAMENTO = """
+    WITH upsert AS (
+        INSERT INTO identidades.departamentos AS d (codigo, descripcion)
+        VALUES (%(codigo)s, %(descripcion)s)
+        ON CONFLICT (codigo) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            updated_at = NOW()
+        WHERE d.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+        RETURNING id
+    )
+    SELECT id FROM upsert
+    UNION ALL
+    SELECT id FROM identidades.departamentos
+    WHERE codigo = %(codigo)s AND NOT EXISTS (SELECT 1 FROM upsert)
+"""
+
+SQL_UPSERT_CIUDAD = """
+    WITH upsert AS (
+        INSERT INTO identidades.ciudades AS c (codigo, descripcion, area, departamento_id)
+        VALUES (%(codigo)s, %(descripcion)s, %(area)s, %(departamento_id)s)
+        ON CONFLICT (codigo, departamento_id) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            area = EXCLUDED.area,
+            updated_at = NOW()
+        WHERE (c.descripcion, c.area) IS DISTINCT FROM (EXCLUDED.descripcion, EXCLUDED.area)
+        RETURNING id
+    )
+    SELECT id FROM upsert
+    UNION ALL
+    SELECT id FROM identidades.ciudades
+    WHERE codigo = %(codigo)s AND departamento_id = %(departamento_id)s
+        AND NOT EXISTS (SELECT 1 FROM upsert)
+"""
+
+# xmax = 0 solo en filas recién insertadas; sin fila devuelta = sin cambios
+SQL_UPSERT_BARRIO = """
+    INSERT INTO identidades.barrios AS b (codigo, descripcion, ciudad_id)
+    VALUES (%(codigo)s, %(descripcion)s, %(ciudad_id)s)
+    ON CONFLICT (codigo, ciudad_id) DO UPDATE SET
+        descripcion = EXCLUDED.descripcion,
+        updated_at = NOW()
+    WHERE b.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+    RETURNING (xmax = 0) AS insertado
+"""
+
+
+def _precargar_caches(cursor):
+    """
+    Llena los caches de departamentos y ciudades con una consulta por tabla,
+    usando como clave las restricciones únicas reales: codigo para departamentos
+    y (codigo, departamento_id) para ciudades.
+
+    Returns:
+        Tupla (departamentos_cache, ciudades_cache). Los valores son
+        (id, descripcion, visto) y (id, descripcion, area, vista)
+        respectivamente; visto/vista indica si el registro ya se comparó con
+        el archivo en esta carga.
+    """
+    cursor.execute("SELECT codigo, id, descripcion FROM identidades.departamentos")
+    departamentos_cache = {r['codigo']: (r['id'], r['descripcion'], False) for r in cursor.fetchall()}
+
+    cursor.execute("SELECT codigo, departamento_id, id, descripcion, area FROM identidades.ciudades")
+    ciudades_cache = {(r['codigo'], r['departamento_id']): (r['id'], r['descripcion'], r['area'], False)
+                      for r in cursor.fetchall()}
+
+    logger.info(f"Caches precargados: {len(departamentos_cache)} departamentos, "
+                f"{len(ciudades_cache)} ciudades")
+    return departamentos_cache, ciudades_cache
+
+
+def _upsert_fila(cursor, fila, departamentos_cache, ciudades_cache, cambios_cache, metricas):
+    """
+    Inserta/actualiza el departamento, la ciudad y el barrio de una fila.
+    Los padres solo se envían a la base si son nuevos o cambiaron respecto del
+    cache. Cada entrada de cache modificada se anota en cambios_cache con su
+    valor anterior para poder restaurarla si el lote se revierte. El tiempo,
+    las sentencias y los aciertos de cache de cada nivel se acumulan en metricas.
+    Lanza psycopg2.Error si falla.
+
+    Returns:
+        'insertadas', 'actualizadas' o 'sin_cambios' según lo ocurrido con el barrio
+    """
+    inicio = time.perf_counter()
+    sentencias = metricas.sentencias
+    cache = metricas.cache
+
+    # 1. Insertar/obtener departamento. Como en los demás modos, departamentos y
+    # ciudades toman los datos de su primera fila en el archivo: solo se comparan
+    # la primera vez que aparecen
+    dept_key = fila.codigo_departamento
+    departamento = departamentos_cache.get(dept_key)
+    if departamento is not None and not departamento[2] and departamento[1] == fila.desc_departamento:
+        cambios_cache.append((departamentos_cache, dept_key, departamento))
+        departamento = departamentos_cache[dept_key] = departamento[:2] + (True,)
+        cache['departamentos'][0] += 1
+    elif departamento is None or not departamento[2]:
+        cursor.execute(SQL_UPSERT_DEPARTAMENTO, {
+            'codigo': fila.codigo_departamento, 'descripcion': fila.desc_departamento,
+        })
+        cambios_cache.append((departamentos_cache, dept_key, departamento))
+        departamento = departamentos_cache[dept_key] = (cursor.fetchone()['id'], fila.desc_departamento, True)
+        sentencias['departamentos'] += 1
+        cache['departamentos'][1] += 1
+    else:
+        cache['departamentos'][0] += 1
+    dept_id = departamento[0]
+    inicio = metricas.acumular('departamentos', inicio)
+
+    # 2. Insertar/obtener ciudad
+    ciudad_key = (fila.codigo_distrito, dept_id)
+    ciudad = ciudades_cache.get(ciudad_key)
+    if ciudad is not None and not ciudad[3] and ciudad[1:3] == (fila.desc_distrito, fila.area):
+        cambios_cache.append((ciudades_cache, ciudad_key, ciudad))
+        ciudad = ciudades_cache[ciudad_key] = ciudad[:3] + (True,)
+        cache['ciudades'][0] += 1
+    elif ciudad is None or not ciudad[3]:
+        cursor.execute(SQL_UPSERT_CIUDAD, {
+            'codigo': fila.codigo_distrito, 'descripcion': fila.desc_distrito,
+            'area': fila.area, 'departamento_id': dept_id,
+        })
+        cambios_cache.append((ciudades_cache, ciudad_key, ciudad))
+        ciudad = ciudades_cache[ciudad_key] = (cursor.fetchone()['id'], fila.desc_distrito, fila.area, True)
+        sentencias['ciudades'] += 1
+        cache['ciudades'][1] += 1
+    else:
+        cache['ciudades'][0] += 1
+    ciudad_id = ciudad[0]
+    inicio = metricas.acumular('ciudades', inicio)
+
+    # 3. Insertar barrio
+    cursor.execute(SQL_UPSERT_BARRIO, {
+        'codigo': fila.codigo_barrio, 'descripcion': fila.desc_barrio, 'ciudad_id': ciudad_id,
+    })
+    result = cursor.fetchone()
+    sentencias['barrios'] += 1
+    metricas.acumular('barrios', inicio)
+    if result is None:
+        return 'sin_cambios'
+    return 'insertadas' if result['insertado'] else 'actualizadas'
+
+
+def _ejecutar_lote(cursor, lote, departamentos_cache, ciudades_cache, estadisticas, metricas, rechazos=None):
+    """
+    Ejecuta un lote de filas dentro de un SAVEPOINT. Si el lote falla se revierte
+    solo el savepoint y se divide en mitades hasta aislar las filas con error;
+    el resto del lote se carga igual y la transacción nunca queda abortada.
+    """
+    cambios_cache = []
+    resultados = {'insertadas': 0, 'actualizadas': 0, 'sin_cambios': 0}
+    cursor.execute("SAVEPOINT lote_carga")
+    metricas.sentencias['savepoint'] += 2  # SAVEPOINT y su RELEASE
+    try:
+        for row_num, fila in lote:
+            resultados[_upsert_fila(cursor, fila, departamentos_cache, ciudades_cache, cambios_cache,
+                                    metricas)] += 1
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT lote_carga")
+        cursor.execute("RELEASE SAVEPOINT lote_carga")
+        metricas.sentencias['savepoint'] += 1
+        # Los IDs obtenidos dentro del savepoint revertido ya no son válidos
+        for cache, clave, anterior in reversed(cambios_cache):
+            if anterior is None:
+                cache.pop(clave, None)
+            else:
+                cache[clave] = anterior
+
+        if len(lote) == 1:
+            row_num, fila = lote[0]
+            error = str(e).strip()
+            metricas.avisos.registrar("Error insertando datos", row_num, error, logging.ERROR)
+            estadisticas['errores'] += 1
+            if rechazos is not None:
+                rechazos.writerow([row_num, error] + list(fila))
+            return
+
+        mitad = len(lote) // 2
+        _ejecutar_lote(cursor, lote[:mitad], departamentos_cache, ciudades_cache, estadisticas, metricas, rechazos)
+        _ejecutar_lote(cursor, lote[mitad:], departamentos_cache, ciudades_cache, estadisticas, metricas, rechazos)
+        return
+
+    cursor.execute("RELEASE SAVEPOINT lote_carga")
+    estadisticas['filas_procesadas'] += len(lote)
+    for clave, cantidad in resultados.items():
+        estadisticas[clave] = estadisticas.get(clave, 0) + cantidad
+
+
+def _padres_vistos(primeras_lineas, inicio):
+    """
+    Retorna los códigos de los departamentos y las claves (codigo_departamento,
+    codigo_distrito) de las ciudades cuya primera fila cargada está antes de la
+    línea inicio, es decir, los que una carga reanudada ya escribió con su
+    primera fila. primeras_lineas es {(codigo_departamento, codigo_distrito): linea}.
+    """
+    ciudades = {ciudad for ciudad, linea in primeras_lineas.items() if linea < inicio}
+    return {codigo_departamento for codigo_departamento, _ in ciudades}, ciudades
+
+
+def _marcar_vistos(departamentos_cache, ciudades_cache, departamentos, ciudades):
+    """Marca como ya comparados con el archivo los padres precargados de una carga reanudada."""
+    for codigo in departamentos:
+        departamento = departamentos_cache.get(codigo)
+        if departamento is not None:
+            departamentos_cache[codigo] = departamento[:2] + (True,)
+    for codigo_departamento, codigo in ciudades:
+        departamento = departamentos_cache.get(codigo_departamento)
+        clave = (codigo, departamento[0]) if departamento is not None else None
+        if clave in ciudades_cache:
+            ciudades_cache[clave] = ciudades_cache[clave][:3] + (True,)
+
+
+def _cargar_fila_a_fila(filas, conexion_db, estadisticas, checkpoint=None, inicio=2, rechazos=None,
+                        tamanio_lote=None, metricas=None, vistos=None):
+    """
+    Carga las filas con un upsert por barrio, resolviendo departamentos y ciudades
+    con un cache en memoria precargado desde la base. Las filas se ejecutan en
+    lotes de BATCH_SIZE aislados con SAVEPOINT y se hace commit después de cada
+    lote; si se indica un checkpoint, el avance se registra en la misma transacción.
+    Al reanudar, vistos trae los departamentos y ciudades cuya primera fila quedó
+    antes del checkpoint (ver _padres_vistos): sus datos ya se decidieron y no
+    se vuelven a comparar con las filas siguientes.
+    """
+    tamanio_lote = tamanio_lote or BATCH_SIZE
+    propias = metricas is None
+    if propias:
+        metricas = MetricasCarga('fila')
+    row_num = inicio - 1
+    lote = []
+
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        # Diccionarios para evitar duplicados y mantener referencias
+        departamentos_cache, ciudades_cache = _precargar_caches(cursor)
+        metricas.sentencias['precarga'] += 2
+        if vistos:
+            _marcar_vistos(departamentos_cache, ciudades_cache, *vistos)
+
+        for row_num, fila in filas:
+            lote.append((row_num, fila))
+
+            # Commit cada lote para evitar transacciones muy largas
+            if len(lote) >= tamanio_lote:
+                _ejecutar_lote(cursor, lote, departamentos_cache, ciudades_cache, estadisticas, metricas, rechazos)
+                lote = []
+                if checkpoint:
+                    _guardar_checkpoint(cursor, checkpoint, row_num, estadisticas)
+                    metricas.sentencias['checkpoint'] += 1
+                antes = time.perf_counter()
+                conexion_db.commit()
+                metricas.acumular('commit', antes)
+                metricas.sentencias['commit'] += 1
+                metricas.progreso(estadisticas['filas_procesadas'])
+
+        if lote:
+            _ejecutar_lote(cursor, lote, departamentos_cache, ciudades_cache, estadisticas, metricas, rechazos)
+
+        # Commit final
+        if checkpoint:
+            _guardar_checkpoint(cursor, checkpoint, row_num, estadisticas, completado=True)
+            metricas.sentencias['checkpoint'] += 1
+        antes = time.perf_counter()
+        conexion_db.commit()
+        metricas.acumular('commit', antes)
+        metricas.sentencias['commit'] += 1
+
+    if propias:
+        metricas.avisos.resumir()
+
+
+def _deduplicar_filas(filas, estadisticas):
+    """
+    Deduplica en memoria departamentos, ciudades y barrios con los mismos
+    criterios que la carga fila a fila: departamentos y ciudades toman los
+    datos de su primera fila y un barrio repetido, los de la última.
+
+    Returns:
+        Tupla de diccionarios (departamentos, ciudades, barrios):
+        {codigo: descripcion}, {(codigo_departamento, codigo_distrito):
+        (descripcion, area)} y {(codigo_departamento, codigo_distrito,
+        codigo_barrio): descripcion}
+    """
+    departamentos = {}
+    ciudades = {}
+    barrios = {}
+    for row_num, fila in filas:
+        departamentos.setdefault(fila.codigo_departamento, fila.desc_departamento)
+        ciudades.setdefault((fila.codigo_departamento, fila.codigo_distrito),
+                            (fila.desc_distrito, fila.area))
+        barrios[(fila.codigo_departamento, fila.codigo_distrito, fila.codigo_barrio)] = fila.desc_barrio
+        estadisticas['filas_procesadas'] += 1
+    logger.info(f"Primera pasada: {len(departamentos)} departamentos, {len(ciudades)} ciudades, "
+                f"{len(barrios)} barrios únicos")
+    return departamentos, ciudades, barrios
+
+
+def _cargar_por_lotes(filas, conexion_db, estadisticas, tamanio_lote, metricas, antes_del_commit=None):
+    """
+    Carga en dos pasadas. La primera deduplica en memoria departamentos,
+    ciudades y barrios (con los mismos criterios que la carga fila a fila); la
+    segunda envía cada nivel en páginas de execute_values con RETURNING y usa
+    esos IDs para resolver las claves foráneas del nivel siguiente.
+    antes_del_commit se ejecuta dentro de la transacción, al terminar.
+    """
+    # Primera pasada: deduplicar en memoria
+    departamentos, ciudades, barrios = _deduplicar_filas(filas, estadisticas)
+
+    # Segunda pasada: un nivel por vez
+    with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+        departamentos_cache, ciudades_cache = _escribir_padres(cursor, departamentos, ciudades,
+                                                               tamanio_lote, metricas)
+        _escribir_barrios(cursor, barrios, departamentos_cache, ciudades_cache, estadisticas,
+                          tamanio_lote, metricas)
+
+    if antes_del_commit:
+        antes_del_commit()
+    inicio = time.perf_counter()
+    conexion_db.commit()
+    metricas.acumular('commit', inicio)
+    metricas.sentencias['commit'] += 1
+
+
+def _escribir_padres(cursor, departamentos, ciudades, tamanio_lote, metricas):
+    """
+    Envía los departamentos y ciudades deduplicados por _deduplicar_filas con
+    execute_values. Los IDs existentes salen del cache precargado, así solo
+    se envían los padres nuevos o modificados.
+
+    Returns:
+        Tupla (departamentos_cache, ciudades_cache) con los IDs de todos los
+        padres, como la de _precargar_caches
+    """
+    departamentos_cache, ciudades_cache = _precargar_caches(cursor)
+    metricas.sentencias['precarga'] += 2
+
+    # 1. Departamentos
+    inicio = time.perf_counter()
+    pendientes = [(codigo, desc) for codigo, desc in departamentos.items()
+                  if departamentos_cache.get(codigo, (None, None))[1] != desc]
+    _contar_pendientes(metricas, 'departamentos', len(departamentos), len(pendientes), tamanio_lote)
+    for r in execute_values(cursor, """
+        INSERT INTO identidades.departamentos AS d (codigo, descripcion) VALUES %s
+        ON CONFLICT (codigo) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            updated_at = NOW()
+        RETURNING codigo, id
+    """, pendientes, page_size=tamanio_lote, fetch=True):
+        departamentos_cache[r['codigo']] = (r['id'], departamentos[r['codigo']])
+    logger.info(f"Departamentos insertados/actualizados: {len(pendientes)}")
+    inicio = metricas.acumular('departamentos', inicio)
+
+    # 2. Ciudades
+    pendientes = []
+    for (codigo_dept, codigo), (desc, area) in ciudades.items():
+        dept_id = departamentos_cache[codigo_dept][0]
+        if ciudades_cache.get((codigo, dept_id), (None,) * 4)[1:3] != (desc, area):
+            pendientes.append((codigo, desc, area, dept_id))
+    _contar_pendientes(metricas, 'ciudades', len(ciudades), len(pendientes), tamanio_lote)
+    for r in execute_values(cursor, """
+        INSERT INTO identidades.ciudades AS c (codigo, descripcion, area, departamento_id) VALUES %s
+        ON CONFLICT (codigo, departamento_id) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            area = EXCLUDED.area,
+            updated_at = NOW()
+        RETURNING codigo, departamento_id, id
+    """, pendientes, page_size=tamanio_lote, fetch=True):
+        ciudades_cache[(r['codigo'], r['departamento_id'])] = (r['id'],)
+    logger.info(f"Ciudades insertadas/actualizadas: {len(pendientes)}")
+    metricas.acumular('ciudades', inicio)
+    return departamentos_cache, ciudades_cache
+
+
+def _escribir_barrios(cursor, barrios, departamentos_cache, ciudades_cache, estadisticas, tamanio_lote,
+                      metricas):
+    """
+    Envía los barrios deduplicados con execute_values, resolviendo su ciudad
+    con los caches de _escribir_padres, y anota en estadisticas las filas
+    insertadas, actualizadas y sin cambios.
+    """
+    inicio = time.perf_counter()
+    valores = []
+    for (codigo_dept, codigo_distrito, codigo), desc in barrios.items():
+        dept_id = departamentos_cache[codigo_dept][0]
+        valores.append((codigo, desc, ciudades_cache[(codigo_distrito, dept_id)][0]))
+    resultado = execute_values(cursor, """
+        INSERT INTO identidades.barrios AS b (codigo, descripcion, ciudad_id) VALUES %s
+        ON CONFLICT (codigo, ciudad_id) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            updated_at = NOW()
+        WHERE b.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+        RETURNING (xmax = 0) AS insertado
+    """, valores, page_size=tamanio_lote, fetch=True)
+    insertadas = sum(1 for r in resultado if r['insertado'])
+    estadisticas['insertadas'] = insertadas
+    estadisticas['actualizadas'] = len(resultado) - insertadas
+    estadisticas['sin_cambios'] = estadisticas['filas_procesadas'] - len(resultado)
+    logger.info(f"Barrios enviados: {len(valores)}")
+    metricas.sentencias['barrios'] += math.ceil(len(valores) / tamanio_lote)
+    metricas.acumular('barrios', inicio)
+
+
+def _contar_pendientes(metricas, nivel, total, pendientes, tamanio_lote):
+    """Anota aciertos de cache y páginas de execute_values de un nivel de la carga por lotes."""
+    metricas.cache[nivel][0] += total - pendientes
+    metricas.cache[nivel][1] += pendientes
+    metricas.sentencias[nivel] += math.ceil(pendientes / tamanio_lote)
+
+
+class _FlujoCopy:
+    """
+    Adaptador tipo archivo para COPY FROM STDIN. Genera las líneas bajo demanda
+    a partir de un iterador, así el CSV nunca se arma completo en memoria.
+    """
+
+    def __init__(self, lineas):
+        self._lineas = lineas
+        self._pendiente = ''
+
+    def read(self, size=-1):
+        partes = [self._pendiente]
+        largo = len(self._pendiente)
+        while size < 0 or largo < size:
+            linea = next(self._lineas, None)
+            if linea is None:
+                break
+            partes.append(linea)
+            largo += len(linea)
+
+        datos = ''.join(partes)
+        if size < 0:
+            self._pendiente = ''
+            return datos
+        self._pendiente = datos[size:]
+        return datos[:size]
+
+    def readline(self, size=-1):
+        if self._pendiente:
+            linea, self._pendiente = self._pendiente, ''
+            return linea
+        return next(self._lineas, '')
+
+
+def _escapar_copy(valor):
+    """Escapa un texto para el formato text de COPY."""
+    return (valor.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _lineas_copy(filas):
+    """Convierte (row_num, FilaGeografica) en líneas del formato text de COPY."""
+    for row_num, fila in filas:
+        yield (f"{row_num}\t{fila.codigo_departamento}\t{_escapar_copy(fila.desc_departamento)}\t"
+               f"{fila.codigo_distrito}\t{_escapar_copy(fila.desc_distrito)}\t{fila.area}\t"
+               f"{fila.codigo_barrio}\t{_escapar_copy(fila.desc_barrio)}\n")
+
+
+def _cargar_con_copy(filas, conexion_db, estadisticas, metricas, antes_del_commit=None):
+    """
+    Carga el CSV en una tabla temporal con COPY FROM STDIN y luego completa
+    departamentos, ciudades y barrios con tres upserts por conjuntos.
+    La cantidad de round-trips es fija sin importar el tamaño del archivo.
+
+    Se respetan los mismos criterios que los demás modos: departamentos y
+    ciudades toman la descripción y el área de su primera fila en el archivo
+    y, si un barrio aparece repetido, gana la última aparición (con la
+    deduplicación previa ya llega una sola fila por barrio). La fase 'copy' de las métricas no
+    incluye el parseo ni la validación del CSV, que ocurren durante el COPY.
+    antes_del_commit se ejecuta dentro de la transacción, al terminar.
+    """
+    sentencias = metricas.sentencias
+    with conexion_db.cursor() as cursor:
+        inicio = time.perf_counter()
+        cursor.execute("""
+            CREATE TEMP TABLE tmp_carga_geografica (
+                linea INTEGER NOT NULL,
+                codigo_departamento INTEGER NOT NULL,
+                desc_departamento TEXT NOT NULL,
+                codigo_distrito INTEGER NOT NULL,
+                desc_distrito TEXT NOT NULL,
+                area INTEGER,
+                codigo_barrio INTEGER NOT NULL,
+                desc_barrio TEXT NOT NULL
+            ) ON COMMIT DROP
+        """)
+
+        lectura_previa = metricas.tiempos['parseo'] + metricas.tiempos['validacion']
+        flujo = _FlujoCopy(_lineas_copy(filas))
+        cursor.copy_expert("""
+            COPY tmp_carga_geografica (linea, codigo_departamento, desc_departamento,
+                codigo_distrito, desc_distrito, area, codigo_barrio, desc_barrio)
+            FROM STDIN
+        """, flujo)
+        estadisticas['filas_procesadas'] = cursor.rowcount
+        logger.info(f"Copiadas {cursor.rowcount} filas a la tabla temporal")
+        sentencias['copy'] += 2  # CREATE TEMP TABLE y COPY
+        inicio = metricas.acumular('copy', inicio)
+        metricas.tiempos['copy'] -= metricas.tiempos['parseo'] + metricas.tiempos['validacion'] - lectura_previa
+
+        # 1. Departamentos
+        cursor.execute("""
+            INSERT INTO identidades.departamentos (codigo, descripcion)
+            SELECT DISTINCT ON (t.codigo_departamento)
+                t.codigo_departamento, t.desc_departamento
+            FROM tmp_carga_geografica t
+            ORDER BY t.codigo_departamento, t.linea
+            ON CONFLICT (codigo) DO UPDATE SET
+                descripcion = EXCLUDED.descripcion,
+                updated_at = NOW()
+            WHERE departamentos.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+        """)
+        logger.info(f"Departamentos insertados/actualizados: {cursor.rowcount}")
+        sentencias['departamentos'] += 1
+        inicio = metricas.acumular('departamentos', inicio)
+
+        # 2. Ciudades
+        cursor.execute("""
+            INSERT INTO identidades.ciudades (codigo, descripcion, area, departamento_id)
+            SELECT DISTINCT ON (t.codigo_departamento, t.codigo_distrito)
+                t.codigo_distrito, t.desc_distrito, t.area, d.id
+            FROM tmp_carga_geografica t
+            JOIN identidades.departamentos d ON d.codigo = t.codigo_departamento
+            ORDER BY t.codigo_departamento, t.codigo_distrito, t.linea
+            ON CONFLICT (codigo, departamento_id) DO UPDATE SET
+                descripcion = EXCLUDED.descripcion,
+                area = EXCLUDED.area,
+                updated_at = NOW()
+            WHERE (ciudades.descripcion, ciudades.area)
+                IS DISTINCT FROM (EXCLUDED.descripcion, EXCLUDED.area)
+        """)
+        logger.info(f"Ciudades insertadas/actualizadas: {cursor.rowcount}")
+        sentencias['ciudades'] += 1
+        inicio = metricas.acumular('ciudades', inicio)
+
+        # 3. Barrios
+        cursor.execute("""
+            WITH upsert AS (
+                INSERT INTO identidades.barrios (codigo, descripcion, ciudad_id)
+                SELECT DISTINCT ON (t.codigo_departamento, t.codigo_distrito, t.codigo_barrio)
+                    t.codigo_barrio, t.desc_barrio, c.id
+                FROM tmp_carga_geografica t
+                JOIN identidades.departamentos d ON d.codigo = t.codigo_departamento
+                JOIN identidades.ciudades c
+                    ON c.codigo = t.codigo_distrito AND c.departamento_id = d.id
+                ORDER BY t.codigo_departamento, t.codigo_distrito, t.codigo_barrio, t.linea DESC
+                ON CONFLICT (codigo, ciudad_id) DO UPDATE SET
+                    descripcion = EXCLUDED.descripcion,
+                    updated_at = NOW()
+                WHERE barrios.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+                RETURNING (xmax = 0) AS insertado
+            )
+            SELECT COUNT(*) FILTER (WHERE insertado), COUNT(*) FILTER (WHERE NOT insertado)
+            FROM upsert
+        """)
+        insertadas, actualizadas = cursor.fetchone()
+        estadisticas['insertadas'] = insertadas
+        estadisticas['actualizadas'] = actualizadas
+        estadisticas['sin_cambios'] = estadisticas['filas_procesadas'] - insertadas - actualizadas
+        sentencias['barrios'] += 1
+        metricas.acumular('barrios', inicio)
+
+    if antes_del_commit:
+        antes_del_commit()
+    inicio = time.perf_counter()
+    conexion_db.commit()
+    metricas.acumular('commit', inicio)
+    sentencias['commit'] += 1
+
+
+def _cargar_particion(parametros_conexion, filas):
+    """
+    Carga las ciudades y barrios de un departamento en un proceso trabajador,
+    con su propia conexión. El departamento ya debe existir en la base, así
+    que el trabajador lo encuentra en el cache precargado.
+    """
+    estadisticas = {'filas_procesadas': 0, 'errores': 0}
+
+    conexion_db = psycopg2.connect(**parametros_conexion)
+    try:
+        _cargar_fila_a_fila(iter(filas), conexion_db, estadisticas)
+    except Exception:
+        conexion_db.rollback()
+        raise
+    finally:
+        conexion_db.close()
+    return estadisticas
+
+
+def cargar_datos_geograficos_paralelo(archivo_csv, parametros_conexion, trabajadores=4,
+                                      politica_duplicados='ultimo', archivo_duplicados=None):
+    """
+    Carga el CSV en paralelo, particionado por Codigo de Departamento.
+
+    Primero se hace el upsert de todos los departamentos desde el proceso
+    principal, así los padres existen antes que los hijos. Después las ciudades
+    y barrios de cada departamento se cargan en un pool de procesos, cada uno
+    con su propia conexión. Las particiones no comparten claves únicas, así que
+    los trabajadores no compiten por las mismas filas.
+
+    Args:
+        archivo_csv: Ruta al archivo CSV
+        parametros_conexion: Diccionario de argumentos para psycopg2.connect
+        trabajadores: Cantidad de procesos trabajadores
+        politica_duplicados: Política para barrios repetidos con otro nombre
+            (ver cargar_datos_geograficos)
+        archivo_duplicados: Ruta de un CSV con todas las filas repetidas
+
+    Returns:
+        Diccionario con las estadísticas combinadas de todos los trabajadores
+    """
+    estadisticas = {'filas_procesadas': 0, 'errores': 0}
+
+    # Particionar las filas válidas por departamento (el archivo se mantiene en memoria)
+    _, filas = _deduplicar(archivo_csv, estadisticas, 'auto', None, politica_duplicados, archivo_duplicados)
+    particiones = {}
+    for row_num, fila in filas:
+        particiones.setdefault(fila.codigo_departamento, []).append((row_num, fila))
+
+    # 1. Departamentos, desde el proceso principal
+    departamentos_ids = {}
+    conexion_db = psycopg2.connect(**parametros_conexion)
+    try:
+        with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+            for codigo, filas in particiones.items():
+                cursor.execute(SQL_UPSERT_DEPARTAMENTO, {
+                    'codigo': codigo, 'descripcion': filas[0][1].desc_departamento,
+                })
+                departamentos_ids[codigo] = cursor.fetchone()['id']
+        conexion_db.commit()
+    except Exception as e:
+        logger.error(f"Error general en la carga de departamentos: {e}")
+        conexion_db.rollback()
+        raise
+    finally:
+        conexion_db.close()
+    logger.info(f"Departamentos cargados: {len(departamentos_ids)}, "
+                f"repartiendo {len(particiones)} particiones en {trabajadores} trabajadores")
+
+    # 2. Ciudades y barrios, una partición por departamento (las más grandes primero)
+    with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+        futuros = {
+            pool.submit(_cargar_particion, parametros_conexion, filas):
+                (codigo, len(filas))
+            for codigo, filas in sorted(particiones.items(), key=lambda p: len(p[1]), reverse=True)
+        }
+        for futuro in as_completed(futuros):
+            codigo, cantidad = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                logger.error(f"Departamento {codigo}: Error en el trabajador: {e}")
+                estadisticas['errores'] += cantidad
+                continue
+            for clave, valor in resultado.items():
+                estadisticas[clave] = estadisticas.get(clave, 0) + valor
+            logger.info(f"Departamento {codigo}: {resultado['filas_procesadas']} filas cargadas")
+
+    conexion_db = psycopg2.connect(**parametros_conexion)
+    try:
+        refrescar_jerarquia(conexion_db)
+    finally:
+        conexion_db.close()
+
+    _mostrar_estadisticas(estadisticas)
+    return estadisticas
+
+
+# Extensiones que se toman al recibir un directorio en cargar_archivos
+EXTENSIONES_CSV = ('.csv', '.csv.gz', '.csv.zst')
+
+
+def expandir_archivos(origenes):
+    """
+    Convierte una lista de archivos, directorios y patrones glob en la lista
+    de archivos a cargar, sin repetidos. De un directorio se toman los
+    archivos con extensión EXTENSIONES_CSV; cada origen se ordena por nombre.
+    """
+    archivos = []
+    for origen in origenes:
+        if os.path.isdir(origen):
+            encontrados = sorted(os.path.join(origen, nombre) for nombre in os.listdir(origen)
+                                 if nombre.lower().endswith(EXTENSIONES_CSV))
+        elif any(caracter in origen for caracter in '*?['):
+            encontrados = sorted(ruta for ruta in glob.glob(origen, recursive=True) if os.path.isfile(ruta))
+        else:
+            encontrados = [origen]
+        if not encontrados:
+            logger.warning(f"{origen}: no hay archivos para cargar")
+        archivos.extend(encontrados)
+    return list(dict.fromkeys(archivos))
+
+
+def _leer_archivo(archivo_csv, encoding, politica_duplicados):
+    """
+    Lee y deduplica un archivo en un proceso del pool (primera pasada de la
+    carga por lotes). Retorna sus estadísticas, los tiempos de lectura, los
+    avisos, las repeticiones de barrios y los diccionarios de _deduplicar_filas.
+    """
+    estadisticas = {'filas_procesadas': 0, 'errores': 0}
+    metricas = MetricasCarga('archivos')
+    deduplicador, filas = _deduplicar(archivo_csv, estadisticas, encoding, metricas, politica_duplicados)
+    niveles = _deduplicar_filas(filas, estadisticas)
+    metricas.avisos.resumir()
+    tiempos = {fase: metricas.tiempos[fase] for fase in ('parseo', 'validacion')}
+    return estadisticas, tiempos, dict(metricas.avisos.conteo), deduplicador.conflictos, niveles
+
+
+def _cargar_barrios_archivo(pool, barrios, departamentos_cache, ciudades_cache, estadisticas, tamanio_lote):
+    """Envía los barrios de un archivo con una conexión del pool, en su propia transacción."""
+    metricas = MetricasCarga('archivos')
+    conexion_db = pool.getconn()
+    try:
+        with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+            _escribir_barrios(cursor, barrios, departamentos_cache, ciudades_cache, estadisticas,
+                              tamanio_lote, metricas)
+        inicio = time.perf_counter()
+        conexion_db.commit()
+        metricas.acumular('commit', inicio)
+        metricas.sentencias['commit'] += 1
+    except Exception:
+        conexion_db.rollback()
+        raise
+    finally:
+        pool.putconn(conexion_db)
+    return metricas
+
+
+def cargar_archivos(origenes, parametros_conexion, conexiones=4, tamanio_lote=None, encoding='auto',
+                    archivo_metricas=None, politica_duplicados='ultimo', archivo_duplicados=None):
+    """
+    Carga varios archivos con el formato de datos.csv (regionales, históricos,
+    comprimidos o no) compartiendo un pool de conexiones.
+
+    1. Los archivos se leen y deduplican en paralelo, en procesos. Los
+       barrios repetidos dentro de un archivo se resuelven con
+       politica_duplicados (ver cargar_datos_geograficos).
+    2. Los departamentos y ciudades de todos los archivos se combinan y se
+       envían una sola vez, desde una conexión, antes que cualquier barrio.
+       Dentro de cada archivo toman los datos de su primera fila y, entre
+       archivos, gana el último que los contiene.
+    3. Cada barrio se asigna al último archivo que lo contiene y los barrios
+       de cada archivo se envían en paralelo, cada archivo en su transacción.
+       El resultado es el mismo que cargar los archivos uno detrás de otro en
+       el orden dado.
+       Como ningún barrio se envía desde dos archivos, las transacciones no
+       compiten por las mismas filas. Si un archivo no se puede leer o su
+       transacción falla, los demás siguen.
+
+    Args:
+        origenes: Lista de archivos, directorios o patrones glob
+        parametros_conexion: Diccionario de argumentos para psycopg2.connect
+        conexiones: Tamaño máximo del pool y cantidad de archivos en paralelo
+        tamanio_lote: Registros por página de execute_values; por defecto BATCH_SIZE
+        encoding: Codificación de los archivos o 'auto' para detectarla en cada uno
+        archivo_metricas: Ruta donde guardar las métricas combinadas
+        politica_duplicados: 'ultimo', 'primero' o 'rechazar', para barrios
+            repetidos con otro nombre dentro de un mismo archivo
+        archivo_duplicados: Ruta de un CSV con las filas repetidas de todos
+            los archivos, con el archivo como primera columna
+
+    Returns:
+        Reporte con las estadísticas de cada archivo, los totales y los
+        departamentos, ciudades y barrios distintos de la carga
+    """
+    archivos = expandir_archivos(origenes)
+    if not archivos:
+        raise FileNotFoundError(f"No hay archivos para cargar en {', '.join(origenes)}")
+    tamanio_lote = tamanio_lote or BATCH_SIZE
+    conexiones = max(1, conexiones)
+    metricas = MetricasCarga('archivos')
+    logger.info(f"Cargando {len(archivos)} archivos con hasta {conexiones} conexiones")
+
+    # 1. Lectura en paralelo; los resultados se combinan en el orden de los archivos
+    with ProcessPoolExecutor(max_workers=min(conexiones, len(archivos))) as procesos:
+        lecturas = [procesos.submit(_leer_archivo, archivo, encoding, politica_duplicados)
+                    for archivo in archivos]
+
+    reporte_archivos = []
+    departamentos, ciudades, barrios, duenio = {}, {}, {}, {}
+    conflictos = {}
+    avisos_archivos = Counter()  # ya resumidos en cada proceso
+    for numero, (archivo, lectura) in enumerate(zip(archivos, lecturas)):
+        try:
+            estadisticas, tiempos, avisos, conflictos[archivo], niveles = lectura.result()
+        except Exception as e:
+            logger.error(f"{archivo}: Error al leer el archivo: {e}")
+            reporte_archivos.append({'archivo': archivo, 'estado': 'error', 'error': str(e),
+                                     'barrios_unicos': 0})
+            continue
+        for fase, segundos in tiempos.items():
+            metricas.tiempos[fase] += segundos
+        avisos_archivos.update(avisos)
+        departamentos_archivo, ciudades_archivo, barrios_archivo = niveles
+        departamentos.update(departamentos_archivo)
+        ciudades.update(ciudades_archivo)
+        for clave, desc in barrios_archivo.items():
+            barrios[clave] = desc
+            duenio[clave] = numero
+        reporte_archivos.append({'archivo': archivo, 'estado': 'pendiente', **estadisticas,
+                                 'barrios_unicos': len(barrios_archivo)})
+
+    if archivo_duplicados:
+        guardar_reporte_conflictos(archivo_duplicados, conflictos)
+
+    barrios_por_archivo = [{} for _ in archivos]
+    for clave, numero in duenio.items():
+        barrios_por_archivo[numero][clave] = barrios[clave]
+    del duenio
+
+    pool = ThreadedConnectionPool(1, conexiones, **parametros_conexion)
+    try:
+        # 2. Padres de todos los archivos, una sola vez
+        conexion_db = pool.getconn()
+        try:
+            with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+                departamentos_cache, ciudades_cache = _escribir_padres(cursor, departamentos, ciudades,
+                                                                       tamanio_lote, metricas)
+            conexion_db.commit()
+            metricas.sentencias['commit'] += 1
+        except Exception as e:
+            logger.error(f"Error general en la carga de departamentos y ciudades: {e}")
+            conexion_db.rollback()
+            raise
+        finally:
+            pool.putconn(conexion_db)
+
+        # 3. Barrios de cada archivo en paralelo, los archivos más grandes primero
+        with ThreadPoolExecutor(max_workers=conexiones) as hilos:
+            futuros = {}
+            for numero in sorted(range(len(archivos)), key=lambda n: len(barrios_por_archivo[n]), reverse=True):
+                reporte = reporte_archivos[numero]
+                if reporte['estado'] == 'error':
+                    continue
+                reporte['barrios_reemplazados'] = reporte['barrios_unicos'] - len(barrios_por_archivo[numero])
+                # sin_cambios se calcula sobre los barrios enviados, no sobre los reemplazados
+                estadisticas = {'filas_procesadas': len(barrios_por_archivo[numero])}
+                futuros[hilos.submit(_cargar_barrios_archivo, pool, barrios_por_archivo[numero],
+                                     departamentos_cache, ciudades_cache, estadisticas, tamanio_lote)] = \
+                    (numero, estadisticas)
+            for futuro in as_completed(futuros):
+                numero, estadisticas = futuros[futuro]
+                reporte = reporte_archivos[numero]
+                try:
+                    metricas_archivo = futuro.result()
+                except Exception as e:
+                    logger.error(f"{reporte['archivo']}: Error en la carga de barrios: {e}")
+                    reporte['estado'] = 'error'
+                    reporte['error'] = str(e)
+                    continue
+                reporte.update(estado='cargado', insertadas=estadisticas['insertadas'],
+                               actualizadas=estadisticas['actualizadas'], sin_cambios=estadisticas['sin_cambios'])
+                for fase in ('barrios', 'commit'):
+                    metricas.tiempos[fase] += metricas_archivo.tiempos[fase]
+                metricas.sentencias.update(metricas_archivo.sentencias)
+
+        conexion_db = pool.getconn()
+        try:
+            inicio = time.perf_counter()
+            if refrescar_jerarquia(conexion_db):
+                metricas.sentencias['vista'] += 2
+            metricas.acumular('vista', inicio)
+        finally:
+            pool.putconn(conexion_db)
+    finally:
+        pool.closeall()
+
+    totales = {'archivos': len(archivos), 'fallidos': sum(1 for r in reporte_archivos if r['estado'] != 'cargado')}
+    for clave in ('filas_procesadas', 'errores', 'insertadas', 'actualizadas', 'sin_cambios',
+                  'barrios_reemplazados', 'filas_duplicadas', 'conflictos', 'claves_rechazadas'):
+        totales[clave] = sum(r.get(clave, 0) for r in reporte_archivos)
+    metricas.finalizar()
+    metricas.avisos.conteo.update(avisos_archivos)
+    resultado = {
+        'archivos': reporte_archivos,
+        'totales': totales,
+        'departamentos': len(departamentos),
+        'ciudades': len(ciudades),
+        'barrios': len(barrios),
+        'metricas': metricas.a_dict(totales),
+    }
+    if archivo_metricas:
+        metricas.guardar(archivo_metricas, totales)
+    _mostrar_reporte_archivos(resultado)
+    return resultado
+
+
+def _mostrar_reporte_archivos(resultado):
+    """Muestra en el log el reporte combinado de cargar_archivos."""
+    logger.info("=== REPORTE DE CARGA ===")
+    for reporte in resultado['archivos']:
+        if reporte['estado'] == 'cargado':
+            logger.info(f"{reporte['archivo']}: {reporte['filas_procesadas']} filas, {reporte['errores']} errores, "
+                        f"insertadas {reporte['insertadas']}, actualizadas {reporte['actualizadas']}, "
+                        f"sin cambios {reporte['sin_cambios']}, "
+                        f"reemplazados por archivos posteriores {reporte['barrios_reemplazados']}")
+        else:
+            logger.error(f"{reporte['archivo']}: {reporte['estado']}: {reporte.get('error')}")
+    totales = resultado['totales']
+    metricas = resultado['metricas']
+    logger.info(f"Total: {totales['archivos']} archivos ({totales['fallidos']} con errores), "
+                f"{totales['filas_procesadas']} filas, {totales['errores']} errores de formato, "
+                f"insertadas {totales['insertadas']}, actualizadas {totales['actualizadas']}, "
+                f"sin cambios {totales['sin_cambios']}, reemplazados {totales['barrios_reemplazados']}")
+    if totales['filas_duplicadas']:
+        logger.info(f"Filas repetidas descartadas: {totales['filas_duplicadas']} "
+                    f"({totales['conflictos']} con otro nombre, {totales['claves_rechazadas']} barrios rechazados)")
+    logger.info(f"Departamentos: {resultado['departamentos']}, ciudades: {resultado['ciudades']}, "
+                f"barrios: {resultado['barrios']} (distintos en los archivos)")
+    logger.info(f"Duración: {metricas['duracion_segundos']:.2f}s ({metricas['filas_por_segundo']} filas/s)")
+
+
+# Carga asíncrona (cargar_datos_geograficos_async): la carga fila a fila paga
+# un round-trip por sentencia, que en enlaces con mucha latencia domina el
+# tiempo total. Con el modo pipeline de psycopg 3 las sentencias de cada lote se
+# envían sin esperar respuestas y solo se sincroniza cada LOTES_EN_VUELO lotes.
+# Para que ninguna sentencia dependa del resultado de otra, los ids de los
+# padres se resuelven en la base con joins por código.
+
+# Lotes enviados entre dos sincronizaciones del pipeline; también es el tamaño
+# de la cola entre el lector y la conexión
+LOTES_EN_VUELO = 8
+
+# Mismos criterios que el modo copy: departamentos y ciudades toman los datos de
+# su primera fila en el archivo (por eso cada uno se envía una sola vez) y no
+# reescriben filas sin cambios
+SQL_ASYNC_DEPARTAMENTOS = """
+    INSERT INTO identidades.departamentos AS d (codigo, descripcion)
+    SELECT * FROM unnest(%s::integer[], %s::text[])
+    ON CONFLICT (codigo) DO UPDATE SET
+        descripcion = EXCLUDED.descripcion,
+        updated_at = NOW()
+    WHERE d.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+"""
+
+SQL_ASYNC_CIUDADES = """
+    INSERT INTO identidades.ciudades AS c (codigo, descripcion, area, departamento_id)
+    SELECT t.codigo_distrito, t.descripcion, t.area, d.id
+    FROM unnest(%s::integer[], %s::integer[], %s::text[], %s::integer[])
+        AS t(codigo_departamento, codigo_distrito, descripcion, area)
+    JOIN identidades.departamentos d ON d.codigo = t.codigo_departamento
+    ON CONFLICT (codigo, departamento_id) DO UPDATE SET
+        descripcion = EXCLUDED.descripcion,
+        area = EXCLUDED.area,
+        updated_at = NOW()
+    WHERE (c.descripcion, c.area) IS DISTINCT FROM (EXCLUDED.descripcion, EXCLUDED.area)
+"""
+
+SQL_ASYNC_BARRIOS = """
+    WITH upsert AS (
+        INSERT INTO identidades.barrios AS b (codigo, descripcion, ciudad_id)
+        SELECT t.codigo_barrio, t.descripcion, c.id
+        FROM unnest(%s::integer[], %s::integer[], %s::integer[], %s::text[])
+            AS t(codigo_departamento, codigo_distrito, codigo_barrio, descripcion)
+        JOIN identidades.departamentos d ON d.codigo = t.codigo_departamento
+        JOIN identidades.ciudades c ON c.codigo = t.codigo_distrito AND c.departamento_id = d.id
+        ON CONFLICT (codigo, ciudad_id) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            updated_at = NOW()
+        WHERE b.descripcion IS DISTINCT FROM EXCLUDED.descripcion
+        RETURNING (xmax = 0) AS insertado
+    )
+    SELECT COUNT(*) FILTER (WHERE insertado), COUNT(*) FILTER (WHERE NOT insertado)
+    FROM upsert
+"""
+
+
+def _importar_psycopg():
+    try:
+        import psycopg
+    except ImportError:
+        raise ImportError("La carga asíncrona necesita psycopg 3 "
+                          "(pip install \"psycopg[binary]\")") from None
+    return psycopg
+
+
+def _parametros_psycopg(parametros_conexion):
+    """Adapta los argumentos de psycopg2.connect (database=...) a psycopg 3 (dbname=...)."""
+    parametros = dict(parametros_conexion)
+    if 'database' in parametros:
+        parametros.setdefault('dbname', parametros.pop('database'))
+    return parametros
+
+
+def _lotes_deduplicados(archivo_csv, encoding, tamanio_lote, metricas, deduplicador, detener=None):
+    """
+    Genera LoteFilas con una fila por barrio. Una primera lectura alimenta al
+    deduplicador; después el archivo se vuelve a leer en streaming y cada
+    lote pasa por deduplicador.filtrar, así la lectura avanza al ritmo en que
+    se consumen los lotes. stdin se lee una sola vez: el deduplicador
+    conserva las filas y el primer lote, vacío, lleva los errores de formato.
+    Si se pasa detener (threading.Event), la lectura se corta al activarlo.
+    """
+    def hasta_detener(lotes):
+        for lote in lotes:
+            if detener is not None and detener.is_set():
+                return
+            yield lote
+
+    if archivo_csv == '-':
+        errores = 0
+
+        def filas():
+            nonlocal errores
+            for lote in hasta_detener(leer_lotes(archivo_csv, encoding, tamanio_lote, metricas=metricas)):
+                errores += lote.errores
+                yield from lote.filas()
+
+        deduplicador.analizar(filas())
+        yield LoteFilas([], [], errores)
+        unicas = deduplicador.filas()
+        while True:
+            bloque = list(islice(unicas, tamanio_lote))
+            if not bloque:
+                return
+            yield LoteFilas([row_num for row_num, _ in bloque], [fila for _, fila in bloque])
+
+    previos = leer_lotes(archivo_csv, encoding, tamanio_lote, avisos=AvisosAgregados(limite=0), metricas=metricas)
+    deduplicador.analizar(fila for lote in hasta_detener(previos) for fila in lote.filas())
+    for lote in hasta_detener(leer_lotes(archivo_csv, encoding, tamanio_lote, metricas=metricas)):
+        unicas = list(deduplicador.filtrar(lote.filas()))
+        yield LoteFilas([row_num for row_num, _ in unicas], [fila for _, fila in unicas], lote.errores)
+
+
+async def _leer_lotes_async(archivo_csv, encoding, tamanio_lote, metricas, cola, deduplicador):
+    """
+    Lee el CSV en un hilo y deja los lotes en la cola; None marca el final.
+    Si la lectura falla, la excepción viaja por la cola hasta el consumidor.
+    Si la tarea se cancela, espera a que el hilo suelte el generador antes
+    de cerrarlo.
+    """
+    loop = asyncio.get_running_loop()
+    detener = threading.Event()
+    lotes = _lotes_deduplicados(archivo_csv, encoding, tamanio_lote, metricas, deduplicador, detener)
+    lectura = None
+    try:
+        while True:
+            # shield: al cancelar la tarea, lectura sigue indicando cuándo termina el hilo
+            lectura = loop.run_in_executor(None, next, lotes, None)
+            lote = await asyncio.shield(lectura)
+            await cola.put(lote)
+            if lote is None:
+                return
+    except Exception as e:
+        await cola.put(e)
+    finally:
+        if lectura is not None and not lectura.done():
+            detener.set()
+            await asyncio.wait([lectura])
+        lotes.close()
+
+
+def _parametros_lote_async(lote, departamentos_vistos, ciudades_vistas, metricas):
+    """
+    Arma los arreglos de un lote: departamentos y ciudades que aparecen por
+    primera vez en la carga y barrios sin repetir dentro del lote (gana la
+    última aparición, como en la carga fila a fila).
+    """
+    departamentos = {}
+    ciudades = {}
+    barrios = {}
+    for _, fila in lote.filas():
+        codigo_departamento = fila.codigo_departamento
+        if codigo_departamento not in departamentos_vistos:
+            departamentos_vistos.add(codigo_departamento)
+            departamentos[codigo_departamento] = fila.desc_departamento
+        clave_ciudad = (codigo_departamento, fila.codigo_distrito)
+        if clave_ciudad not in ciudades_vistas:
+            ciudades_vistas.add(clave_ciudad)
+            ciudades[clave_ciudad] = (fila.desc_distrito, fila.area)
+        barrios[(codigo_departamento, fila.codigo_distrito, fila.codigo_barrio)] = fila.desc_barrio
+
+    metricas.cache['departamentos'][0] += len(lote) - len(departamentos)
+    metricas.cache['departamentos'][1] += len(departamentos)
+    metricas.cache['ciudades'][0] += len(lote) - len(ciudades)
+    metricas.cache['ciudades'][1] += len(ciudades)
+
+    parametros_departamentos = (list(departamentos), list(departamentos.values())) if departamentos else None
+    parametros_ciudades = None
+    if ciudades:
+        parametros_ciudades = ([d for d, _ in ciudades], [c for _, c in ciudades],
+                               [desc for desc, _ in ciudades.values()], [area for _, area in ciudades.values()])
+    claves = list(barrios)
+    parametros_barrios = ([d for d, _, _ in claves], [c for _, c, _ in claves],
+                          [b for _, _, b in claves], list(barrios.values()))
+    return parametros_departamentos, parametros_ciudades, parametros_barrios
+
+
+async def _recoger_conteos(pendientes, estadisticas):
+    """Lee los conteos de insertados/actualizados de los upserts de barrios ya sincronizados."""
+    for cursor in pendientes:
+        insertadas, actualizadas = await cursor.fetchone()
+        estadisticas['insertadas'] += insertadas
+        estadisticas['actualizadas'] += actualizadas
+        await cursor.close()
+    pendientes.clear()
+
+
+async def cargar_datos_geograficos_async(archivo_csv, parametros_conexion, tamanio_lote=None,
+                                         en_vuelo=LOTES_EN_VUELO, encoding='auto', archivo_metricas=None,
+                                         politica_duplicados='ultimo', archivo_duplicados=None):
+    """
+    Carga datos geográficos desde CSV con una conexión asíncrona en modo
+    pipeline, en una sola transacción. Necesita psycopg 3.
+
+    Un hilo analiza los duplicados del CSV mientras se abre la conexión y
+    después lo vuelve a leer en streaming, dejando los lotes ya filtrados en
+    una cola de en_vuelo lugares: si la base va más lenta, el lector espera
+    en lugar de seguir leyendo. Los criterios son los del modo copy y la
+    fase 'barrios' de las métricas abarca todo el envío en pipeline.
+
+    Args:
+        archivo_csv: Ruta al archivo CSV (puede estar comprimido con gzip o
+            zstd) o '-' para stdin
+        parametros_conexion: Diccionario de argumentos de conexión, con las
+            mismas claves que para psycopg2.connect
+        tamanio_lote: Filas por lote; por defecto lector_csv.TAMANIO_LOTE
+        en_vuelo: Lotes enviados entre dos sincronizaciones del pipeline y
+            lotes leídos por adelantado
+        encoding: Codificación del archivo o 'auto' para detectarla
+        archivo_metricas: Ruta donde guardar las métricas de la carga (JSON o
+            textfile de Prometheus si termina en .prom)
+        politica_duplicados: Política para barrios repetidos con otro nombre
+            (ver cargar_datos_geograficos)
+        archivo_duplicados: Ruta de un CSV con todas las filas repetidas
+
+    Returns:
+        Diccionario con las estadísticas de la carga; las métricas quedan en
+        la clave 'metricas'
+    """
+    psycopg = _importar_psycopg()
+    tamanio_lote = tamanio_lote or TAMANIO_LOTE
+    en_vuelo = max(1, en_vuelo)
+
+    estadisticas = {'filas_procesadas': 0, 'errores': 0, 'insertadas': 0, 'actualizadas': 0}
+    metricas = MetricasCarga('async')
+    sentencias = metricas.sentencias
+    departamentos_vistos = set()
+    ciudades_vistas = set()
+
+    deduplicador = DeduplicadorBarrios(politica_duplicados, metricas.avisos, conservar_filas=archivo_csv == '-')
+    cola = asyncio.Queue(maxsize=en_vuelo)
+    lector = asyncio.create_task(_leer_lotes_async(archivo_csv, encoding, tamanio_lote, metricas, cola,
+                                                   deduplicador))
+    try:
+        conexion_db = await psycopg.AsyncConnection.connect(**_parametros_psycopg(parametros_conexion))
+    except BaseException:
+        lector.cancel()
+        await asyncio.gather(lector, return_exceptions=True)
+        raise
+    try:
+        pendientes = []
+        inicio = time.perf_counter()
+        async with conexion_db.pipeline() as pipeline:
+            while True:
+                lote = await cola.get()
+                if isinstance(lote, Exception):
+                    raise lote
+                if lote is None:
+                    break
+                estadisticas['errores'] += lote.errores
+                if not len(lote):
+                    continue
+                estadisticas['filas_procesadas'] += len(lote)
+
+                departamentos, ciudades, barrios = _parametros_lote_async(
+                    lote, departamentos_vistos, ciudades_vistas, metricas)
+                if departamentos:
+                    await conexion_db.execute(SQL_ASYNC_DEPARTAMENTOS, departamentos)
+                    sentencias['departamentos'] += 1
+                if ciudades:
+                    await conexion_db.execute(SQL_ASYNC_CIUDADES, ciudades)
+                    sentencias['ciudades'] += 1
+                cursor = conexion_db.cursor()
+                await cursor.execute(SQL_ASYNC_BARRIOS, barrios)
+                pendientes.append(cursor)
+                sentencias['barrios'] += 1
+
+                if len(pendientes) >= en_vuelo:
+                    await pipeline.sync()
+                    sentencias['sync'] += 1
+                    await _recoger_conteos(pendientes, estadisticas)
+                    metricas.progreso(estadisticas['filas_procesadas'])
+        # Al salir del bloque el pipeline ya está sincronizado
+        await _recoger_conteos(pendientes, estadisticas)
+        metricas.acumular('barrios', inicio)
+
+        inicio = time.perf_counter()
+        await conexion_db.commit()
+        metricas.acumular('commit', inicio)
+        sentencias['commit'] += 1
+
+        inicio = time.perf_counter()
+        if await refrescar_jerarquia_async(conexion_db):
+            sentencias['vista'] += 2
+        metricas.acumular('vista', inicio)
+    except Exception as e:
+        logger.error(f"Error general en la carga: {e}")
+        await conexion_db.rollback()
+        raise
+    finally:
+        lector.cancel()
+        await asyncio.gather(lector, return_exceptions=True)
+        await conexion_db.close()
+
+    estadisticas['sin_cambios'] = (estadisticas['filas_procesadas']
+                                   - estadisticas['insertadas'] - estadisticas['actualizadas'])
+    deduplicador.completar_estadisticas(estadisticas)
+    if archivo_duplicados:
+        deduplicador.guardar_reporte(archivo_duplicados)
+    metricas.finalizar()
+    estadisticas['metricas'] = metricas.a_dict(estadisticas)
+    if archivo_metricas:
+        metricas.guardar(archivo_metricas, estadisticas)
+
+    _mostrar_estadisticas(estadisticas)
+    return estadisticas
+
+
+def _estado_desde_csv(archivo_csv, estadisticas, politica='ultimo', archivo_duplicados=None):
+    """
+    Lee el CSV y arma el estado deseado de cada nivel, con el mismo criterio que
+    la carga: el área de una ciudad es la de su primera fila y los barrios
+    repetidos se resuelven con _deduplicar según la política.
+
+    Returns:
+        Tupla (departamentos, ciudades, barrios) de diccionarios clave -> valores
+    """
+    departamentos = {}
+    ciudades = {}
+    barrios = {}
+    _, filas = _deduplicar(archivo_csv, estadisticas, 'auto', None, politica, archivo_duplicados)
+    for row_num, fila in filas:
+        departamentos.setdefault(fila.codigo_departamento, (fila.desc_departamento,))
+        ciudades.setdefault((fila.codigo_departamento, fila.codigo_distrito),
+                            (fila.desc_distrito, fila.area))
+        barrios[(fila.codigo_departamento, fila.codigo_distrito, fila.codigo_barrio)] = (fila.desc_barrio,)
+        estadisticas['filas_procesadas'] += 1
+    return departamentos, ciudades, barrios
+
+
+def _estado_desde_db(conexion_db):
+    """
+    Lee la jerarquía actual de identidades (incluidas las filas borradas) con una
+    consulta por tabla. De cada fila se guarda solo su id, un hash de los valores
+    comparables y si está borrada, para mantener el estado compacto en memoria.
+
+    Returns:
+        Tupla (departamentos, ciudades, barrios) de diccionarios
+        clave -> (id, hash, borrado)
+    """
+    consultas = (
+        ('sync_departamentos', """
+            SELECT d.codigo, d.id, d.descripcion, d.deleted_at IS NOT NULL
+            FROM identidades.departamentos d
+        """, 1),
+        ('sync_ciudades', """
+            SELECT d.codigo, c.codigo, c.id, c.descripcion, c.area, c.deleted_at IS NOT NULL
+            FROM identidades.ciudades c
+            JOIN identidades.departamentos d ON d.id = c.departamento_id
+        """, 2),
+        ('sync_barrios', """
+            SELECT d.codigo, c.codigo, b.codigo, b.id, b.descripcion, b.deleted_at IS NOT NULL
+            FROM identidades.barrios b
+            JOIN identidades.ciudades c ON c.id = b.ciudad_id
+            JOIN identidades.departamentos d ON d.id = c.departamento_id
+        """, 3),
+    )
+    estados = []
+    for nombre, consulta, largo_clave in consultas:
+        estado = {}
+        # Cursor con nombre: las filas llegan en bloques y no todas juntas
+        with conexion_db.cursor(name=nombre) as cursor:
+            cursor.itersize = 10000
+            cursor.execute(consulta)
+            for registro in cursor:
+                clave = registro[0] if largo_clave == 1 else tuple(registro[:largo_clave])
+                estado[clave] = (registro[largo_clave], hash(tuple(registro[largo_clave + 1:-1])),
+                                 registro[-1])
+        estados.append(estado)
+    return tuple(estados)
+
+
+def _diferencias(deseado, actual):
+    """
+    Compara el estado deseado (CSV) con el actual (base de datos) de un nivel.
+
+    Returns:
+        Tupla (nuevas, modificadas, eliminadas): nuevas es una lista de claves,
+        modificadas una lista de (clave, id) incluidas las filas borradas que
+        vuelven a aparecer, y eliminadas una lista de (clave, id)
+    """
+    nuevas = []
+    modificadas = []
+    for clave, valores in deseado.items():
+        existente = actual.get(clave)
+        if existente is None:
+            nuevas.append(clave)
+        elif existente[2] or existente[1] != hash(valores):
+            modificadas.append((clave, existente[0]))
+    eliminadas = [(clave, existente[0]) for clave, existente in actual.items()
+                  if clave not in deseado and not existente[2]]
+    return nuevas, modificadas, eliminadas
+
+
+def sincronizar_datos_geograficos(archivo_csv, conexion_db, dry_run=False, politica_duplicados='ultimo',
+                                  archivo_duplicados=None):
+    """
+    Sincroniza identidades con el CSV aplicando solo las diferencias.
+
+    Lee la jerarquía actual en bloque, la compara en memoria con el archivo y
+    ejecuta únicamente los inserts y updates necesarios. Las filas que ya no
+    están en el archivo se marcan con deleted_at (borrado lógico) y las filas
+    borradas que reaparecen se restauran. Todo se aplica en una transacción.
+
+    Args:
+        archivo_csv: Ruta al archivo CSV
+        conexion_db: Conexión psycopg2 abierta
+        dry_run: Solo muestra el conjunto de cambios, sin escribir nada
+        politica_duplicados: Qué hacer con un barrio repetido con otro nombre,
+            como en cargar_datos_geograficos
+        archivo_duplicados: CSV donde guardar todas las filas repetidas
+
+    Returns:
+        Diccionario con la cantidad de cambios por nivel
+    """
+    estadisticas = {'filas_procesadas': 0, 'errores': 0}
+    deseados = _estado_desde_csv(archivo_csv, estadisticas, politica_duplicados, archivo_duplicados)
+    actuales = _estado_desde_db(conexion_db)
+
+    niveles = ('departamentos', 'ciudades', 'barrios')
+    diferencias = {nivel: _diferencias(deseado, actual)
+                   for nivel, deseado, actual in zip(niveles, deseados, actuales)}
+
+    logger.info("=== CAMBIOS DE SINCRONIZACIÓN ===")
+    if estadisticas['filas_duplicadas']:
+        logger.info(f"Filas repetidas descartadas: {estadisticas['filas_duplicadas']} "
+                    f"({estadisticas['conflictos']} con otro nombre, "
+                    f"{estadisticas['claves_rechazadas']} barrios rechazados)")
+    cambios = {}
+    for nivel, deseado in zip(niveles, deseados):
+        nuevas, modificadas, eliminadas = diferencias[nivel]
+        cambios[nivel] = {'nuevas': len(nuevas), 'modificadas': len(modificadas),
+                          'eliminadas': len(eliminadas)}
+        logger.info(f"{nivel.capitalize()}: {len(nuevas)} nuevas, {len(modificadas)} modificadas, "
+                    f"{len(eliminadas)} eliminadas")
+        if dry_run:
+            for clave in nuevas:
+                logger.info(f"  + {nivel} {clave}: {deseado[clave]}")
+            for clave, _ in modificadas:
+                logger.info(f"  ~ {nivel} {clave}: {deseado[clave]}")
+            for clave, _ in eliminadas:
+                logger.info(f"  - {nivel} {clave}")
+
+    if dry_run:
+        logger.info("Dry-run: no se escribió ningún cambio")
+        return cambios
+
+    departamentos, ciudades, barrios = deseados
+    try:
+        with conexion_db.cursor(cursor_factory=RealDictCursor) as cursor:
+            # IDs de los padres existentes, completados con los que se insertan
+            departamentos_ids = {clave: valor[0] for clave, valor in actuales[0].items()}
+            ciudades_ids = {clave: valor[0] for clave, valor in actuales[1].items()}
+
+            # 1. Departamentos
+            nuevas, modificadas, _ = diferencias['departamentos']
+            for codigo in nuevas:
+                cursor.execute(SQL_UPSERT_DEPARTAMENTO, {
+                    'codigo': codigo, 'descripcion': departamentos[codigo][0],
+                })
+                departamentos_ids[codigo] = cursor.fetchone()['id']
+            for codigo, dept_id in modificadas:
+                cursor.execute("""
+                    UPDATE identidades.departamentos
+                    SET descripcion = %s, deleted_at = NULL, updated_at = NOW()
+                    WHERE id = %s
+                """, (departamentos[codigo][0], dept_id))
+
+            # 2. Ciudades
+            nuevas, modificadas, _ = diferencias['ciudades']
+            for clave in nuevas:
+                desc, area = ciudades[clave]
+                cursor.execute(SQL_UPSERT_CIUDAD, {
+                    'codigo': clave[1], 'descripcion': desc, 'area': area,
+                    'departamento_id': departamentos_ids[clave[0]],
+                })
+                ciudades_ids[clave] = cursor.fetchone()['id']
+            for clave, ciudad_id in modificadas:
+                desc, area = ciudades[clave]
+                cursor.execute("""
+                    UPDATE identidades.ciudades
+                    SET descripcion = %s, area = %s, deleted_at = NULL, updated_at = NOW()
+                    WHERE id = %s
+                """, (desc, area, ciudad_id))
+
+            # 3. Barrios
+            nuevas, modificadas, _ = diferencias['barrios']
+            execute_values(cursor, """
+                INSERT INTO identidades.barrios (codigo, descripcion, ciudad_id) VALUES %s
+                ON CONFLICT (codigo, ciudad_id) DO NOTHING
+            """, [(clave[2], barrios[clave][0], ciudades_ids[clave[:2]]) for clave in nuevas],
+                page_size=BATCH_SIZE)
+            for clave, barrio_id in modificadas:
+                cursor.execute("""
+                    UPDATE identidades.barrios
+                    SET descripcion = %s, deleted_at = NULL, updated_at = NOW()
+                    WHERE id = %s
+                """, (barrios[clave][0], barrio_id))
+
+            # 4. Borrado lógico de lo que ya no está en el archivo, de hijos a padres
+            for nivel in reversed(niveles):
+                ids = [fila_id for _, fila_id in diferencias[nivel][2]]
+                if ids:
+                    cursor.execute(f"""
+                        UPDATE identidades.{nivel}
+                        SET deleted_at = NOW(), updated_at = NOW()
+                        WHERE id = ANY(%s)
+                    """, (ids,))
+
+        conexion_db.commit()
+        refrescar_jerarquia(conexion_db)
+    except Exception as e:
+        logger.error(f"Error general en la sincronización: {e}")
+        conexion_db.rollback()
+        raise
+
+    logger.info("Sincronización completada!")
+    return cambios
+
+
 # Ejemplo de uso
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cargador de datos geográficos de Paraguay")
+    parser.add_argument("archivo", nargs="?", default="./datos.csv",
+                        help="Archivo CSV a cargar (puede estar comprimido con gzip o zstd; '-' lee de stdin)")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="auto",
+                        help="Codificación del archivo (por defecto se detecta)")
+    parser.add_argument("--modo", choices=MODOS_CARGA, default="fila",
+                        help="Modo de carga: 'fila' (upsert por barrio), 'lotes' (execute_values) "
+                             "o 'copy' (COPY FROM STDIN)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"Registros por lote (por defecto BATCH_SIZE={BATCH_SIZE})")
+    parser.add_argument("--async", dest="asincrono", action="store_true",
+                        help="Cargar con psycopg 3 en modo pipeline, para bases con mucha latencia")
+    parser.add_argument("--en-vuelo", type=int, default=LOTES_EN_VUELO,
+                        help=f"Con --async, lotes enviados entre sincronizaciones (por defecto {LOTES_EN_VUELO})")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="Guardar el avance de la carga en identidades.cargas_checkpoint")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reanudar desde el último checkpoint guardado para el archivo")
+    parser.add_argument("--rechazos", metavar="ARCHIVO",
+                        help="CSV donde guardar las filas rechazadas por la base de datos")
+    parser.add_argument("--duplicados", choices=POLITICAS_DUPLICADOS, default="ultimo",
+                        help="Barrio repetido con otro nombre: 'ultimo' (gana la última aparición, por defecto), "
+                             "'primero' o 'rechazar' (no se carga); cada barrio se envía una sola vez")
+    parser.add_argument("--reporte-duplicados", metavar="ARCHIVO",
+                        help="CSV donde guardar todas las filas repetidas con su línea y la resolución")
+    parser.add_argument("--trabajadores", type=int, default=0,
+                        help="Cargar en paralelo por departamento con N procesos (0 = sin paralelismo)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Sincronizar aplicando solo las diferencias y borrando lógicamente lo que ya no está")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Con --sync, mostrar los cambios sin escribir nada")
+    parser.add_argument("--validate-only", action="store_true",
+                        help="Validar el archivo en paralelo sin conectarse a la base de datos")
+    parser.add_argument("--reporte-validacion", metavar="ARCHIVO",
+                        help="Con --validate-only, CSV donde guardar todos los errores con su línea")
+    parser.add_argument("--carga-inicial", action="store_true",
+                        help="Con --modo lotes o copy sobre tablas vacías: borrar los índices no únicos y "
+                             "desactivar los triggers de updated_at durante la carga, reconstruirlos y ANALYZE")
+    parser.add_argument("--ingestar", nargs="+", metavar="ORIGEN",
+                        help="Cargar varios archivos, directorios o patrones glob (p. ej. 'regiones/*.csv.gz') "
+                             "compartiendo un pool de conexiones")
+    parser.add_argument("--conexiones", type=int, default=4,
+                        help="Con --ingestar, tamaño del pool y archivos cargados en paralelo (por defecto 4)")
+    parser.add_argument("--sqlite", metavar="ARCHIVO",
+                        help="Cargar en una base SQLite (se crea si no existe) en lugar de PostgreSQL")
+    parser.add_argument("--exportar", metavar="DESTINO",
+                        help="Exportar los datos cargados a DESTINO ('-' para stdout, .gz para comprimir) "
+                             "en lugar de cargar")
+    parser.add_argument("--formato", choices=("csv", "jsonl", "json"),
+                        help="Con --exportar: csv (formato de datos.csv), jsonl o json anidado; "
+                             "por defecto según la extensión")
+    parser.add_argument("--metricas", metavar="ARCHIVO",
+                        help="Guardar las métricas de la carga en JSON o, si termina en .prom, "
+                             "como textfile de Prometheus")
+    args = parser.parse_args()
+
+    if args.validate_only:
+        from validacion import validar_csv
+        resultado = validar_csv(args.archivo, trabajadores=args.trabajadores or None,
+                                archivo_reporte=args.reporte_validacion, encoding=args.encoding)
+        sys.exit(1 if resultado['errores'] else 0)
+
+    if args.sqlite:
+        from destino_sqlite import conectar_sqlite, contar_vigentes
+        conexion = conectar_sqlite(args.sqlite)
+        try:
+            cargar_datos_geograficos(args.archivo, conexion, archivo_metricas=args.metricas,
+                                     encoding=args.encoding, politica_duplicados=args.duplicados,
+                                     archivo_duplicados=args.reporte_duplicados)
+            cantidades = contar_vigentes(conexion)
+            logger.info("=== ESTADÍSTICAS FINALES ===")
+            logger.info(f"Departamentos: {cantidades['departamentos']}")
+            logger.info(f"Ciudades: {cantidades['ciudades']}")
+            logger.info(f"Barrios: {cantidades['barrios']}")
+        finally:
+            conexion.close()
+        sys.exit(0)
+
     # Configurar conexión a la base de datos
     # IMPORTANTE: Actualiza estas credenciales con las tuyas
     # Para mayor seguridad, considera usar variables de entorno
-    conexion = psycopg2.connect(
+    parametros_conexion = dict(
         host="localhost",           # Cambia por tu host
-        database="tu_database",     # Cambia por tu database  
+        database="tu_database",     # Cambia por tu database
         user="tu_usuario",         # Cambia por tu usuario
         password="tu_password",    # Cambia por tu password
         port=5432,                 # Puerto de PostgreSQL
         connect_timeout=30         # Timeout de 30 segundos
     )
-    
+
+    if args.ingestar:
+        resultado = cargar_archivos(args.ingestar, parametros_conexion, conexiones=args.conexiones,
+                                    tamanio_lote=args.batch_size, encoding=args.encoding,
+                                    archivo_metricas=args.metricas, politica_duplicados=args.duplicados,
+                                    archivo_duplicados=args.reporte_duplicados)
+        sys.exit(1 if resultado['totales']['fallidos'] else 0)
+
+    conexion = psycopg2.connect(**parametros_conexion)
+
+    if args.exportar:
+        from exportacion import exportar
+        try:
+            exportar(conexion, args.exportar, formato=args.formato,
+                     encoding="utf-8" if args.encoding == "auto" else args.encoding)
+        finally:
+            conexion.close()
+        sys.exit(0)
+
     try:
         logger.info("Iniciando carga de datos geográficos...")
-        
+
         # Cargar los datos
-        cargar_datos_geograficos("./datos.csv", conexion)
-        
+        if args.sync:
+            sincronizar_datos_geograficos(args.archivo, conexion, dry_run=args.dry_run,
+                                          politica_duplicados=args.duplicados,
+                                          archivo_duplicados=args.reporte_duplicados)
+        elif args.asincrono:
+            asyncio.run(cargar_datos_geograficos_async(args.archivo, parametros_conexion,
+                                                       tamanio_lote=args.batch_size, en_vuelo=args.en_vuelo,
+                                                       encoding=args.encoding,
+                                                       archivo_metricas=args.metricas,
+                                                       politica_duplicados=args.duplicados,
+                                                       archivo_duplicados=args.reporte_duplicados))
+        elif args.trabajadores > 0:
+            cargar_datos_geograficos_paralelo(args.archivo, parametros_conexion,
+                                              trabajadores=args.trabajadores,
+                                              politica_duplicados=args.duplicados,
+                                              archivo_duplicados=args.reporte_duplicados)
+        else:
+            cargar_datos_geograficos(args.archivo, conexion, modo=args.modo,
+                                     usar_checkpoint=args.checkpoint, reanudar=args.resume,
+                                     archivo_rechazos=args.rechazos, tamanio_lote=args.batch_size,
+                                     archivo_metricas=args.metricas, encoding=args.encoding,
+                                     carga_inicial=args.carga_inicial, politica_duplicados=args.duplicados,
+                                     archivo_duplicados=args.reporte_duplicados)
+
         # Mostrar estadísticas
         with conexion.cursor() as cursor:
             cursor.execute("SELECT COUNT(*) FROM identidades.departamentos WHERE deleted_at IS NULL")
             dept_count = cursor.fetchone()[0]
-            
+
             cursor.execute("SELECT COUNT(*) FROM identidades.ciudades WHERE deleted_at IS NULL")
             ciudad_count = cursor.fetchone()[0]
-            
+
             cursor.execute("SELECT COUNT(*) FROM identidades.barrios WHERE deleted_at IS NULL")
             barrio_count = cursor.fetchone()[0]
-            
+
             logger.info("=== ESTADÍSTICAS FINALES ===")
             logger.info(f"Departamentos: {dept_count}")
             logger.info(f"Ciudades: {ciudad_count}")
             logger.info(f"Barrios: {barrio_count}")
-            
+
     except Exception as e:
         logger.error(f"Error: {e}")
         conexion.rollback()
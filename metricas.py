@@ -0,0 +1,164 @@
+"""
+Instrumentación de las cargas: tiempos por fase, sentencias, aciertos de cache
+y avisos por fila agregados.
+
+Las mediciones se acumulan en el camino caliente con sumas de perf_counter y
+contadores en diccionarios, sin formatear nada por fila. Al final de la carga
+el reporte se puede guardar como JSON o como textfile de Prometheus (para el
+textfile collector de node_exporter).
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+FASES = ('parseo', 'validacion', 'indices', 'departamentos', 'ciudades', 'barrios', 'copy', 'commit', 'vista')
+NIVELES_CACHE = ('departamentos', 'ciudades')
+
+
+class AvisosAgregados:
+    """
+    Avisos por fila con límite: de cada tipo de aviso solo se registran en el
+    log las primeras apariciones; el resto se cuenta y se resume al final,
+    con algunos números de fila de ejemplo.
+
+    Args:
+        limite: Avisos de cada tipo que se muestran individualmente
+        ejemplos: Números de fila que se guardan de cada tipo para el resumen
+    """
+
+    def __init__(self, limite=10, ejemplos=20):
+        self.limite = limite
+        self.ejemplos = ejemplos
+        self.conteo = Counter()
+        self.filas = {}
+        self._niveles = {}
+
+    def registrar(self, tipo, row_num, detalle=None, nivel=logging.WARNING):
+        """Cuenta un aviso de la fila row_num; solo formatea el mensaje si se va a mostrar."""
+        cantidad = self.conteo[tipo] = self.conteo[tipo] + 1
+        if cantidad <= self.ejemplos:
+            self.filas.setdefault(tipo, []).append(row_num)
+            self._niveles[tipo] = nivel
+        if cantidad <= self.limite:
+            mensaje = f"Fila {row_num}: {tipo}" if detalle is None else f"Fila {row_num}: {tipo}: {detalle}"
+            if cantidad == self.limite:
+                mensaje += " (los siguientes avisos de este tipo se resumen al final)"
+            logger.log(nivel, mensaje)
+
+    def resumir(self):
+        """Registra en el log un resumen de los tipos de aviso que superaron el límite."""
+        for tipo, cantidad in self.conteo.items():
+            if cantidad > self.limite:
+                filas = ', '.join(str(f) for f in self.filas[tipo])
+                logger.log(self._niveles[tipo], f"{tipo}: {cantidad} filas en total (primeras: {filas}, ...)")
+
+    def total(self):
+        return sum(self.conteo.values())
+
+
+class MetricasCarga:
+    """
+    Métricas de una carga. Las fases se acumulan con acumular(fase, inicio),
+    donde inicio es un time.perf_counter() tomado antes de la operación.
+
+    Args:
+        modo: Modo de carga, se usa como etiqueta en los reportes
+    """
+
+    def __init__(self, modo):
+        self.modo = modo
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.tiempos = dict.fromkeys(FASES, 0.0)
+        self.sentencias = Counter()
+        self.cache = {nivel: [0, 0] for nivel in NIVELES_CACHE}  # [aciertos, fallos]
+        self.avisos = AvisosAgregados()
+        self._ultimo_progreso = self.inicio
+
+    def acumular(self, fase, inicio):
+        """Suma a la fase el tiempo transcurrido desde inicio y retorna el instante actual."""
+        ahora = time.perf_counter()
+        self.tiempos[fase] += ahora - inicio
+        return ahora
+
+    def progreso(self, filas, intervalo=5.0):
+        """Registra el avance y las filas por segundo, como mucho una vez por intervalo."""
+        ahora = time.perf_counter()
+        if ahora - self._ultimo_progreso >= intervalo:
+            self._ultimo_progreso = ahora
+            logger.info(f"Procesadas {filas} filas ({filas / (ahora - self.inicio):.0f} filas/s)...")
+
+    def finalizar(self):
+        self.duracion = time.perf_counter() - self.inicio
+        self.avisos.resumir()
+
+    def a_dict(self, estadisticas):
+        """Reporte de la carga como diccionario serializable a JSON."""
+        duracion = self.duracion if self.duracion is not None else time.perf_counter() - self.inicio
+        filas = estadisticas.get('filas_procesadas', 0)
+        return {
+            'modo': self.modo,
+            'duracion_segundos': round(duracion, 6),
+            'filas_por_segundo': round(filas / duracion, 1) if duracion else None,
+            'filas': {clave: valor for clave, valor in estadisticas.items() if isinstance(valor, int)},
+            'fases_segundos': {fase: round(segundos, 6) for fase, segundos in self.tiempos.items()},
+            'sentencias': dict(self.sentencias),
+            'cache': {
+                nivel: {'aciertos': aciertos, 'fallos': fallos,
+                        'ratio': round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None}
+                for nivel, (aciertos, fallos) in self.cache.items()
+            },
+            'avisos': dict(self.avisos.conteo),
+        }
+
+    def guardar(self, ruta, estadisticas):
+        """
+        Guarda el reporte en ruta: textfile de Prometheus si termina en .prom y
+        JSON en otro caso. Se escribe en un temporal y se renombra, así quien lo
+        lea nunca ve un archivo a medio escribir.
+        """
+        reporte = self.a_dict(estadisticas)
+        contenido = (_formato_prometheus(reporte) if ruta.endswith('.prom')
+                     else json.dumps(reporte, indent=2, ensure_ascii=False) + '\n')
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as file:
+            file.write(contenido)
+        os.replace(temporal, ruta)
+        logger.info(f"Métricas de la carga guardadas en {ruta}")
+
+
+def _formato_prometheus(reporte):
+    """Convierte el reporte al formato de exposición de texto de Prometheus."""
+    modo = reporte['modo']
+    lineas = []
+
+    def metrica(nombre, tipo, ayuda, valores):
+        lineas.append(f"# HELP geo_carga_{nombre} {ayuda}")
+        lineas.append(f"# TYPE geo_carga_{nombre} {tipo}")
+        for etiquetas, valor in valores:
+            etiquetas = ','.join([f'modo="{modo}"'] + [f'{k}="{v}"' for k, v in etiquetas.items()])
+            lineas.append(f"geo_carga_{nombre}{{{etiquetas}}} {valor}")
+
+    metrica('duracion_segundos', 'gauge', 'Duración total de la última carga',
+            [({}, reporte['duracion_segundos'])])
+    metrica('filas_por_segundo', 'gauge', 'Filas procesadas por segundo en la última carga',
+            [({}, reporte['filas_por_segundo'] or 0)])
+    metrica('filas', 'gauge', 'Filas de la última carga por resultado',
+            [({'resultado': clave}, valor) for clave, valor in reporte['filas'].items()])
+    metrica('fase_segundos', 'gauge', 'Tiempo de la última carga por fase',
+            [({'fase': fase}, segundos) for fase, segundos in reporte['fases_segundos'].items()])
+    metrica('sentencias', 'gauge', 'Sentencias enviadas a la base en la última carga',
+            [({'tipo': tipo}, cantidad) for tipo, cantidad in reporte['sentencias'].items()])
+    metrica('cache_ratio_aciertos', 'gauge', 'Proporción de aciertos del cache de padres',
+            [({'nivel': nivel}, datos['ratio']) for nivel, datos in reporte['cache'].items()
+             if datos['ratio'] is not None])
+    metrica('avisos', 'gauge', 'Avisos por fila de la última carga por tipo',
+            [({'tipo': tipo.replace('"', "'")}, cantidad) for tipo, cantidad in reporte['avisos'].items()])
+    metrica('ultima_ejecucion_timestamp_segundos', 'gauge', 'Momento en que terminó la última carga',
+            [({}, int(time.time()))])
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,182 @@
+"""
+Resolución de nombres geográficos tolerante a acentos y errores de tipeo.
+
+Las direcciones que cargan los usuarios llegan como 'Asunción', 'ASUNCION' o
+'Asuncion', mientras que el CSV está en mayúsculas y sin acentos. Este módulo
+normaliza mayúsculas, acentos y puntuación, y busca por nombre exacto, por
+prefijo y por similitud de trigramas sobre las descripciones de departamentos,
+distritos y barrios de un GeoIndex. Todos los índices se calculan al construir
+el resolvedor, así una búsqueda no consulta la base de datos.
+
+Ejemplo:
+    resolvedor = ResolvedorNombres(GeoIndex.desde_csv('./datos.csv'))
+    resolvedor.resolver('Asunción', nivel='ciudad')
+    resolvedor.buscar('san antonoi', nivel='barrio', departamento=11)
+"""
+
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from itertools import chain
+
+NIVELES = ('departamento', 'ciudad', 'barrio')
+
+# Resultado de una búsqueda: la entidad del GeoIndex, su nivel y un puntaje entre 0 y 1
+Coincidencia = namedtuple('Coincidencia', ['entidad', 'nivel', 'puntaje'])
+
+
+def _crear_tabla_normalizacion():
+    """
+    Tabla para str.translate: quita acentos y convierte puntuación en espacios
+    para los caracteres latinos más comunes. Se calcula una sola vez.
+    """
+    tabla = {}
+    for codigo in range(0x250):
+        caracter = chr(codigo)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', caracter) if not unicodedata.combining(c))
+        if not base.isalnum():
+            tabla[codigo] = ' '
+        elif base != caracter:
+            tabla[codigo] = base
+    return tabla
+
+
+_TABLA_NORMALIZACION = _crear_tabla_normalizacion()
+
+
+def normalizar(texto):
+    """Pasa el texto a mayúsculas, sin acentos, sin puntuación y con espacios simples."""
+    return ' '.join(texto.translate(_TABLA_NORMALIZACION).upper().split())
+
+
+def trigramas(nombre):
+    """Retorna el conjunto de trigramas de un nombre normalizado (con bordes)."""
+    relleno = f"  {nombre} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class _TablaNombres:
+    """Índices precalculados de los nombres de un nivel de la jerarquía."""
+
+    __slots__ = ('nombres', 'entidades', 'exactos', 'ordenados', 'trigramas', 'cantidad_trigramas')
+
+    def __init__(self, entidades):
+        self.nombres = []
+        self.entidades = []
+        self.exactos = {}
+        for entidad in entidades:
+            nombre = normalizar(entidad.descripcion)
+            posicion = self.exactos.get(nombre)
+            if posicion is None:
+                posicion = self.exactos[nombre] = len(self.nombres)
+                self.nombres.append(nombre)
+                self.entidades.append([])
+            self.entidades[posicion].append(entidad)
+
+        self.ordenados = sorted(self.nombres)
+        self.trigramas = {}
+        self.cantidad_trigramas = []
+        for posicion, nombre in enumerate(self.nombres):
+            propios = trigramas(nombre)
+            self.cantidad_trigramas.append(len(propios))
+            for trigrama in propios:
+                self.trigramas.setdefault(trigrama, []).append(posicion)
+
+    def puntajes(self, consulta, umbral, limite_prefijo=50):
+        """Retorna {posición del nombre: puntaje} para una consulta normalizada."""
+        puntajes = {}
+
+        # Prefijo: los nombres ordenados que empiezan con la consulta
+        inicio = bisect_left(self.ordenados, consulta)
+        for nombre in self.ordenados[inicio:inicio + limite_prefijo]:
+            if not nombre.startswith(consulta):
+                break
+            puntajes[self.exactos[nombre]] = 0.8 + 0.2 * len(consulta) / len(nombre)
+
+        # Trigramas: coeficiente de Dice entre los trigramas de la consulta y del nombre
+        # (Counter cuenta en C, mucho más rápido que un bucle en Python)
+        propios = trigramas(consulta)
+        comunes = Counter(chain.from_iterable(self.trigramas.get(t, ()) for t in propios))
+        minimo = umbral * len(propios) / 2
+        for posicion, cantidad in comunes.items():
+            if cantidad < minimo:
+                continue
+            puntaje = 2 * cantidad / (len(propios) + self.cantidad_trigramas[posicion])
+            if puntaje >= umbral and puntaje > puntajes.get(posicion, 0):
+                puntajes[posicion] = puntaje
+
+        # Exacto
+        posicion = self.exactos.get(consulta)
+        if posicion is not None:
+            puntajes[posicion] = 1.0
+        return puntajes
+
+
+def _pertenece(entidad, nivel, departamento, ciudad):
+    """Indica si la entidad está dentro del departamento/ciudad indicados."""
+    if nivel == 'departamento':
+        return departamento is None or entidad.codigo == departamento
+    if nivel == 'ciudad':
+        return ((departamento is None or entidad.departamento.codigo == departamento)
+                and (ciudad is None or entidad.codigo == ciudad))
+    return ((departamento is None or entidad.ciudad.departamento.codigo == departamento)
+            and (ciudad is None or entidad.ciudad.codigo == ciudad))
+
+
+class ResolvedorNombres:
+    """
+    Motor de búsqueda de nombres sobre un GeoIndex.
+
+    Args:
+        geo_index: GeoIndex con la jerarquía ya cargada
+        umbral: Puntaje mínimo de similitud por trigramas (0 a 1)
+    """
+
+    def __init__(self, geo_index, umbral=0.45):
+        self.umbral = umbral
+        self._tablas = {
+            'departamento': _TablaNombres(geo_index.departamentos()),
+            'ciudad': _TablaNombres(geo_index.ciudades()),
+            'barrio': _TablaNombres(geo_index.barrios()),
+        }
+
+    def buscar(self, texto, nivel=None, departamento=None, ciudad=None, limite=10):
+        """
+        Busca entidades cuyo nombre se parezca al texto.
+
+        Args:
+            texto: Nombre tal como lo escribió el usuario
+            nivel: 'departamento', 'ciudad', 'barrio' o None para todos
+            departamento: Código de departamento para acotar los resultados
+            ciudad: Código de distrito para acotar los resultados (junto con departamento)
+            limite: Cantidad máxima de resultados
+
+        Returns:
+            Lista de Coincidencia ordenada de mayor a menor puntaje
+        """
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+        if nivel is not None and nivel not in NIVELES:
+            raise ValueError(f"Nivel desconocido: {nivel}. Opciones: {', '.join(NIVELES)}")
+
+        candidatos = []
+        for nombre_nivel in ((nivel,) if nivel else NIVELES):
+            tabla = self._tablas[nombre_nivel]
+            for posicion, puntaje in tabla.puntajes(consulta, self.umbral).items():
+                candidatos.append((puntaje, nombre_nivel, posicion))
+        candidatos.sort(key=lambda c: c[0], reverse=True)
+
+        resultados = []
+        for puntaje, nombre_nivel, posicion in candidatos:
+            for entidad in self._tablas[nombre_nivel].entidades[posicion]:
+                if _pertenece(entidad, nombre_nivel, departamento, ciudad):
+                    resultados.append(Coincidencia(entidad, nombre_nivel, round(puntaje, 3)))
+                    if len(resultados) >= limite:
+                        return resultados
+        return resultados
+
+    def resolver(self, texto, nivel=None, departamento=None, ciudad=None):
+        """Retorna la mejor Coincidencia para el texto o None si no hay ninguna."""
+        resultados = self.buscar(texto, nivel, departamento, ciudad, limite=1)
+        return resultados[0] if resultados else None
@@ -0,0 +1,445 @@
+"""
+Servicio HTTP de consulta de la jerarquía geográfica en memoria.
+
+Carga una vez un GeoIndex (desde el CSV o desde las tablas de identidades) y
+responde búsquedas por código y por nombre sin consultar la base de datos. Las
+respuestas se guardan ya serializadas en un cache LRU acotado, así las
+consultas repetidas no vuelven a buscar ni a generar JSON.
+
+La recarga (POST /recargar o la señal SIGHUP) construye el índice nuevo
+mientras se sigue respondiendo con el anterior y al final lo reemplaza con una
+sola asignación. Cada pedido toma el dataset vigente al empezar, junto con su
+propio cache, así nunca mezcla datos de dos versiones.
+
+Endpoints (respuestas JSON):
+    GET  /salud                              versión del dataset y estadísticas del cache
+    GET  /barrios?codigo=1705180&codigo=...  barrios por Codigo concatenado (null si no existe)
+    POST /barrios   {"codigos": [1705180, ...]}
+    GET  /buscar?q=san+antonio&nivel=barrio&departamento=11&ciudad=...&limite=10
+    POST /buscar    {"consultas": [{"q": "asuncion", "nivel": "ciudad"}, ...]}
+    POST /recargar                           vuelve a cargar el origen y reemplaza el índice
+
+Uso:
+    python servicio.py --csv datos.csv --puerto 8080
+    python servicio.py --dsn "host=localhost dbname=geo" --puerto 8080
+    python dev.py loadtest --url http://127.0.0.1:8080
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import random
+import signal
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+from geo_index import GeoIndex
+from resolucion_nombres import NIVELES, ResolvedorNombres
+
+logger = logging.getLogger(__name__)
+
+# Respuestas guardadas por dataset
+TAMANIO_CACHE = 10000
+
+# Máximo de códigos o consultas en un pedido por lotes
+MAXIMO_LOTE = 1000
+
+_CAMPOS_BARRIO = (
+    'codigo_concatenado', 'codigo_departamento', 'desc_departamento',
+    'codigo_distrito', 'desc_distrito', 'area', 'codigo_barrio', 'desc_barrio',
+)
+
+
+class CacheLRU:
+    """
+    Cache LRU acotado y seguro entre hilos: al superar maximo se descarta la
+    entrada usada hace más tiempo.
+    """
+
+    def __init__(self, maximo=TAMANIO_CACHE):
+        self.maximo = maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, calcular):
+        """Retorna el valor guardado para clave o lo calcula con calcular() y lo guarda."""
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return valor
+            self.fallos += 1
+        # Se calcula fuera del lock: dos hilos pueden calcular la misma clave,
+        # pero ninguno espera a otro
+        valor = calcular()
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            if len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._entradas), 'maximo': self.maximo,
+            'aciertos': self.aciertos, 'fallos': self.fallos,
+            'ratio': round(self.aciertos / consultas, 4) if consultas else None,
+        }
+
+
+class Dataset:
+    """Índice, resolvedor de nombres y cache de una versión de los datos; no cambia una vez creado."""
+
+    __slots__ = ('index', 'resolvedor', 'cache', 'version', 'cargado')
+
+    def __init__(self, index, version, tamanio_cache=TAMANIO_CACHE):
+        self.index = index
+        self.resolvedor = ResolvedorNombres(index)
+        self.cache = CacheLRU(tamanio_cache)
+        self.version = version
+        self.cargado = time.time()
+
+
+def _barrio_json(barrio):
+    """JSON de un barrio con su ruta, con los campos de la exportación jsonl."""
+    if barrio is None:
+        return 'null'
+    departamento, ciudad, _ = barrio.ruta()
+    return json.dumps(dict(zip(_CAMPOS_BARRIO, (
+        barrio.codigo_concatenado, departamento.codigo, departamento.descripcion,
+        ciudad.codigo, ciudad.descripcion, ciudad.area, barrio.codigo, barrio.descripcion,
+    ))), ensure_ascii=False)
+
+
+def _coincidencia_a_dict(coincidencia):
+    entidad = coincidencia.entidad
+    resultado = {'nivel': coincidencia.nivel, 'puntaje': coincidencia.puntaje,
+                 'codigo': entidad.codigo, 'descripcion': entidad.descripcion}
+    if coincidencia.nivel == 'ciudad':
+        resultado['codigo_departamento'] = entidad.departamento.codigo
+        resultado['area'] = entidad.area
+    elif coincidencia.nivel == 'barrio':
+        resultado['codigo_concatenado'] = entidad.codigo_concatenado
+        resultado['codigo_departamento'] = entidad.ciudad.departamento.codigo
+        resultado['codigo_distrito'] = entidad.ciudad.codigo
+    return resultado
+
+
+def _entero(valor, nombre):
+    if valor is None or valor == '':
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nombre} debe ser un número entero: {valor!r}") from None
+
+
+class ServicioGeografico:
+    """
+    Consultas sobre el dataset vigente y recarga con reemplazo atómico.
+
+    Args:
+        cargar: Función sin argumentos que construye un GeoIndex nuevo
+        origen: Descripción del origen de los datos, para la salud y los logs
+        tamanio_cache: Respuestas guardadas por dataset
+    """
+
+    def __init__(self, cargar, origen, tamanio_cache=TAMANIO_CACHE):
+        self._cargar = cargar
+        self.origen = origen
+        self.tamanio_cache = tamanio_cache
+        self._lock_recarga = threading.Lock()
+        self._version = 0
+        self.dataset = None
+        self.recargar()
+
+    def recargar(self):
+        """
+        Construye un dataset nuevo y lo publica. Mientras tanto los pedidos se
+        siguen respondiendo con el anterior. Si otra recarga está en curso no
+        hace nada y retorna False.
+        """
+        if not self._lock_recarga.acquire(blocking=False):
+            logger.warning("Ya hay una recarga en curso")
+            return False
+        try:
+            inicio = time.perf_counter()
+            try:
+                index = self._cargar()
+            except Exception as e:
+                logger.error(f"No se pudo cargar {self.origen}, se mantiene el dataset anterior: {e}")
+                raise
+            self._version += 1
+            self.dataset = Dataset(index, self._version, self.tamanio_cache)
+            logger.info(f"Dataset {self._version} publicado desde {self.origen} "
+                        f"en {time.perf_counter() - inicio:.2f}s: {index.resumen()}")
+            return True
+        finally:
+            self._lock_recarga.release()
+
+    def salud(self):
+        dataset = self.dataset
+        return json.dumps({
+            'estado': 'ok', 'origen': self.origen, 'version': dataset.version,
+            'cargado': dataset.cargado, 'resumen': dataset.index.resumen(),
+            'cache': dataset.cache.estadisticas(),
+        }, ensure_ascii=False)
+
+    def barrios(self, codigos):
+        """JSON con el barrio de cada Codigo concatenado, en el mismo orden (null si no existe)."""
+        if not isinstance(codigos, list):
+            raise ValueError("codigos debe ser una lista")
+        if len(codigos) > MAXIMO_LOTE:
+            raise ValueError(f"Se aceptan hasta {MAXIMO_LOTE} códigos por pedido")
+        dataset = self.dataset
+        partes = []
+        for codigo in codigos:
+            codigo = _entero(codigo, 'codigo')
+            if codigo is None:
+                raise ValueError("Código vacío")
+            partes.append(dataset.cache.obtener(
+                ('barrio', codigo), lambda: _barrio_json(dataset.index.por_codigo_concatenado(codigo))))
+        return f"[{', '.join(partes)}]"
+
+    def _buscar(self, dataset, consulta):
+        texto = consulta.get('q') or ''
+        nivel = consulta.get('nivel') or None
+        if nivel is not None and nivel not in NIVELES:
+            raise ValueError(f"Nivel desconocido: {nivel}. Opciones: {', '.join(NIVELES)}")
+        departamento = _entero(consulta.get('departamento'), 'departamento')
+        ciudad = _entero(consulta.get('ciudad'), 'ciudad')
+        limite = min(_entero(consulta.get('limite'), 'limite') or 10, 100)
+
+        def calcular():
+            resultados = dataset.resolvedor.buscar(texto, nivel, departamento, ciudad, limite)
+            return json.dumps([_coincidencia_a_dict(c) for c in resultados], ensure_ascii=False)
+
+        return dataset.cache.obtener(('buscar', texto, nivel, departamento, ciudad, limite), calcular)
+
+    def buscar(self, consulta):
+        """JSON con las coincidencias de una consulta {'q', 'nivel', 'departamento', 'ciudad', 'limite'}."""
+        return self._buscar(self.dataset, consulta)
+
+    def buscar_lote(self, consultas):
+        """JSON con la lista de coincidencias de cada consulta, todas sobre el mismo dataset."""
+        if not isinstance(consultas, list) or not all(isinstance(c, dict) for c in consultas):
+            raise ValueError("consultas debe ser una lista de objetos")
+        if len(consultas) > MAXIMO_LOTE:
+            raise ValueError(f"Se aceptan hasta {MAXIMO_LOTE} consultas por pedido")
+        dataset = self.dataset
+        return f"[{', '.join(self._buscar(dataset, consulta) for consulta in consultas)}]"
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    """Traduce los pedidos HTTP a llamadas de ServicioGeografico (self.server.servicio)."""
+
+    protocol_version = 'HTTP/1.1'
+    # Encabezados y cuerpo salen en dos escrituras: sin esto, Nagle y el ACK
+    # retrasado del cliente suman ~40 ms a cada respuesta con keep-alive
+    disable_nagle_algorithm = True
+    server_version = 'ServicioGeografico/1.0'
+
+    def log_message(self, formato, *args):
+        logger.debug(f"{self.address_string()} {formato % args}")
+
+    def _responder(self, estado, cuerpo):
+        datos = cuerpo.encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _error(self, estado, mensaje):
+        self._responder(estado, json.dumps({'error': mensaje}, ensure_ascii=False))
+
+    def _leer_json(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        if not largo:
+            return {}
+        cuerpo = json.loads(self.rfile.read(largo))
+        if not isinstance(cuerpo, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON")
+        return cuerpo
+
+    def _atender(self, metodo):
+        servicio = self.server.servicio
+        url = urlsplit(self.path)
+        try:
+            if metodo == 'GET':
+                parametros = parse_qs(url.query)
+                if url.path == '/salud':
+                    return self._responder(200, servicio.salud())
+                if url.path == '/barrios':
+                    return self._responder(200, servicio.barrios(parametros.get('codigo', [])))
+                if url.path == '/buscar':
+                    consulta = {clave: valores[-1] for clave, valores in parametros.items()}
+                    return self._responder(200, servicio.buscar(consulta))
+            else:
+                cuerpo = self._leer_json()
+                if url.path == '/barrios':
+                    return self._responder(200, servicio.barrios(cuerpo.get('codigos') or []))
+                if url.path == '/buscar':
+                    return self._responder(200, servicio.buscar_lote(cuerpo.get('consultas') or []))
+                if url.path == '/recargar':
+                    recargado = servicio.recargar()
+                    return self._responder(200 if recargado else 409, servicio.salud())
+            self._error(404, f"Ruta desconocida: {metodo} {url.path}")
+        except ValueError as e:  # incluye JSON inválido
+            self._error(400, str(e))
+        except Exception as e:
+            logger.error(f"Error atendiendo {metodo} {self.path}: {e}")
+            self._error(500, "Error interno")
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+
+def crear_servidor(servicio, host='127.0.0.1', puerto=8080):
+    """Crea el servidor HTTP (un hilo por conexión) para servicio; se inicia con serve_forever()."""
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    servidor.daemon_threads = True
+    servidor.servicio = servicio
+    return servidor
+
+
+def _percentil(ordenados, p):
+    """Percentil p (0-100) por rango más cercano sobre una lista ordenada."""
+    if not ordenados:
+        return None
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def prueba_de_carga(url, archivo_csv='./datos.csv', pedidos=10000, concurrencia=8, codigos_por_pedido=20,
+                    proporcion_busquedas=0.2, semilla=42):
+    """
+    Genera carga contra un servicio en marcha y mide la latencia de cada pedido.
+
+    Cada hilo usa una conexión persistente y envía una mezcla de consultas por
+    lotes de códigos (POST /barrios) y búsquedas por nombre (GET /buscar) con
+    códigos y nombres tomados de archivo_csv.
+
+    Returns:
+        Diccionario con pedidos por segundo, errores y latencias p50, p90, p99
+        y máxima en milisegundos, en total y por endpoint
+    """
+    index = GeoIndex.desde_csv(archivo_csv)
+    codigos = [barrio.codigo_concatenado for barrio in index.barrios()]
+    nombres = [barrio.descripcion for barrio in index.barrios()]
+    destino = urlsplit(url)
+    por_hilo = [pedidos // concurrencia + (1 if i < pedidos % concurrencia else 0) for i in range(concurrencia)]
+    latencias = {'barrios': [], 'buscar': []}
+    errores = []
+
+    def trabajador(numero, cantidad):
+        azar = random.Random(semilla + numero)
+        conexion = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+        propias = {'barrios': [], 'buscar': []}
+        fallidos = 0
+        try:
+            for _ in range(cantidad):
+                if azar.random() < proporcion_busquedas:
+                    endpoint = 'buscar'
+                    nombre = azar.choice(nombres)
+                    consulta = nombre[:max(3, azar.randint(len(nombre) // 2, len(nombre)))]
+                    metodo, ruta, cuerpo = 'GET', f"/buscar?q={quote_plus(consulta)}", None
+                else:
+                    endpoint = 'barrios'
+                    metodo, ruta = 'POST', '/barrios'
+                    cuerpo = json.dumps({'codigos': azar.sample(codigos, min(codigos_por_pedido, len(codigos)))})
+                inicio = time.perf_counter()
+                try:
+                    conexion.request(metodo, ruta, body=cuerpo, headers={'Content-Type': 'application/json'})
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    if respuesta.status != 200:
+                        fallidos += 1
+                except (OSError, http.client.HTTPException):
+                    fallidos += 1
+                    conexion.close()
+                    continue
+                propias[endpoint].append(time.perf_counter() - inicio)
+        finally:
+            conexion.close()
+            for clave, valores in propias.items():
+                latencias[clave].extend(valores)
+            errores.append(fallidos)
+
+    hilos = [threading.Thread(target=trabajador, args=(i, cantidad)) for i, cantidad in enumerate(por_hilo)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    def resumen(valores):
+        ordenados = sorted(valores)
+        return {
+            'pedidos': len(ordenados),
+            **{f"p{p}_ms": round(_percentil(ordenados, p) * 1000, 3) if ordenados else None for p in (50, 90, 99)},
+            'max_ms': round(ordenados[-1] * 1000, 3) if ordenados else None,
+        }
+
+    reporte = {
+        'url': url, 'concurrencia': concurrencia, 'duracion_segundos': round(duracion, 3),
+        'pedidos_por_segundo': round(sum(len(v) for v in latencias.values()) / duracion, 1),
+        'errores': sum(errores),
+        'total': resumen(latencias['barrios'] + latencias['buscar']),
+        'barrios': resumen(latencias['barrios']),
+        'buscar': resumen(latencias['buscar']),
+    }
+    logger.info(f"Prueba de carga: {reporte['pedidos_por_segundo']} pedidos/s, "
+                f"p50 {reporte['total']['p50_ms']} ms, p99 {reporte['total']['p99_ms']} ms, "
+                f"{reporte['errores']} errores")
+    return reporte
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Servicio HTTP de consulta de la jerarquía geográfica")
+    origen = parser.add_mutually_exclusive_group()
+    origen.add_argument("--csv", default="./datos.csv", help="Archivo CSV a cargar (por defecto ./datos.csv)")
+    origen.add_argument("--dsn", help="Cargar desde las tablas de identidades con esta conexión psycopg2")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección donde escuchar")
+    parser.add_argument("--puerto", type=int, default=8080, help="Puerto donde escuchar")
+    parser.add_argument("--cache", type=int, default=TAMANIO_CACHE,
+                        help=f"Respuestas guardadas en el cache LRU (por defecto {TAMANIO_CACHE})")
+    args = parser.parse_args()
+
+    if args.dsn:
+        import psycopg2
+
+        def cargar():
+            conexion = psycopg2.connect(args.dsn)
+            try:
+                return GeoIndex.desde_db(conexion)
+            finally:
+                conexion.close()
+        servicio = ServicioGeografico(cargar, "la base de datos", args.cache)
+    else:
+        servicio = ServicioGeografico(lambda: GeoIndex.desde_csv(args.csv), args.csv, args.cache)
+
+    servidor = crear_servidor(servicio, args.host, args.puerto)
+    # SIGHUP recarga en otro hilo, así el servidor sigue atendiendo
+    signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=servicio.recargar, daemon=True).start())
+    logger.info(f"Escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
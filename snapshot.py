@@ -0,0 +1,246 @@
+"""
+Snapshot binario de la jerarquía geográfica, leído con mmap.
+
+Compila departamentos, ciudades y barrios a un archivo versionado con
+registros de ancho fijo, una tabla de textos internados y los registros
+ordenados por código. Los lectores abren el archivo con mmap y acceden a los
+registros directamente sobre las páginas mapeadas, sin parsear nada: varios
+procesos comparten la misma copia en el page cache y el arranque en frío toma
+milisegundos.
+
+Formato (little-endian):
+    Encabezado   magic, versión, cantidades y offsets de cada sección
+    Departamentos codigo, texto, primera ciudad, cantidad de ciudades
+    Ciudades     codigo_departamento, codigo, area, texto, departamento,
+                 primer barrio, cantidad de barrios (ordenadas por departamento y codigo)
+    Barrios      codigo_concatenado, codigo, texto, ciudad (ordenados por codigo_concatenado)
+    Textos       descripciones UTF-8 sin repetir
+
+Uso:
+    python snapshot.py datos.csv datos.snap
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GEOSNAP\x00'
+VERSION = 1
+
+_ENCABEZADO = struct.Struct('<8sIIII4Q')
+_DEPARTAMENTO = struct.Struct('<iIIII')
+_CIUDAD = struct.Struct('<iiiIIIII')
+_BARRIO = struct.Struct('<IiIII')
+
+DepartamentoSnapshot = namedtuple('DepartamentoSnapshot', ['codigo', 'descripcion'])
+CiudadSnapshot = namedtuple('CiudadSnapshot', ['codigo_departamento', 'codigo', 'descripcion', 'area'])
+BarrioSnapshot = namedtuple('BarrioSnapshot', [
+    'codigo_concatenado', 'codigo_departamento', 'codigo_distrito', 'codigo', 'descripcion',
+])
+
+
+def compilar_snapshot(geo_index, destino):
+    """
+    Escribe el snapshot de un GeoIndex. El archivo se genera con otro nombre y
+    se reemplaza de forma atómica, así los lectores con el snapshot anterior
+    mapeado no se ven afectados.
+
+    Returns:
+        Tamaño en bytes del snapshot generado
+    """
+    textos = {}
+    tabla_textos = bytearray()
+
+    def texto(valor):
+        ubicacion = textos.get(valor)
+        if ubicacion is None:
+            codificado = valor.encode('utf-8')
+            ubicacion = textos[valor] = (len(tabla_textos), len(codificado))
+            tabla_textos.extend(codificado)
+        return ubicacion
+
+    departamentos = sorted(geo_index.departamentos(), key=lambda d: d.codigo)
+    registros_departamentos = bytearray()
+    registros_ciudades = bytearray()
+    registros_barrios = bytearray()
+    cantidad_ciudades = 0
+    cantidad_barrios = 0
+
+    for indice_departamento, departamento in enumerate(departamentos):
+        ciudades = sorted(departamento.ciudades, key=lambda c: c.codigo)
+        registros_departamentos += _DEPARTAMENTO.pack(
+            departamento.codigo, *texto(departamento.descripcion), cantidad_ciudades, len(ciudades))
+        for ciudad in ciudades:
+            barrios = sorted(ciudad.barrios, key=lambda b: b.codigo)
+            registros_ciudades += _CIUDAD.pack(
+                departamento.codigo, ciudad.codigo, ciudad.area if ciudad.area is not None else -1,
+                *texto(ciudad.descripcion), indice_departamento, cantidad_barrios, len(barrios))
+            for barrio in barrios:
+                registros_barrios += _BARRIO.pack(
+                    barrio.codigo_concatenado, barrio.codigo, *texto(barrio.descripcion), cantidad_ciudades)
+            cantidad_ciudades += 1
+            cantidad_barrios += len(barrios)
+
+    offset_departamentos = _ENCABEZADO.size
+    offset_ciudades = offset_departamentos + len(registros_departamentos)
+    offset_barrios = offset_ciudades + len(registros_ciudades)
+    offset_textos = offset_barrios + len(registros_barrios)
+    encabezado = _ENCABEZADO.pack(MAGIC, VERSION, len(departamentos), cantidad_ciudades, cantidad_barrios,
+                                  offset_departamentos, offset_ciudades, offset_barrios, offset_textos)
+
+    temporal = f"{destino}.tmp"
+    with open(temporal, 'wb') as file:
+        for parte in (encabezado, registros_departamentos, registros_ciudades, registros_barrios, tabla_textos):
+            file.write(parte)
+    os.replace(temporal, destino)
+
+    tamanio = offset_textos + len(tabla_textos)
+    logger.info(f"Snapshot {destino} generado: {len(departamentos)} departamentos, {cantidad_ciudades} ciudades, "
+                f"{cantidad_barrios} barrios, {tamanio} bytes")
+    return tamanio
+
+
+class Snapshot:
+    """
+    Lector de un snapshot mapeado en memoria. Las búsquedas por código son
+    búsquedas binarias sobre los registros ordenados; solo se decodifican los
+    textos de los registros que se devuelven.
+
+    Se puede usar como context manager para liberar el mapeo al terminar.
+    """
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._datos = memoryview(self._mmap)
+
+        (magic, version, self.cantidad_departamentos, self.cantidad_ciudades, self.cantidad_barrios,
+         self._offset_departamentos, self._offset_ciudades, self._offset_barrios,
+         self._offset_textos) = _ENCABEZADO.unpack_from(self._datos, 0)
+        if magic != MAGIC:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es un snapshot geográfico")
+        if version != VERSION:
+            self.cerrar()
+            raise ValueError(f"Versión de snapshot no soportada: {version} (se esperaba {VERSION})")
+
+    def cerrar(self):
+        self._datos.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    # Acceso a registros
+
+    def _texto(self, offset, largo):
+        inicio = self._offset_textos + offset
+        return str(self._datos[inicio:inicio + largo], 'utf-8')
+
+    def _registro_departamento(self, indice):
+        return _DEPARTAMENTO.unpack_from(self._datos, self._offset_departamentos + indice * _DEPARTAMENTO.size)
+
+    def _registro_ciudad(self, indice):
+        return _CIUDAD.unpack_from(self._datos, self._offset_ciudades + indice * _CIUDAD.size)
+
+    def _registro_barrio(self, indice):
+        return _BARRIO.unpack_from(self._datos, self._offset_barrios + indice * _BARRIO.size)
+
+    def _departamento(self, indice):
+        codigo, texto_offset, texto_largo, _, _ = self._registro_departamento(indice)
+        return DepartamentoSnapshot(codigo, self._texto(texto_offset, texto_largo))
+
+    def _ciudad(self, indice):
+        codigo_dept, codigo, area, texto_offset, texto_largo, _, _, _ = self._registro_ciudad(indice)
+        return CiudadSnapshot(codigo_dept, codigo, self._texto(texto_offset, texto_largo),
+                              area if area >= 0 else None)
+
+    def _barrio(self, indice):
+        concatenado, codigo, texto_offset, texto_largo, indice_ciudad = self._registro_barrio(indice)
+        codigo_dept, codigo_distrito = self._registro_ciudad(indice_ciudad)[:2]
+        return BarrioSnapshot(concatenado, codigo_dept, codigo_distrito, codigo,
+                              self._texto(texto_offset, texto_largo))
+
+    @staticmethod
+    def _buscar(cantidad, clave_de, clave):
+        """Búsqueda binaria: índice del registro con esa clave o None."""
+        bajo, alto = 0, cantidad
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if clave_de(medio) < clave:
+                bajo = medio + 1
+            else:
+                alto = medio
+        if bajo < cantidad and clave_de(bajo) == clave:
+            return bajo
+        return None
+
+    def _indice_ciudad(self, codigo_departamento, codigo_distrito):
+        return self._buscar(self.cantidad_ciudades, lambda i: tuple(self._registro_ciudad(i)[:2]),
+                            (codigo_departamento, codigo_distrito))
+
+    # Búsquedas
+
+    def departamento(self, codigo):
+        indice = self._buscar(self.cantidad_departamentos, lambda i: self._registro_departamento(i)[0], codigo)
+        return None if indice is None else self._departamento(indice)
+
+    def ciudad(self, codigo_departamento, codigo_distrito):
+        indice = self._indice_ciudad(codigo_departamento, codigo_distrito)
+        return None if indice is None else self._ciudad(indice)
+
+    def por_codigo_concatenado(self, codigo):
+        indice = self._buscar(self.cantidad_barrios, lambda i: self._registro_barrio(i)[0], int(codigo))
+        return None if indice is None else self._barrio(indice)
+
+    def barrio(self, codigo_departamento, codigo_distrito, codigo_barrio):
+        indice_ciudad = self._indice_ciudad(codigo_departamento, codigo_distrito)
+        if indice_ciudad is None:
+            return None
+        _, _, _, _, _, _, primero, cantidad = self._registro_ciudad(indice_ciudad)
+        indice = self._buscar(cantidad, lambda i: self._registro_barrio(primero + i)[1], codigo_barrio)
+        return None if indice is None else self._barrio(primero + indice)
+
+    # Navegación
+
+    def departamentos(self):
+        return (self._departamento(i) for i in range(self.cantidad_departamentos))
+
+    def ciudades_de(self, codigo_departamento):
+        indice = self._buscar(self.cantidad_departamentos,
+                              lambda i: self._registro_departamento(i)[0], codigo_departamento)
+        if indice is None:
+            return []
+        _, _, _, primera, cantidad = self._registro_departamento(indice)
+        return [self._ciudad(i) for i in range(primera, primera + cantidad)]
+
+    def barrios_de(self, codigo_departamento, codigo_distrito):
+        indice = self._indice_ciudad(codigo_departamento, codigo_distrito)
+        if indice is None:
+            return []
+        _, _, _, _, _, _, primero, cantidad = self._registro_ciudad(indice)
+        return [self._barrio(i) for i in range(primero, primero + cantidad)]
+
+    def __len__(self):
+        return self.cantidad_barrios
+
+
+if __name__ == "__main__":
+    from geo_index import GeoIndex
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compila el CSV geográfico a un snapshot binario")
+    parser.add_argument("archivo", help="Archivo CSV en el formato de datos.csv")
+    parser.add_argument("destino", help="Ruta del snapshot a generar")
+    args = parser.parse_args()
+
+    compilar_snapshot(GeoIndex.desde_csv(args.archivo), args.destino)
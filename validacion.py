@@ -0,0 +1,250 @@
+"""
+Validación del CSV sin base de datos, en paralelo por rangos de bytes.
+
+Aplica las mismas verificaciones que la carga (cantidad de columnas, códigos
+numéricos, descripciones no vacías) y además detecta barrios repetidos,
+nombres distintos para un mismo código de departamento, distrito o barrio y
+Codigo concatenado que no coincide con sus componentes.
+
+El archivo se divide en bloques de bytes alineados a líneas que se validan en
+un pool de procesos. Cada bloque numera sus líneas localmente y devuelve sus
+claves en arreglos compactos; el proceso principal suma los desplazamientos de
+línea y cruza las claves de todos los bloques. Como la carga con checkpoints,
+supone un registro por línea (el formato de datos.csv no usa campos con saltos
+de línea).
+
+Uso:
+    python main.py nacional.csv --validate-only --reporte-validacion errores.csv
+"""
+
+import csv
+import logging
+import math
+import os
+import zlib
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from geo_index import codigo_concatenado
+from lector_csv import TAMANIO_MUESTRA, decodificar, detectar_encoding, procesar_fila_csv
+from metricas import AvisosAgregados
+
+logger = logging.getLogger(__name__)
+
+# Tamaño mínimo de bloque: con archivos chicos no conviene repartir
+TAMANIO_MINIMO_BLOQUE = 4 * 1024 * 1024
+
+COLUMNAS_REPORTE = ['Linea', 'Tipo', 'Detalle']
+
+_MASCARA_CRC = 0xFFFFFFFF
+
+
+class _ColectorErrores:
+    """Reemplazo de AvisosAgregados para procesar_fila_csv que guarda todos los avisos."""
+
+    def __init__(self):
+        self.errores = []
+
+    def registrar(self, tipo, row_num, detalle=None, nivel=None):
+        self.errores.append((row_num, tipo, '' if detalle is None else str(detalle)))
+
+
+def _lineas_bloque(file, fin, encoding):
+    """Genera las líneas que empiezan antes de fin, a partir de la posición actual."""
+    posicion = file.tell()
+    while posicion < fin:
+        linea = file.readline()
+        if not linea:
+            return
+        posicion += len(linea)
+        texto, alternativo = decodificar(linea, encoding)
+        if alternativo != encoding:
+            logger.warning(f"El archivo no es {encoding} más allá del inicio, se continúa como {alternativo}")
+            encoding = alternativo
+        yield texto
+
+
+def _validar_bloque(archivo_csv, inicio, fin, encoding):
+    """
+    Valida las líneas que empiezan dentro de [inicio, fin). Las líneas se
+    numeran desde 1 dentro del bloque.
+
+    Returns:
+        Diccionario con la cantidad de líneas leídas, los errores por fila, las
+        descripciones de departamentos y ciudades con su primera línea, y los
+        barrios como arreglos de Codigo concatenado y (línea << 32 | crc32 del nombre)
+    """
+    colector = _ColectorErrores()
+    departamentos = {}
+    ciudades = {}
+    claves = array('q')
+    valores = array('Q')
+    filas_validas = 0
+    lineas = 0
+
+    with open(archivo_csv, 'rb') as file:
+        if inicio > 0:
+            # Descartar el resto de la línea que empezó en el bloque anterior
+            file.seek(inicio - 1)
+            file.readline()
+        reader = csv.reader(_lineas_bloque(file, fin, encoding), delimiter=';')
+
+        for linea, row in enumerate(reader, start=1):
+            lineas = linea
+            if inicio == 0 and linea == 1:
+                continue  # header
+
+            try:
+                fila = procesar_fila_csv(row, linea, colector)
+            except (ValueError, IndexError) as e:
+                colector.registrar("Error en formato de datos", linea, e)
+                continue
+            if fila is None:
+                continue
+            filas_validas += 1
+
+            departamentos.setdefault(fila.codigo_departamento, {}).setdefault(fila.desc_departamento, linea)
+            ciudades.setdefault((fila.codigo_departamento, fila.codigo_distrito), {}).setdefault(
+                fila.desc_distrito, linea)
+
+            if not (0 <= fila.codigo_distrito < 100 and 0 <= fila.codigo_barrio < 1000):
+                colector.registrar("Código fuera de rango para el Codigo concatenado", linea,
+                                   f"distrito {fila.codigo_distrito}, barrio {fila.codigo_barrio}")
+                continue
+            esperado = codigo_concatenado(fila.codigo_departamento, fila.codigo_distrito, fila.codigo_barrio)
+            if row[0].strip() != str(esperado):
+                colector.registrar("Codigo concatenado inconsistente", linea,
+                                   f"{row[0].strip()!r}, se esperaba {esperado}")
+            claves.append(esperado)
+            valores.append(linea << 32 | zlib.crc32(fila.desc_barrio.encode('utf-8')))
+
+    return {
+        'lineas': lineas,
+        'filas_validas': filas_validas,
+        'errores': colector.errores,
+        'departamentos': departamentos,
+        'ciudades': ciudades,
+        'claves': claves,
+        'valores': valores,
+    }
+
+
+def _bloques(tamanio, trabajadores, tamanio_bloque=None):
+    """Divide el archivo en rangos de bytes, unos cuatro por trabajador."""
+    tamanio_bloque = tamanio_bloque or max(TAMANIO_MINIMO_BLOQUE, math.ceil(tamanio / (trabajadores * 4)))
+    return [(inicio, min(inicio + tamanio_bloque, tamanio)) for inicio in range(0, tamanio, tamanio_bloque)]
+
+
+def _conflictos_nombres(codigos, tipo, etiqueta):
+    """Errores por cada descripción distinta de la primera para un mismo código."""
+    errores = []
+    for codigo, nombres in codigos.items():
+        if len(nombres) > 1:
+            (primero, linea_primero), *otros = sorted(nombres.items(), key=lambda n: n[1])
+            for nombre, linea in otros:
+                errores.append((linea, tipo, f"{etiqueta} {codigo}: {nombre!r} distinto de {primero!r} "
+                                             f"(línea {linea_primero})"))
+    return errores
+
+
+def validar_csv(archivo_csv, trabajadores=None, archivo_reporte=None, encoding='auto', tamanio_bloque=None):
+    """
+    Valida un CSV con el formato de datos.csv sin conectarse a la base.
+
+    Args:
+        archivo_csv: Ruta al archivo CSV
+        trabajadores: Procesos del pool; por defecto la cantidad de CPUs
+        archivo_reporte: Ruta de un CSV donde escribir todos los errores con
+            su número de línea; sin él se muestran en el log los primeros de
+            cada tipo
+        encoding: Codificación del archivo o 'auto' para detectarla con el
+            primer bloque
+        tamanio_bloque: Bytes por bloque; por defecto se calcula según el
+            tamaño del archivo y la cantidad de trabajadores
+
+    Returns:
+        Diccionario con la cantidad de filas, filas válidas y errores por tipo
+    """
+    trabajadores = trabajadores or os.cpu_count() or 1
+    if encoding == 'auto':
+        with open(archivo_csv, 'rb') as file:
+            encoding = detectar_encoding(file.read(TAMANIO_MUESTRA))
+    bloques = _bloques(os.path.getsize(archivo_csv), trabajadores, tamanio_bloque)
+    logger.info(f"Validando {archivo_csv} en {len(bloques)} bloques con {trabajadores} trabajadores")
+
+    argumentos = (repeat(archivo_csv), [b[0] for b in bloques], [b[1] for b in bloques], repeat(encoding))
+    if len(bloques) <= 1 or trabajadores == 1:
+        resultados = map(_validar_bloque, *argumentos)
+        return _combinar(resultados, archivo_reporte)
+    with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+        return _combinar(pool.map(_validar_bloque, *argumentos), archivo_reporte)
+
+
+def _combinar(resultados, archivo_reporte):
+    """Pasa los resultados de los bloques (en orden) a líneas globales y cruza sus claves."""
+    errores = []
+    departamentos = {}
+    ciudades = {}
+    barrios = {}
+    filas_validas = 0
+    base = 0
+
+    for resultado in resultados:
+        errores.extend((base + linea, tipo, detalle) for linea, tipo, detalle in resultado['errores'])
+        filas_validas += resultado['filas_validas']
+
+        for codigo, nombres in resultado['departamentos'].items():
+            conocidos = departamentos.setdefault(codigo, {})
+            for nombre, linea in nombres.items():
+                conocidos.setdefault(nombre, base + linea)
+        for codigo, nombres in resultado['ciudades'].items():
+            conocidos = ciudades.setdefault(codigo, {})
+            for nombre, linea in nombres.items():
+                conocidos.setdefault(nombre, base + linea)
+
+        # Barrios: el valor guarda la primera línea y el crc32 del nombre
+        desplazamiento = base << 32
+        for clave, valor in zip(resultado['claves'], resultado['valores']):
+            valor += desplazamiento
+            previo = barrios.get(clave)
+            if previo is None:
+                barrios[clave] = valor
+                continue
+            tipo = ("Barrio duplicado" if previo & _MASCARA_CRC == valor & _MASCARA_CRC
+                    else "Nombre de barrio en conflicto")
+            errores.append((valor >> 32, tipo,
+                            f"Codigo concatenado {clave}, ya presente en la línea {previo >> 32}"))
+
+        base += resultado['lineas']
+
+    errores.extend(_conflictos_nombres(departamentos, "Nombre de departamento en conflicto", "Departamento"))
+    errores.extend(_conflictos_nombres(ciudades, "Nombre de distrito en conflicto", "Distrito"))
+    errores.sort()
+
+    if archivo_reporte:
+        with open(archivo_reporte, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(COLUMNAS_REPORTE)
+            writer.writerows(errores)
+        logger.info(f"Reporte de validación guardado en {archivo_reporte}")
+    else:
+        avisos = AvisosAgregados()
+        for linea, tipo, detalle in errores:
+            avisos.registrar(tipo, linea, detalle or None)
+        avisos.resumir()
+
+    por_tipo = Counter(tipo for _, tipo, _ in errores)
+    logger.info("=== VALIDACIÓN ===")
+    logger.info(f"Filas: {max(base - 1, 0)}, válidas: {filas_validas}, barrios únicos: {len(barrios)}")
+    for tipo, cantidad in por_tipo.most_common():
+        logger.info(f"{tipo}: {cantidad}")
+    logger.info("Archivo válido" if not errores else f"Errores encontrados: {len(errores)}")
+
+    return {
+        'filas': max(base - 1, 0),
+        'filas_validas': filas_validas,
+        'errores': len(errores),
+        'errores_por_tipo': dict(por_tipo),
+    }